@@ -0,0 +1,28 @@
+"""Gateway traffic of reading and serializing the Pincell example.
+
+Prints the Java calls by MCNPy function and wrapper. The rows can be saved 
+as JSON to compare bridge traffic between runs, e.g. in CI.
+
+Usage::
+
+    python benchmarks/bench_bridge.py [report.json]
+"""
+import os
+import sys
+import tempfile
+
+import mcnpy as mp
+
+def main(filename=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = mp.Pincell(os.path.join(tmp, 'pincell.mcnp'))
+        model.write()
+        with mp.wrap.profile() as prof:
+            deck = mp.Deck.read(model.filename)
+            deck.serialize()
+    print(prof.report(by=('function', 'wrapper'), limit=20))
+    if filename is not None:
+        prof.to_json(filename)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,49 @@
+"""Cold and warm reads through the parsed-deck cache.
+
+The Pincell and RCF examples are written to a temporary directory and read
+with `Deck.read(cache=True)` against an empty cache in another temporary
+directory. The first (cold) read parses and stores the model, later (warm)
+reads load it. Plain reads without the cache are shown for reference. Warm
+decks must serialize to the same text as parsed ones.
+
+Usage::
+
+    python benchmarks/bench_cache.py [repeat]
+"""
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import mcnpy as mp
+from mcnpy import deck_cache
+
+def main(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = deck_cache.DeckCache(os.path.join(tmp, 'cache'))
+        deck_cache._default[:] = [cache]
+        models = [mp.Pincell(os.path.join(tmp, 'pincell.mcnp')), 
+                  mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))]
+        print('{:<10}{:>8}{:>12}{:>12}{:>12}{:>10}'.format(
+            'model', 'cells', 'plain [s]', 'cold [s]', 'warm [s]', 'speedup'))
+        for model in models:
+            model.write()
+            plain = min(timeit.repeat(lambda: mp.Deck.read(model.filename), 
+                                      number=1, repeat=repeat))
+            start = time.perf_counter()
+            mp.Deck.read(model.filename, cache=True)
+            cold = time.perf_counter() - start
+            warm = min(timeit.repeat(
+                lambda: mp.Deck.read(model.filename, cache=True), number=1, 
+                repeat=repeat))
+            deck = mp.Deck.read(model.filename, cache=True)
+            assert (deck.serialize() 
+                    == mp.Deck.read(model.filename).serialize())
+            print('{:<10}{:>8}{:>12.4f}{:>12.4f}{:>12.4f}{:>9.1f}x'.format(
+                type(model).__name__, len(deck.cells), plain, cold, warm, 
+                plain/warm))
+        print('hits: {}, misses: {}'.format(cache.hits, cache.misses))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,61 @@
+"""Setting cell temperatures and importances in a loop and with
+`Deck.set_cell_values`.
+
+The RCF example gets a new temperature and neutron importance for every
+cell, as each iteration of a coupled thermal-hydraulics loop would, once
+through the `Cell.temperature` and `Cell.importances` setters and once with
+`set_cell_values`. Both ways must give the same `cells_table`. Finally the
+importances are written as one IMP data card (`data_card=True`) and the
+size of the deck is compared with the cell card entries.
+
+Usage::
+
+    python benchmarks/bench_cell_values.py [repeat]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+import mcnpy as mp
+
+def main(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))
+        deck = model.deck
+        names = deck.cells_table()['name']
+        temperature = np.linspace(2.5e-8, 5e-8, len(names))
+        importance = np.ones(len(names))
+        def set_loop():
+            for cell, t, imp in zip(deck.cells.values(), temperature, 
+                                    importance):
+                cell.temperature = float(t)
+                cell.importances = {'n': float(imp)}
+        def set_bulk():
+            deck.set_cell_values('temperature', names, temperature)
+            deck.set_cell_values('imp:n', names, importance)
+        t_loop = min(timeit.repeat(set_loop, number=1, repeat=repeat))
+        looped = deck.cells_table()
+        t_bulk = min(timeit.repeat(set_bulk, number=1, repeat=repeat))
+        bulk = deck.cells_table()
+        for key in looped:
+            # NaN marks unset values.
+            equal_nan = looped[key].dtype.kind == 'f'
+            assert np.array_equal(looped[key], bulk[key], 
+                                  equal_nan=equal_nan), key
+        cell_cards = deck.serialize(repeat=True)
+        deck.set_cell_values('imp:n', names, importance, data_card=True)
+        data_card = deck.serialize(repeat=True)
+        print('{} cells'.format(len(names)))
+        print('{:<16}{:>12}{:>12}{:>10}'.format('', 'loop [s]', 'bulk [s]', 
+                                                'speedup'))
+        print('{:<16}{:>12.4f}{:>12.4f}{:>9.1f}x'.format('set TMP and IMP', 
+                                                         t_loop, t_bulk, 
+                                                         t_loop/t_bulk))
+        print('IMP on cell cards: {} bytes, as data card: {} bytes'.format(
+            len(cell_cards), len(data_card)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
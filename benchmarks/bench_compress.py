@@ -0,0 +1,60 @@
+"""Read and write throughput of compressed decks.
+
+The synthetic deck of `bench_format.py` with `n` lines is formatted once. 
+Its lines are then written to a plain, a '.gz', a '.xz' and (with 
+`zstandard` installed) a '.zst' file through `open_text`, as `Deck.write` 
+does, leaving the formatting out of the times. Each file is read back 
+through `open_deck` and `deck_lines`, as `Deck.read` does, and must give 
+the plain text. Rates are in MB/s of plain text.
+
+Pass a directory to measure a particular file system, e.g. a local NVMe 
+disk and an NFS mount. The page cache is not dropped between writing and 
+reading.
+
+Usage::
+
+    python benchmarks/bench_compress.py [n] [directory]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from mcnpy.deck_formatter import (format_lines, open_text, open_deck, 
+                                  deck_lines, zstandard)
+from bench_format import synthetic
+
+def main(n=1000000, directory=None):
+    lines = list(format_lines(synthetic(n)))
+    suffixes = ['', '.gz', '.xz'] + (['.zst'] if zstandard is not None else [])
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        rows = []
+        expected = None
+        for suffix in suffixes:
+            filename = os.path.join(tmp, 'deck.mcnp' + suffix)
+            start = time.perf_counter()
+            with open_text(filename, 'w') as f:
+                f.writelines(lines)
+            write = time.perf_counter() - start
+            start = time.perf_counter()
+            with open_deck(filename) as f:
+                text = ''.join(deck_lines(f))
+            read = time.perf_counter() - start
+            if expected is None:
+                expected = text
+            assert text == expected, suffix
+            rows.append((suffix or 'plain', os.path.getsize(filename), write, 
+                         read))
+
+    size = len(expected)/1e6
+    print('{} lines, {:.1f} MB in {}'.format(n, size, directory or 
+                                             tempfile.gettempdir()))
+    print('{:<8}{:>12}{:>8}{:>14}{:>14}'.format('format', 'bytes', 'ratio', 
+                                                 'write [MB/s]', 
+                                                 'read [MB/s]'))
+    for name, nbytes, write, read in rows:
+        print('{:<8}{:>12}{:>7.1f}x{:>14.1f}{:>14.1f}'.format(
+            name, nbytes, len(expected)/nbytes, size/write, size/read))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]], *sys.argv[2:3])
@@ -0,0 +1,56 @@
+"""Card classification with `isinstance` chains vs `mcnpy.deck.CARD_STORAGE`.
+
+Every concrete setting class is classified `n` times, once through the 
+`isinstance` chain `Deck._read` used to run and once through the registry. 
+Instances are made without `__init__` so no Java objects are created. Both 
+must give the same buckets.
+
+Usage::
+
+    python benchmarks/bench_dispatch.py [n]
+"""
+import sys
+import timeit
+
+import mcnpy as mp
+from mcnpy.deck import CARD_STORAGE
+from mcnpy.tally import TallyABC, TallySettingABC
+
+CHAIN = ((mp.Transformation, 'transformations'), (TallyABC, 'tallies'), 
+         (mp.GeometrySetting, 'geom_settings'), 
+         (mp.OutputSetting, 'out_settings'), (mp.MiscSetting, 'misc_settings'), 
+         (mp.SourceSetting, 'src_settings'), 
+         (mp.VarianceReductionSetting, 'vr_settings'), 
+         (TallySettingABC, 'tally_settings'), 
+         (mp.MaterialSetting, 'mat_settings'), 
+         (mp.TerminationSetting, 'term_settings'), 
+         (mp.PhysicsSetting, 'phys_settings'))
+
+def chain(card):
+    for base, storage in CHAIN:
+        if isinstance(card, base):
+            return storage
+    return 'settings'
+
+def subclasses(klass):
+    for sub in klass.__subclasses__():
+        yield sub
+        yield from subclasses(sub)
+
+def main(n=10000):
+    classes = {sub for base, _ in CHAIN for sub in subclasses(base) 
+               if not getattr(sub, '__abstractmethods__', None)}
+    cards = [object.__new__(klass) for klass in classes] * (n//len(classes) + 1)
+    cards = cards[:n]
+    for card in cards:
+        assert chain(card) == CARD_STORAGE.of(card), type(card)
+    t_chain = min(timeit.repeat(lambda: [chain(c) for c in cards], number=1, 
+                                repeat=5))
+    t_registry = min(timeit.repeat(lambda: [CARD_STORAGE.of(c) for c in cards], 
+                                   number=1, repeat=5))
+    print('{} cards of {} classes'.format(len(cards), len(classes)))
+    print('isinstance chain: {:.2f} us/card'.format(1e6*t_chain/len(cards)))
+    print('registry:         {:.2f} us/card'.format(1e6*t_registry/len(cards)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,92 @@
+"""Format a synthetic serialized deck with `mcnpy.deck_formatter`.
+
+A deck of `n` lines resembling `print_deck` output (cells, a lattice FILL, 
+surfaces, materials, comments and a TMESH card) is formatted three ways:
+
+* the legacy loop from `tests/legacy.py`, which grew one string with 
+  `string = string + line`, upper-cased each line once per replacement and 
+  used the legacy `line_wrap` and `print_lattice`,
+* `formatter`, which now joins the lines of `format_lines`,
+* `write_formatted` into a file, which never holds the whole output.
+
+The legacy loop is quadratic, so it only runs on the first `legacy` lines, 
+where all three outputs must be identical. Peak memory is traced with 
+`tracemalloc` in a second run and does not include the input text.
+
+Usage::
+
+    python benchmarks/bench_format.py [n] [legacy]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from mcnpy.deck_formatter import formatter, write_formatted
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                                os.pardir, 'tests'))
+from legacy import legacy_formatter
+
+BLOCK = [
+    'c Synthetic cell {i}',
+    '{i} {m} -10.2 -{i} {j} -{k} imp:n=1 $ fuel',
+    '{i} 0 -{j} lat=1 u={i} fill=-1:1 -1:1 0:0 1 2 3 4 5 6 7 8 9 imp:n=1',
+    '     {i} ## 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17 18 19 20 21 22 23 '
+    '24 25 26 27 28 29 30 31 32 33 34 35 36 37 38 39 40 41 42 43 44 45 46 47 '
+    '48 49 50',
+    '{i} pz {i}.5',
+    'm{i} 92235.80c 0.04 92238.80c 0.96 8016.80c 2.0 nlib=80c',
+    'tmesh rmesh{i}1 cora 0 1 2 corb 0 1 2 corc 0 1 2 endmd',
+]
+
+def synthetic(n):
+    lines = []
+    i = 0
+    while len(lines) < n:
+        i = i + 1
+        for line in BLOCK:
+            lines.append(line.format(i=i, j=i+1, k=i+2, m=i % 7 + 1))
+    return '\n'.join(lines[:n]) + '\n'
+
+def measure(fn):
+    """Time of one call, and peak memory of a second, traced one."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak/2**20
+
+def main(n=1000000, n_legacy=20000):
+    small = synthetic(n_legacy)
+    expected = legacy_formatter(small)
+    assert formatter(small) == expected
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'deck.mcnp')
+        with open(filename, 'w') as f:
+            write_formatted(small, f)
+        with open(filename, 'r', newline='') as f:
+            assert f.read() == expected
+
+        deck = synthetic(n)
+        rows = [('legacy', n_legacy) 
+                + measure(lambda: legacy_formatter(small)),
+                ('formatter', n) + measure(lambda: formatter(deck))]
+        def stream():
+            with open(filename, 'w') as f:
+                write_formatted(deck, f)
+        rows.append(('stream', n) + measure(stream))
+
+    print('{:<12}{:>10}{:>10}{:>14}{:>14}'.format('method', 'lines', 
+                                                  'time [s]', 'lines/s', 
+                                                  'peak [MiB]'))
+    for name, lines, elapsed, peak in rows:
+        print('{:<12}{:>10}{:>10.2f}{:>14.0f}{:>14.1f}'.format(
+            name, lines, elapsed, lines/elapsed, peak))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,44 @@
+"""Cold-start cost of `import mcnpy`.
+
+Every sample runs in a fresh interpreter so nothing is shared between 
+imports. The gateway is started by `metapy` as usual. The "eager" rows also 
+generate every wrapper class, which is what the import used to do. The 
+"no cache" rows run with the schema cache turned off.
+
+Usage::
+
+    python benchmarks/bench_import.py [repeat]
+"""
+import os
+import subprocess
+import sys
+from statistics import median
+
+LAZY = ('import time; t = time.perf_counter(); import mcnpy; '
+        'print(time.perf_counter() - t)')
+EAGER = ('import time; t = time.perf_counter(); import mcnpy; '
+         'mcnpy.load_wrappers(); print(time.perf_counter() - t)')
+
+def sample(code, repeat, cache=True):
+    env = dict(os.environ, MCNPY_SCHEMA_CACHE='1' if cache else '0')
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], check=True, 
+                             capture_output=True, text=True, env=env).stdout
+        times.append(float(out.split()[-1]))
+    return times
+
+def main(repeat=5):
+    # Fill the schema cache.
+    sample(EAGER, 1)
+    print('{:<18}{:>10}{:>12}'.format('mode', 'min [s]', 'median [s]'))
+    for mode, code in (('lazy', LAZY), ('eager', EAGER)):
+        for cache in (True, False):
+            times = sample(code, repeat, cache)
+            if cache is False:
+                mode += ' (no cache)'
+            print('{:<18}{:>10.3f}{:>12.3f}'.format(mode, min(times), 
+                                                    median(times)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,94 @@
+"""Write a large lattice FILL with `mcnpy.deck_formatter`.
+
+A `ni` x `nj` x `nk` lattice of universe IDs with runs of equal entries is 
+written as a serialized FILL card by the legacy `print_lattice` (from 
+`tests/legacy.py`), the array-based one, the array-based one given the 
+entries of the lattice as `Deck.write` does, and as an array straight from a 
+`mcnpy.Lattice` through `Lattice.fill_array`, once plainly and once with the 
+`nR` shorthand. The first four must be identical, and the `nR` output must 
+expand back to the same entries. The legacy function builds the card by 
+string concatenation and becomes very slow on large lattices, so it only runs 
+up to `legacy` entries.
+
+Usage::
+
+    python benchmarks/bench_lattice.py [ni] [nj] [nk] [legacy]
+"""
+import os
+import sys
+import time
+from re import compile
+
+import numpy as np
+
+import mcnpy as mp
+from mcnpy.deck_formatter import print_lattice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                                os.pardir, 'tests'))
+from legacy import legacy_print_lattice
+
+P_LAT = compile('-?\\d+:-?\\d+')
+
+def ids(ni, nj, nk, seed=0):
+    """Universe IDs in runs of random length, as in a core map."""
+    rng = np.random.default_rng(seed)
+    size = ni*nj*nk
+    runs = rng.integers(1, 12, size=size)
+    values = rng.choice([1, 2, 3, 10, 20, 300], size=size)
+    return np.repeat(values, runs)[:size].reshape(nk, nj, ni)
+
+def card(lattice):
+    nk, nj, ni = lattice.shape
+    ranges = ' '.join('0:' + str(n-1) for n in (ni, nj, nk))
+    return ('1 0 -1 LAT=1 U=5 FILL=' + ranges + ' ' 
+            + ' '.join(lattice.ravel().astype(str)) + ' IMP:N=1')
+
+def expand(text):
+    """Entries of a FILL array with `nR` expanded and comments dropped."""
+    entries = []
+    for line in text.splitlines():
+        if line.upper().startswith('C '):
+            continue
+        for token in line.split('$')[0].split():
+            if token.upper().endswith('R'):
+                entries.extend([entries[-1]]*int(token[:-1]))
+            else:
+                entries.append(token)
+    return entries
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main(ni=289, nj=289, nk=40, n_legacy=200000):
+    lattice = ids(ni, nj, nk)
+    line = card(lattice)
+    lat = mp.Lattice(i=[0, ni-1], j=[0, nj-1], k=[0, nk-1], lattice=lattice)
+
+    rows = []
+    text, elapsed = timed(lambda: print_lattice(line, P_LAT, 120, ''))
+    rows.append(('print_lattice', elapsed, len(text)))
+    known, elapsed = timed(lambda: print_lattice(line, P_LAT, 120, '', 
+                                                 ids=lat.fill_ids()))
+    rows.append(('print_lattice ids', elapsed, len(known)))
+    assert known == text
+    fill, elapsed = timed(lambda: lat.fill_array())
+    rows.append(('fill_array', elapsed, len(fill)))
+    assert text.endswith(fill + '\n     IMP:N=1')
+    short, elapsed = timed(lambda: lat.fill_array(repeat=True))
+    rows.append(('fill_array nR', elapsed, len(short)))
+    assert expand(short) == list(lattice.ravel().astype(str))
+    if lattice.size <= n_legacy:
+        old, elapsed = timed(lambda: legacy_print_lattice(line, P_LAT, 120, ''))
+        assert old == text
+        rows.insert(0, ('legacy', elapsed, len(old)))
+
+    print('{} x {} x {} lattice'.format(ni, nj, nk))
+    print('{:<20}{:>10}{:>14}'.format('method', 'time [s]', 'chars'))
+    for name, elapsed, chars in rows:
+        print('{:<20}{:>10.3f}{:>14}'.format(name, elapsed, chars))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:5]])
@@ -0,0 +1,69 @@
+"""Throughput of `mcnpy.lexer` in lines per second.
+
+A synthetic deck of `n` lines (cells, continuation lines, comments, FILL 
+cards, materials and exponents without an `E`) is classified twice: by the 
+separate searches the formatter, `preprocessor` and `deck_cleanup` used to 
+run on every line, and by one `mcnpy.lexer.lex` call per line. Both must find 
+the same `$` comments and FILL keywords.
+
+Usage::
+
+    python benchmarks/bench_lexer.py [n]
+"""
+import sys
+import time
+from re import compile, search, findall, IGNORECASE
+
+from mcnpy.lexer import lex
+
+LINES = ['c Synthetic cell {i}',
+         '{i} {m} -10.2 -{i} {j} -{k} imp:n=1 $ fuel',
+         '     {j} -{k} {i}',
+         '{i} 0 -{j} lat=1 u={i} fill=-1:1 -1:1 0:0 1 2 3 4 5 6 7 8 9',
+         '{i} pz {i}.5-3',
+         'm{i} 92235.80c 4.0d-2 92238.80c 0.96 8016.80c 2.0 $ UO2',
+         '']
+
+P_FILL = compile('fill', IGNORECASE)
+P_EXP = compile('\\d[-\\+]\\d')
+P_DEXP = compile('\\dd[-\\+]?\\d', IGNORECASE)
+SL_COMMENT = compile('[$]')
+ML_COMMENT = compile('^C ', IGNORECASE)
+
+def synthetic(n):
+    lines = []
+    i = 0
+    while len(lines) < n:
+        i = i + 1
+        for line in LINES:
+            lines.append(line.format(i=i, j=i+1, k=i+2, m=i % 7 + 1))
+    return lines[:n]
+
+def separate(line):
+    comment = search(ML_COMMENT, line) is not None
+    m = search(SL_COMMENT, line)
+    dollar = -1 if m is None else m.start()
+    code = line if dollar < 0 else line[:dollar]
+    fill = search(P_FILL, code) is not None
+    exponents = findall(P_EXP, line) + findall(P_DEXP, line)
+    return comment, dollar, fill, exponents
+
+def rate(fn, lines):
+    start = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return len(lines)/(time.perf_counter() - start)
+
+def main(n=1000000):
+    lines = synthetic(n)
+    for line in lines[:1000]:
+        _, dollar, fill, exponents = separate(line)
+        lexed = lex(line)
+        assert (lexed.dollar, lexed.fill) == (dollar, fill), line
+        assert len(lexed.exponents) == len(exponents), line
+    print('{:<12}{:>16}'.format('method', 'lines/s'))
+    print('{:<12}{:>16.0f}'.format('separate', rate(separate, lines)))
+    print('{:<12}{:>16.0f}'.format('lexer', rate(lex, lines)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
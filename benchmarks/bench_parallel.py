@@ -0,0 +1,36 @@
+"""Scaling of `mcnpy.deck_formatter.format_chunks` over worker processes.
+
+The synthetic deck of `bench_format.py` with `n` lines is formatted serially 
+and then by pools of 1, 2, 4 and 8 processes. Every result must be 
+byte-identical to the serial one. Times include starting the pool.
+
+Usage::
+
+    python benchmarks/bench_parallel.py [n] [chunk_lines]
+"""
+import os
+import sys
+import time
+
+from mcnpy.deck_formatter import formatter, format_chunks
+from bench_format import synthetic
+
+def main(n=1000000, chunk_lines=16384):
+    deck = synthetic(n)
+    start = time.perf_counter()
+    expected = formatter(deck)
+    serial = time.perf_counter() - start
+    print('{} lines, {} CPUs'.format(n, os.cpu_count()))
+    print('{:<10}{:>10}{:>10}'.format('workers', 'time [s]', 'speedup'))
+    print('{:<10}{:>10.2f}{:>10}'.format('serial', serial, '1.0x'))
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        text = ''.join(format_chunks(deck, workers=workers, 
+                                     chunk_lines=chunk_lines))
+        elapsed = time.perf_counter() - start
+        assert text == expected, workers
+        print('{:<10}{:>10.2f}{:>9.1f}x'.format(workers, elapsed, 
+                                                serial/elapsed))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,42 @@
+"""Compare the Xtext and pure-Python parser backends of `mcnpy.Deck.read`.
+
+The Pincell and RCF examples are written to a temporary directory and then 
+read back with each backend. The Python backend times include everything up 
+to the returned deck; the Java model is not built because nothing is edited 
+or serialized.
+
+Usage::
+
+    python benchmarks/bench_read.py [repeat]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import mcnpy as mp
+
+def bench(filename, backend, repeat):
+    times = timeit.repeat(lambda: mp.Deck.read(filename, backend=backend), 
+                          number=1, repeat=repeat)
+    return min(times)
+
+def main(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        models = [mp.Pincell(os.path.join(tmp, 'pincell.mcnp')), 
+                  mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))]
+        print('{:<10}{:>8}{:>12}{:>12}{:>10}'.format('model', 'cells', 
+                                                       'xtext [s]', 
+                                                       'python [s]', 
+                                                       'speedup'))
+        for model in models:
+            model.write()
+            xtext = bench(model.filename, 'xtext', repeat)
+            python = bench(model.filename, 'python', repeat)
+            deck = mp.Deck.read(model.filename, backend='python')
+            print('{:<10}{:>8}{:>12.4f}{:>12.4f}{:>9.1f}x'.format(
+                type(model).__name__, len(deck.cells), xtext, python, 
+                xtext/python))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
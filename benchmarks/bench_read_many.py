@@ -0,0 +1,46 @@
+"""Scaling of `Deck.read_many` with the number of worker processes.
+
+The RCF example is written `n` times to a temporary directory and all
+copies are read with 1 to 16 workers. Each worker starts its own gateway,
+which is included in the times. The cache is off so every deck is parsed.
+
+Usage::
+
+    python benchmarks/bench_read_many.py [n] [max_workers]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import mcnpy as mp
+
+def main(n=64, max_workers=16):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))
+        model.write()
+        paths = []
+        for i in range(n):
+            paths.append(os.path.join(tmp, 'rcf_{}.mcnp'.format(i)))
+            shutil.copy(model.filename, paths[-1])
+        print('{} decks of {} cells'.format(n, len(model.deck.cells)))
+        print('{:>8}{:>12}{:>12}{:>10}'.format('workers', 'time [s]', 
+                                               'decks/s', 'speedup'))
+        workers = 1
+        serial = None
+        while workers <= max_workers:
+            start = time.perf_counter()
+            summaries = list(mp.Deck.read_many(paths, workers=workers, 
+                                               cache=False))
+            elapsed = time.perf_counter() - start
+            assert sorted(s.filename for s in summaries) == sorted(paths)
+            assert all(s.error is None for s in summaries)
+            if serial is None:
+                serial = elapsed
+            print('{:>8}{:>12.3f}{:>12.1f}{:>9.1f}x'.format(
+                workers, elapsed, n/elapsed, serial/elapsed))
+            workers *= 2
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
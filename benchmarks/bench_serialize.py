@@ -0,0 +1,67 @@
+"""Time and JVM memory of serializing a deck with and without copying it.
+
+The RCF example is built through the API and, for a parsed deck, read back
+from its file. Each deck is serialized `repeat` times the current way
+(`copy=True`, a copy of the whole EMF model per call) and in place
+(`copy=False`), as a parameter sweep writing the same large deck would. The
+peak heap is read from the JVM memory pools, which are reset after a
+garbage collection before each run.
+
+The deck built through the API has no comments in hidden regions, so both
+ways must give the same text. The deck must also still serialize the same
+after the in-place runs.
+
+Usage::
+
+    python benchmarks/bench_serialize.py [repeat]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from py4j.java_gateway import JavaClass
+
+import mcnpy as mp
+from mcnpy.wrap import _java
+
+def heap_pools(gateway_client):
+    factory = JavaClass('java.lang.management.ManagementFactory',
+                        gateway_client)
+    heap = JavaClass('java.lang.management.MemoryType', gateway_client).HEAP
+    return [pool for pool in factory.getMemoryPoolMXBeans()
+            if pool.getType().equals(heap)]
+
+def measure(deck, copy, repeat, pools):
+    JavaClass('java.lang.System', pools[0]._gateway_client).gc()
+    for pool in pools:
+        pool.resetPeakUsage()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text = deck.serialize(copy=copy)
+    elapsed = (time.perf_counter() - start)/repeat
+    peak = sum(pool.getPeakUsage().getUsed() for pool in pools)
+    return text, elapsed, peak
+
+def main(repeat=10):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))
+        model.write()
+        decks = [('api', model.deck), ('parsed', mp.Deck.read(model.filename))]
+        pools = heap_pools(_java(model.deck._deck)._gateway_client)
+        print('{:<8}{:>8}{:>12}{:>12}{:>14}{:>14}'.format(
+            'deck', 'cells', 'copy [s]', 'place [s]', 'copy [MB]',
+            'place [MB]'))
+        for name, deck in decks:
+            copied, t_copy, m_copy = measure(deck, True, repeat, pools)
+            in_place, t_place, m_place = measure(deck, False, repeat, pools)
+            if name == 'api':
+                assert in_place == copied
+            # Nothing was lost from the deck.
+            assert deck.serialize() == copied
+            print('{:<8}{:>8}{:>12.4f}{:>12.4f}{:>14.1f}{:>14.1f}'.format(
+                name, len(deck.cells), t_copy, t_place, m_copy/1e6,
+                m_place/1e6))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
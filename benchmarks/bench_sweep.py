@@ -0,0 +1,52 @@
+"""Rewriting a deck in a parameter sweep with and without cached output.
+
+The RCF example is serialized `repeat` times, each time after changing the
+density of one cell, as a density sweep would. With `cache=True` the Java
+serializer still runs after each edit, but only the edited card is
+formatted again. The last `write_stats` are printed and both ways must give
+the same text. Finally the sweep is written to a file with
+`incremental=True`, which only rewrites the bytes of the edited card.
+
+Usage::
+
+    python benchmarks/bench_sweep.py [repeat]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import mcnpy as mp
+
+def sweep(deck, cell, repeat, cache):
+    texts = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        cell.density = 1.0 + i/repeat
+        texts.append(deck.serialize(cache=cache))
+    return texts, (time.perf_counter() - start)/repeat
+
+def main(repeat=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))
+        deck = model.deck
+        cell = next(c for c in deck.cells.values() if c.material is not None)
+        plain, t_plain = sweep(deck, cell, repeat, False)
+        cached, t_cached = sweep(deck, cell, repeat, True)
+        assert cached == plain
+        print('{} cells, {} serializations'.format(len(deck.cells), repeat))
+        print('{:<12}{:>12}'.format('cache=False', '{:.4f} s'.format(t_plain)))
+        print('{:<12}{:>12}'.format('cache=True', '{:.4f} s'.format(t_cached)))
+        print(deck.write_stats)
+        # Nothing was edited since, so every card is reused.
+        deck.serialize(cache=True)
+        print(deck.write_stats)
+        filename = os.path.join(tmp, 'sweep.mcnp')
+        for i in range(repeat):
+            cell.density = 2.0 + i/repeat
+            deck.write(filename, incremental=True)
+        print('incremental write: {} of {} bytes'.format(
+            deck.write_stats.written, os.path.getsize(filename)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,62 @@
+"""Reading cell data with a Python loop and with `Deck.cells_table`.
+
+The loop reads name, material, density and universe of every cell of the
+RCF example one bridge call at a time, as analytics scripts do.
+`cells_table` reads the same (and more) in a few pipelined requests. The
+columns must match. A bulk density edit through `from_arrays` is timed
+against setting `Cell.density` in a loop.
+
+Usage::
+
+    python benchmarks/bench_tables.py [repeat]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+import mcnpy as mp
+
+def loop(deck):
+    rows = []
+    for name, cell in deck.cells.items():
+        material = cell.material
+        universe = cell.universe
+        rows.append((name, 0 if material is None else material.name, 
+                     cell.density, 0 if universe is None else universe.name))
+    return rows
+
+def main(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = mp.RCF(filename=os.path.join(tmp, 'rcf.mcnp'))
+        deck = model.deck
+        rows = loop(deck)
+        table = deck.cells_table()
+        for i, key in enumerate(['name', 'material', 'density', 'universe']):
+            assert np.allclose([row[i] for row in rows], table[key]), key
+        t_loop = min(timeit.repeat(lambda: loop(deck), number=1, 
+                                   repeat=repeat))
+        t_table = min(timeit.repeat(deck.cells_table, number=1, 
+                                    repeat=repeat))
+        density = table['density']*1.01
+        def set_loop():
+            for cell, rho in zip(deck.cells.values(), density):
+                cell.density = rho
+        edit = {'name': table['name'], 'density': density}
+        t_set = min(timeit.repeat(set_loop, number=1, repeat=repeat))
+        t_bulk = min(timeit.repeat(lambda: deck.from_arrays(cells=edit), 
+                                   number=1, repeat=repeat))
+        assert np.allclose(deck.cells_table()['density'], density)
+        print('{} cells'.format(len(table['name'])))
+        print('{:<16}{:>12}{:>12}{:>10}'.format('', 'loop [s]', 'bulk [s]', 
+                                                'speedup'))
+        print('{:<16}{:>12.4f}{:>12.4f}{:>9.1f}x'.format('read', t_loop, 
+                                                         t_table, 
+                                                         t_loop/t_table))
+        print('{:<16}{:>12.4f}{:>12.4f}{:>9.1f}x'.format('set density', t_set, 
+                                                         t_bulk, t_set/t_bulk))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,43 @@
+"""Line wrapping in `mcnpy.deck_formatter` against the legacy implementation.
+
+Single cards of `n` words, e.g. long FILL arrays, are wrapped by both 
+implementations of `line_wrap` and timed. The legacy loop rescans the rest 
+of the card after every break and is quadratic in its length. The legacy 
+functions live in `tests/legacy.py`, and `tests/test_deck_formatter.py` 
+checks that both give the same results.
+
+Usage::
+
+    python benchmarks/bench_wrap.py [n] [seed]
+"""
+import os
+import random
+import sys
+import time
+
+from mcnpy.deck_formatter import line_wrap
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                                os.pardir, 'tests'))
+from legacy import legacy_line_wrap
+
+def main(n=20000, seed=0):
+    rng = random.Random(seed)
+    print('{:>8}{:>14}{:>14}{:>10}'.format('words', 'legacy [s]', 'linear [s]', 
+                                           'speedup'))
+    words = 1000
+    while words <= n:
+        text = ' '.join(str(rng.randint(1, 99999)) for _ in range(words))
+        assert line_wrap(text, '', 120) == legacy_line_wrap(text, '', 120)
+        start = time.perf_counter()
+        legacy_line_wrap(text, '', 120)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        line_wrap(text, '', 120)
+        linear = time.perf_counter() - start
+        print('{:>8}{:>14.4f}{:>14.4f}{:>9.0f}x'.format(words, legacy, linear, 
+                                                        legacy/linear))
+        words = words*2
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
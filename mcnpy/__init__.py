@@ -24,6 +24,13 @@ from mcnpy.deck import *
 from mcnpy.example import *
 from mcnpy.mbody_decomp import *
 
+def __getattr__(name):
+    # Generated wrappers without a custom class are created on first access.
+    if name.endswith('Base') and name[:-4] in wrappers:
+        return wrappers[name[:-4]]
+    raise AttributeError('module ' + repr(__name__) + ' has no attribute ' 
+                         + repr(name))
+
 # Translation
 # Only import OpenMC if available.
 try:
@@ -1,6 +1,6 @@
-from mcnpy.wrap import wrappers, overrides
+from mcnpy.wrap import base_wrappers, register_overrides
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class Deck(DeckBase):
     """
@@ -77,7 +77,4 @@ class Data(DataBase):
 
 
         
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
\ No newline at end of file
+register_overrides(globals())
@@ -1,8 +1,8 @@
 from mcnpy import SourceSetting, PhysicsSetting
 from abc import ABC
-from .wrap import wrappers, overrides, subclass_overrides
+from .wrap import base_wrappers, register_overrides, subclass_overrides
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class MiscSetting(ABC):
     """
@@ -821,10 +821,7 @@ class Continue(ABC):
             for k in kwargs:
                 setattr(self, k, kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
+register_overrides(globals())
 
 subclass_overrides(Vertical, ignore=[Vertical.Source])
 subclass_overrides(Vertical.Source)
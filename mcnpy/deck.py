@@ -1,7 +1,14 @@
 from subprocess import Popen, PIPE, CalledProcessError
 from os.path import isfile, join
 import os
-from collections import OrderedDict, defaultdict
+from io import StringIO
+from tempfile import mkstemp
+from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from contextlib import contextmanager
+from itertools import compress
+import numpy as np
 from .materials import Nuclide
 from .surfaces import Surface, RectangularPrism, CircularCylinder
 from .surfaces import HexagonalPrism, Polyhedron, Wedge, EllipticalCylinder
@@ -9,15 +16,108 @@ from .surfaces import Box, TruncatedCone, Ellipsoid
 from .surfaces import XPoints, YPoints, ZPoints
 from .materials import Material, MaterialSetting
 from .geometry import Cell, Transformation, GeometrySetting, UniverseList
+from .geometry import _java_keys, _lattice_fills, _listen, _unlisten
+from .mixin import IDAllocator, id_sequence
 from .output import OutputSetting
 from .data import MiscSetting, TerminationSetting
 from .source import SourceSetting
 from .physics import PhysicsSetting
-from .variance_reduction import VarianceReductionSetting
+from .variance_reduction import VarianceReductionSetting, CellImportances
 from .tally import TallyABC, TallySettingABC
 from ._deck import Deck as _Deck
+from .wrap import fetch, fetch_list, list_add_all, list_remove_all, _java
+from .wrap import mark_dirty, edit_revision, call_all, invalidate
 from metapy.gateway import load_file, deck_resource, print_deck
-from .deck_formatter import formatter, preprocessor
+from .deck_formatter import formatter, write_formatted, open_deck, deck_lines
+from .deck_formatter import compression, open_text, CardCache
+from .deck_formatter import write_incremental
+from .deck_parser import read_cards, MACROBODY_FACETS
+from .deck_cache import default_cache
+
+class TypeRegistry(object):
+    """Maps card classes to a value, e.g. the `Deck` attribute which stores 
+    them. A class resolves to the entry of the nearest class in its MRO. 
+    Virtual subclasses of registered ABCs fall back to the first matching 
+    entry. Lookups are cached per concrete class.
+
+    Parameters
+    ----------
+    entries : iterable of tuple
+        `(class, value)` pairs. Earlier entries win for virtual subclasses.
+    default : optional
+        Value for classes without an entry.
+    """
+
+    def __init__(self, entries, default=None):
+        self._entries = dict(entries)
+        self._default = default
+        self._resolved = {}
+
+    def register(self, klass, value):
+        """Add or replace the entry for `klass`."""
+        self._entries[klass] = value
+        self._resolved.clear()
+
+    def __getitem__(self, klass):
+        try:
+            return self._resolved[klass]
+        except KeyError:
+            pass
+        for base in klass.__mro__:
+            if base in self._entries:
+                value = self._entries[base]
+                break
+        else:
+            for base, value in self._entries.items():
+                if issubclass(klass, base):
+                    break
+            else:
+                value = self._default
+        self._resolved[klass] = value
+        return value
+
+    def of(self, obj):
+        """The value for the class of `obj`."""
+        return self[type(obj)]
+
+# Deck attribute which stores each kind of card. Nuclides are added as a new 
+# material.
+CARD_STORAGE = TypeRegistry(((Cell, 'cells'), (Surface, 'surfaces'), 
+                             (Nuclide, 'nuclides'), (Material, 'materials'), 
+                             (Transformation, 'transformations'), 
+                             (TallyABC, 'tallies'), 
+                             (GeometrySetting, 'geom_settings'), 
+                             (PhysicsSetting, 'phys_settings'), 
+                             (SourceSetting, 'src_settings'), 
+                             (VarianceReductionSetting, 'vr_settings'), 
+                             (TallySettingABC, 'tally_settings'), 
+                             (OutputSetting, 'out_settings'), 
+                             (TerminationSetting, 'term_settings'), 
+                             (MiscSetting, 'misc_settings'), 
+                             (MaterialSetting, 'mat_settings')), 
+                            default='settings')
+# IDs left free after each macrobody for its facets when renumbering.
+MACROBODY_SPACING = TypeRegistry(((RectangularPrism, 6), (Box, 6), 
+                                  (Polyhedron, 6), (CircularCylinder, 3), 
+                                  (EllipticalCylinder, 3), (TruncatedCone, 3), 
+                                  (Wedge, 5), (HexagonalPrism, 8), 
+                                  (Ellipsoid, 1)), 
+                                 default=0)
+
+# Deck attributes which store cards.
+_STORAGE = ('cells', 'surfaces', 'materials', 'transformations', 'tallies', 
+            'settings', 'geom_settings', 'mat_settings', 'out_settings', 
+            'misc_settings', 'src_settings', 'phys_settings', 'vr_settings', 
+            'tally_settings', 'term_settings')
+
+WriteStats = namedtuple('WriteStats', ['cards', 'reused', 'formatted', 
+                                       'changed', 'written'], 
+                        defaults=(None,))
+WriteStats.__doc__ = """Reuse of cached output by the last `Deck.write` or 
+`Deck.serialize`. `cards` counts every card, comment and blank line of the 
+output, of which `reused` were taken from the cache and `formatted` were 
+formatted again. `changed` is the number of cards edited or added since the 
+previous write. `written` is the number of bytes an incremental write wrote, else None."""
 
 def run_mcnp(input, exe='mcnp6', exe_op='IXR', inp=True, mcnp_path=None, 
         data_path=None, ics_path=None, options=[], lineout=True, **kwargs):
@@ -142,6 +242,201 @@ def run_script(script, exe, *args, lineout=True, **kwargs):
     if p.returncode != 0:
         raise CalledProcessError(p.returncode, p.args)
 
+def _load_deck(source, preprocess=False, cleanup=False):
+    """Parse a deck with the Java parser. Paths without preprocessing go to 
+    `load_file` directly. Everything else is decompressed and cleaned in 
+    memory and written to a private temporary file for `load_file`, as 
+    metapy can only parse files. The file is removed right after parsing.
+
+    Parameters
+    ----------
+    source : str, os.PathLike, bytes or file-like
+        See `mcnpy.deck_formatter.open_deck`.
+    preprocess : bool, optional
+        Strip comments which parse correctly, but serialize poorly.
+    cleanup : bool, optional
+        Fix decks which MCNP accepts, but the parser does not.
+    """
+    if isinstance(source, os.PathLike):
+        source = os.fspath(source)
+    if (isinstance(source, str) and compression(source) is None 
+        and preprocess is False and cleanup is False):
+        return load_file(source)
+    with open_deck(source) as f:
+        lines = deck_lines(f, preprocess, cleanup)
+        fd, path = mkstemp(suffix='.mcnp', text=True)
+        try:
+            with os.fdopen(fd, 'w') as tmp:
+                tmp.writelines(lines)
+            return load_file(path)
+        finally:
+            os.remove(path)
+
+def _print_in_place(deck):
+    """Serialize a Java deck without copying it first.
+
+    The serializer moves the deck into the resource it saves. The deck is 
+    put back into the resource it came from afterwards, and parts of it 
+    which the serializer detached are attached again, so it stays usable. 
+    Comments which the parser assigned to hidden regions are serialized 
+    too, unlike with a copy.
+
+    Parameters
+    ----------
+    deck : mcnpy._deck.Deck
+        The deck to serialize.
+
+    Returns
+    -------
+    deck_string : str
+        Unformatted output of the serializer.
+    """
+    e_deck = _java(deck)
+    resource = e_deck.eResource()
+    index = -1 if resource is None else resource.getContents().indexOf(e_deck)
+    # The blocks of the deck are recorded before serializing, so none of 
+    # them can get lost.
+    children = fetch_list(e_deck.eContents())
+    features = call_all((child, 'eContainingFeature', ()) 
+                        for child in children)
+    try:
+        return print_deck(deck)
+    finally:
+        if index >= 0 and resource.getContents().contains(e_deck) is False:
+            resource.getContents().add(index, e_deck)
+        _reattach(e_deck, children, features)
+
+def _reattach(e_deck, children, features):
+    """Put children back into a Java deck which no longer contains them.
+
+    Parameters
+    ----------
+    e_deck : py4j.java_gateway.JavaObject
+        The deck.
+    children : list
+        Children of the deck, e.g. from `eContents`.
+    features : list
+        The containment feature of each child.
+    """
+    containers = call_all((child, 'eContainer', ()) for child in children)
+    lost = [(child, feature) for child, feature, container 
+            in zip(children, features, containers) 
+            if container is None or not e_deck.equals(_java(container))]
+    if len(lost) == 0:
+        return
+    many = call_all((feature, 'isMany', ()) for _, feature in lost)
+    for (child, feature), is_many in zip(lost, many):
+        if is_many:
+            call_all([(e_deck.eGet(_java(feature)), 'add', (child,))])
+        else:
+            call_all([(e_deck, 'eSet', (feature, child))])
+    mark_dirty()
+
+def _names(objects):
+    """IDs of named EObjects, 0 for None, with one bulk request."""
+    present = [obj for obj in objects if obj is not None]
+    names = iter(fetch(present, ['name'])['name'])
+    return np.array([0 if obj is None else int(next(names)) for obj in objects], 
+                    np.int64)
+
+def _match_records(storage, records, cards):
+    """Pair the text records of a deck attribute with the wrappers the Java 
+    parser made for it. Named cards are paired by name, the others in order 
+    after checking their names where they have one.
+
+    Raises
+    ------
+    RuntimeError
+        If the Python parser sorted the cards differently.
+    """
+    if len(records) != len(cards):
+        raise RuntimeError('The Python parser found ' + str(len(records)) 
+                           + ' ' + storage + ', the Java parser ' 
+                           + str(len(cards)))
+    if isinstance(records, dict):
+        missing = [name for name in records if name not in cards]
+        if len(missing) > 0:
+            raise RuntimeError('The Java parser has no ' + storage + ' ' 
+                               + ', '.join(str(name) for name in missing))
+        return [(record, cards[name]) for name, record in records.items()]
+    pairs = list(zip(records, cards))
+    for record, card in pairs:
+        if (record._name is not None 
+            and getattr(card, 'name', record._name) != record._name):
+            raise RuntimeError('Card ' + str(record._name) + ' of ' + storage 
+                               + ' was read as ' + repr(card))
+    return pairs
+
+def _match_settings(records, deck):
+    """Pair the text records of the data cards other than materials with the 
+    wrappers the Java parser made for them, in the order of the deck.
+
+    The Python parser only guesses where a data card is stored from its 
+    keyword (`deck_parser.DATA_STORAGE`). The wrappers are sorted by 
+    `CARD_STORAGE` and replace the records in the deck, so the storage of 
+    the Java parser is used where the two differ.
+
+    Raises
+    ------
+    RuntimeError
+        If the parsers found a different number of data cards.
+    """
+    index = getattr(deck, '_settings_index', None)
+    if index is None:
+        # CONTINUE decks keep every data card in `settings`.
+        cards = list(deck.settings)
+    else:
+        positions = dict.fromkeys(_STORAGE, 0)
+        cards = []
+        for storage, name in index:
+            if name is None:
+                cards.append(getattr(deck, storage)[positions[storage]])
+                positions[storage] += 1
+            else:
+                cards.append(getattr(deck, storage)[name])
+    return _match_records('data cards', records, cards)
+
+class DeckSummary(namedtuple('DeckSummary', ['filename', 'cells', 'surfaces', 
+                                             'materials', 'data', 'key', 
+                                             'error'])):
+    """What `Deck.read_many` returns for each deck.
+
+    Attributes
+    ----------
+    filename : str, os.PathLike, bytes or file-like
+        What was read.
+    cells, surfaces, materials, data : int
+        Number of cards of each kind. `data` counts all other data cards.
+    key : str
+        Key of the parsed deck in `mcnpy.deck_cache`, or None if it was not 
+        stored.
+    error : str
+        Why the deck could not be read, or None.
+    """
+
+    __slots__ = ()
+
+    def load(self, **kwargs):
+        """Return the deck, from `mcnpy.deck_cache` if it was stored there. 
+        Otherwise it is read again with `kwargs` passed to `Deck.read`."""
+        if self.key is not None:
+            deck = Deck()
+            if deck._read_snapshot(self.key) is True:
+                return deck
+        return Deck.read(self.filename, **kwargs)
+
+def _read_summary(filename, renumber=False, preprocess=False, backend='xtext', 
+                  cleanup=False, cache=True):
+    """Read a deck in a worker of `Deck.read_many`."""
+    try:
+        deck = Deck.read(filename, renumber, preprocess, backend, cleanup, 
+                         cache)
+    except Exception as e:
+        return DeckSummary(filename, 0, 0, 0, 0, None, str(e))
+    data = sum(len(getattr(deck, k)) for k in _STORAGE[3:])
+    return DeckSummary(filename, len(deck.cells), len(deck.surfaces), 
+                       len(deck.materials), data, deck._cache_key, None)
+
 class Deck():
     """An object containing dicts for cells, surfaces, and materials. Most other 
     data cards are stored as lists.
@@ -176,12 +471,29 @@ class Deck():
         self.tallies = tallies
         self.term_settings = term_settings
         self.materials = materials
+        # Universe ID and Java identity hash of every indexed cell by cell ID.
+        self._cell_universes = {}
+        self._cell_keys = {}
+        self._universes_stale = False
         self.universes = universes
         self.continue_run = continue_run
-        self._deck = _Deck()
-        self._deck.initialize()
+        # The Java model is created on first use. Decks read with the Python 
+        # backend keep their source until they are edited or serialized.
+        self._java_deck = None
+        self._source = None
+        # Java list updates collected by `add_all` and `remove_all`.
+        self._batch = None
+        self._id_allocators = {}
         self._is_reading = False
         self.material_densities = {}
+        # Formatted cards of the last cached write, by serialized text.
+        self._card_cache = CardCache()
+        self._revisions = {}
+        self.write_stats = None
+        # Byte ranges of the cards in the last file written incrementally.
+        self._file_index = None
+        # Key of the deck in `mcnpy.deck_cache`, if it was read through it.
+        self._cache_key = None
 
         if self.cells is None:
             self.cells = {}
@@ -220,49 +532,298 @@ class Deck():
     
     @property
     def universes(self):
-        if self._is_reading is False:
-            _universes = self._universes.copy().items()
-            for u in _universes:
-                _cells = u[1].cells.copy().items()
-                for c in _cells:
-                    if c[1].universe is None:
-                        pass
-                    else:
-                        # Correct universe ID
-                        if c[1].universe.name == u[0]:
-                            pass
-                        # Incorrect ID
-                        else:
-                            # Remove from current UniverseList
-                            del self._universes[u[0]].cells[c[0]]
-                            # Add to existing or make new
-                            if c[1].universe.name not in self._universes:
-                                self._universes[c[1].universe.name] = UniverseList(name=c[1].universe.name, cells=None)
-                                self._universes[c[1].universe.name]._e_object = self.cells[c[0]].universe._e_object
-                            self._universes[c[1].universe.name].add_only(self.cells[c[0]])
-                # Remove empty UniverseLists
-                if not self._universes[u[0]].cells:
-                    del self._universes[u[0]]
-
+        # Kept current by `_universe_changed`. Only edits the index can't 
+        # attribute to this deck's cells force a rebuild.
+        if self._universes_stale is True and self._is_reading is False:
+            self.rebuild_indexes()
         return self._universes
 
     @universes.setter
     def universes(self, universes):
+        self._clear_universes()
         self._universes = universes
+        if universes is not None:
+            cells = {}
+            for u_id, universe in universes.items():
+                for name, cell in universe.cells.items():
+                    self._cell_universes[name] = u_id
+                    if isinstance(cell, Cell):
+                        cells[name] = cell
+            for name, key in zip(cells, _java_keys(list(cells.values()))):
+                self._cell_keys[name] = key
+                _listen(self, key)
+
+    def rebuild_indexes(self):
+        """Rebuild `universes` from the cells. Only needed after cells were 
+        changed outside of MCNPy, e.g. directly in Java.
+        """
+        self._clear_universes()
+        self._universes_stale = False
+        # Fetched in one batch instead of one call per cell.
+        _java_keys([cell for cell in self.cells.values() 
+                    if isinstance(cell, Cell)])
+        for cell in self.cells.values():
+            self.get_universe(cell)
+
+    def _clear_universes(self):
+        """Empty the universe index and stop listening to its cells."""
+        for key in self._cell_keys.values():
+            _unlisten(self, key)
+        self._universes = {}
+        self._cell_universes = {}
+        self._cell_keys = {}
+
+    def _universe_changed(self, cell, name):
+        """Move a cell of this deck to its new `UniverseList`. Only called 
+        for cells whose Java identity hash is in this deck's index.
+        """
+        if self._is_reading is True or name not in self._cell_universes:
+            return
+        card = self.cells.get(name)
+        if card is None:
+            return
+        if card is not cell and _java(card) != _java(cell):
+            # Another cell with the same hash.
+            return
+        self._unindex_cell(name)
+        self.get_universe(card)
+
+    def _unindex_cell(self, name):
+        key = self._cell_keys.pop(name, None)
+        if key is not None:
+            _unlisten(self, key)
+        u_id = self._cell_universes.pop(name, None)
+        universe = self._universes.get(u_id)
+        if universe is not None:
+            universe.cells.pop(name, None)
+            if not universe.cells:
+                del self._universes[u_id]
+
+    @property
+    def _deck(self):
+        if self._java_deck is None:
+            if self._source is not None:
+                self._materialize()
+            else:
+                self._java_deck = _Deck()
+                self._java_deck.initialize()
+        return self._java_deck
+
+    @_deck.setter
+    def _deck(self, deck):
+        self._java_deck = deck
+
+    @classmethod
+    def read(cls, filename='inp.mcnp', renumber=False, preprocess=False, 
+             backend='xtext', cleanup=False, cache=False, text=None):
+        """Read a deck from a file, bytes, a stream or its text.
+
+        Parameters
+        ----------
+        filename : str, os.PathLike, bytes or file-like
+            The MCNP input file. A str is always a path. Bytes are read as 
+            the deck itself. Streams may be text or binary. '.gz', '.xz' and 
+            '.zst' files and compressed bytes are decompressed on the fly.
+        renumber : boolean, optional
+            Use sequential numbering for named objects.
+        preprocess : boolean, optional
+            Strip comments which parse correctly, but serialize poorly.
+        backend : {'xtext', 'python'}, optional
+            'python' indexes the deck with a pure-Python tokenizer. The Java 
+            model is only built once the deck is edited or serialized. See 
+            the notes for how its cards differ.
+        cleanup : boolean, optional
+            Fix decks which MCNP accepts, but the parser does not, e.g. 
+            missing exponent letters or text after the end of the input.
+        cache : boolean, optional
+            Load the parsed model from `mcnpy.deck_cache` if the same text 
+            was read before with the same options, and store it otherwise. 
+            Only used by the 'xtext' backend.
+        text : str, optional
+            The text of the deck, read instead of `filename`.
+
+        Examples
+        --------
+        >>> deck = mcnpy.Deck.read('inp.mcnp')
+        >>> deck = mcnpy.Deck.read(text=deck_string)
+
+        Notes
+        -----
+        With the 'python' backend, the dicts and lists of the deck hold 
+        `mcnpy.deck_parser.TextCard` records instead of wrappers until the 
+        Java model is built. The records are not instances of the wrapper 
+        classes (`Cell`, `Surface`, ...) and only parse a few fields from 
+        the text: names, materials, densities, universes, lattices, cell 
+        parameters, surface mnemonics and coefficients, and data card 
+        keywords. A cell's `material` is a `TextMaterial` and its 
+        `universe` a `TextUniverse` holding `name` and `sign`. Data cards 
+        are sorted by keyword, which can differ from the wrapper classes. 
+        Any other attribute, and any assignment, builds the Java model and 
+        goes to the wrapper which replaces the record; the dicts and lists 
+        then hold wrappers sorted like an 'xtext' read.
+
+        Preprocessing, cleanup and decompression run in memory. No files are 
+        written next to the input, but the Java parser only reads files, so 
+        it gets such decks through a private temporary file.
+        """
+        if text is not None:
+            filename = StringIO(text)
+        _deck = Deck()
+        if backend == 'python':
+            _deck._read_text(filename, renumber, preprocess, cleanup)
+        elif backend == 'xtext' and cache is True:
+            _deck._read_cached(filename, renumber, preprocess, cleanup)
+        elif backend == 'xtext':
+            _deck._read(filename, renumber, preprocess, cleanup)
+        else:
+            raise ValueError('Unknown parser backend "' + str(backend) + '"')
+        return _deck
 
     @classmethod
-    def read(cls, filename='inp.mcnp', renumber=False, preprocess=False):
-            _deck = Deck()
-            _deck._read(filename, renumber, preprocess)
-            return _deck
+    def read_many(cls, filenames, workers=None, renumber=False, 
+                  preprocess=False, backend='xtext', cleanup=False, cache=True, 
+                  mp_context=None):
+        """Read many decks in a pool of processes, each with its own gateway.
 
-    def _read(self, filename='inp.mcnp', renumber=False, preprocess=False):
+        Decks are parsed in the workers and stay there. What comes back is a 
+        `DeckSummary` per deck, in the order the decks finish. With `cache`, 
+        the parsed models are stored in `mcnpy.deck_cache`, so 
+        `DeckSummary.load` gets a deck without parsing it again.
+
+        Parameters
+        ----------
+        filenames : iterable
+            Anything `read` accepts, e.g. paths.
+        workers : int, optional
+            Number of processes. Defaults to the number of CPUs. With 1, 
+            decks are read one after the other in this process.
+        renumber, preprocess, backend, cleanup, cache : optional
+            Passed on to `read`.
+        mp_context : multiprocessing context, optional
+            Context of the pool. Defaults to 'spawn', so no worker inherits 
+            the connection to this process's gateway.
+
+        Yields
+        ------
+        summary : mcnpy.deck.DeckSummary
+            A summary of a deck, or the error it could not be read with.
+
+        Examples
+        --------
+        >>> for summary in mcnpy.Deck.read_many(paths, workers=8):
+        ...     if summary.error is not None:
+        ...         print(summary.filename, summary.error)
+        """
+        options = (renumber, preprocess, backend, cleanup, cache)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 2:
+            for filename in filenames:
+                yield _read_summary(filename, *options)
+            return
+        if mp_context is None:
+            mp_context = get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=mp_context) as pool:
+            futures = [pool.submit(_read_summary, filename, *options) 
+                       for filename in filenames]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _read_text(self, filename='inp.mcnp', renumber=False, preprocess=False, 
+                   cleanup=False):
+        """For reading a deck from a file without the Java parser.
+        """
+        with open_deck(filename) as f:
+            text = ''.join(deck_lines(f, preprocess, cleanup))
+        _, cells, surfaces, data = read_cards(self, text)
+        # Data cards other than materials, in the order of the deck.
+        settings = []
+        # The Java parser later reads the same cleaned text.
+        self._source = (text, renumber, settings)
+        self._is_reading = True
+        materials = {}
+        transformations = {}
+        i = 0
+        for card in data:
+            if card.storage == 'materials':
+                materials[card.name] = card
+                if renumber is True:
+                    card.name = len(materials)
+                self.materials[card.name] = card
+                continue
+            settings.append(card)
+            i = i + 1
+            if card.storage == 'transformations':
+                transformations[card.name] = card
+                if renumber is True:
+                    card.name = i
+            storage = getattr(self, card.storage)
+            if isinstance(storage, dict):
+                storage[card.name] = card
+            else:
+                storage.append(card)
+        for i, cell in enumerate(cells, 1):
+            cell._material_card = materials.get(cell._material)
+            if renumber is True:
+                cell.name = i
+            self.cells[cell.name] = cell
+            self.get_universe(cell)
+            if cell.material is not None:
+                rho = (cell.density, cell.density_unit)
+                densities = self.material_densities.setdefault(
+                    cell.material.name, [])
+                if rho not in densities:
+                    densities.append(rho)
+        id = 0
+        for surf in surfaces:
+            if surf._transformation is not None:
+                surf._transformation_card = transformations.get(
+                    abs(surf._transformation))
+            id = id + 1
+            if renumber is True:
+                surf.name = id
+                # Leave room for adding macrobodies.
+                id = id + MACROBODY_FACETS.get(surf.mnemonic, 0)
+            self.surfaces[surf.name] = surf
+        self._is_reading = False
+
+    def _materialize(self):
+        """Build the Java model of a deck read with the Python backend and 
+        swap its text records for wrappers.
+        """
+        if self._source is None:
+            return
+        text, renumber, settings = self._source
+        _deck = Deck()
+        _deck._read(StringIO(text), renumber)
+        pairs = []
+        for k in ('cells', 'surfaces', 'materials'):
+            pairs.extend(_match_records(k, getattr(self, k), 
+                                        getattr(_deck, k)))
+        pairs.extend(_match_settings(settings, _deck))
+        self._source = None
+        for k in _STORAGE:
+            setattr(self, k, getattr(_deck, k))
+        universes = _deck._universes
+        _deck._clear_universes()
+        self.universes = universes
+        self.material_densities = _deck.material_densities
+        self.continue_run = _deck.continue_run
+        self._java_deck = _deck._java_deck
+        # Records handed out before now forward to their wrappers.
+        for record, card in pairs:
+            record._card = card
+
+    def _read(self, filename='inp.mcnp', renumber=False, preprocess=False, 
+              cleanup=False):
         """For reading a deck from a file.
         """
         try:
-            if preprocess is True:
-                filename = preprocessor(filename)
-            inp = load_file(filename)
+            inp = _load_deck(filename, preprocess, cleanup)
             self._deck = inp
         except:
             #print('Parsing failed. Cleaning up the deck and trying again.')
@@ -276,86 +837,60 @@ class Deck():
             
             if isinstance(filename, _Deck):
                 self._deck = filename
+            elif isinstance(filename, (str, os.PathLike)):
+                raise Exception('Error importing MCNP Deck from file "' 
+                                + str(filename) + '"')
             else:
-                raise Exception('Error importing MCNP Deck from file "' + filename 
-                                + '"')
+                raise Exception('Error importing MCNP Deck from ' 
+                                + type(filename).__name__)
         try: 
-            cells = self._deck.cells.cells
-            surfaces = self._deck.surfaces.surfaces
-            settings = self._deck.data.settings
-            materials = self._deck.data.materials
+            # Copy the containment lists once instead of iterating them 
+            # through the gateway one element at a time.
+            cells = fetch_list(self._deck.cells.cells)
+            surfaces = fetch_list(self._deck.surfaces.surfaces)
+            settings = fetch_list(self._deck.data.settings)
+            materials = fetch_list(self._deck.data.materials)
             self._is_reading = True
-            i = 0
-            for mat in materials:
-                i = i + 1
-                if renumber is True:
+            if renumber is True:
+                for i, mat in enumerate(materials, 1):
                     mat.name = i
-                self.materials[int(mat.name)] = mat
-            i = 0
-            for cell in cells:
-                i = i + 1
-                #self.cells.append(cells[i])
-                if renumber is True:
+            for mat, name in zip(materials, fetch(materials, ['name'])['name']):
+                self.materials[int(name)] = mat
+            if renumber is True:
+                for i, cell in enumerate(cells, 1):
                     cell.name = i
-                self.cells[int(cell.name)] = cell
+            _java_keys(cells)
+            for cell, name in zip(cells, fetch(cells, ['name'])['name']):
+                self.cells[int(name)] = cell
                 self.get_universe(cell)
-                if cell.material is not None:
-                    rho = (cell.density, cell.density_unit)
-                    if cell.material.name in self.material_densities:
-                        if rho not in self.material_densities[int(cell.material.name)]:
-                            self.material_densities[int(cell.material.name)].append(rho)
-                    else:
-                        self.material_densities[int(cell.material.name)] = [rho]
+            self.update_material_densities(cells)
             id = 0
             for surf in surfaces:
                 id = id + 1
                 if renumber is True:
                     surf.name = id
                     # Leave room for adding macrobodies.
-                    if (isinstance(surf, RectangularPrism) 
-                        or isinstance(surf, Box) 
-                        or isinstance(surf, Polyhedron)):
-                        id = id+6
-                    elif (isinstance(surf, CircularCylinder) 
-                        or isinstance(surf, EllipticalCylinder) 
-                        or isinstance(surf, TruncatedCone)):
-                        id = id+3
-                    elif isinstance(surf, Wedge):
-                        id = id+5
-                    elif isinstance(surf, HexagonalPrism):
-                        id = id+8
-                    elif isinstance(surf, Ellipsoid):
-                        id = id+1
-                self.surfaces[int(surf.name)] = surf
+                    id = id + MACROBODY_SPACING.of(surf)
+            for surf, name in zip(surfaces, fetch(surfaces, ['name'])['name']):
+                self.surfaces[int(name)] = surf
             i = 0
+            # Where each data card went, for `_card_index`.
+            self._settings_index = []
             for setting in settings:
                 i = i + 1
-                if isinstance(setting, Transformation):
+                storage = CARD_STORAGE.of(setting)
+                if storage == 'transformations':
                     if renumber is True:
                         setting.name = i
-                    self.transformations[int(setting.name)] = setting
-                elif isinstance(setting, TallyABC):
-                    self.tallies[int(setting.name)] = setting
-                elif isinstance(setting, GeometrySetting):
-                    self.geom_settings.append(setting)
-                elif isinstance(setting, OutputSetting):
-                    self.out_settings.append(setting)
-                elif isinstance(setting, MiscSetting):
-                    self.misc_settings.append(setting)
-                elif isinstance(setting, SourceSetting):
-                    self.src_settings.append(setting)
-                elif isinstance(setting, VarianceReductionSetting):
-                    self.vr_settings.append(setting)
-                elif isinstance(setting, TallySettingABC):
-                    self.tally_settings.append(setting)
-                elif isinstance(setting, MaterialSetting):
-                    self.mat_settings.append(setting)
-                elif isinstance(setting, TerminationSetting):
-                    self.term_settings.append(setting)
-                elif isinstance(setting, PhysicsSetting):
-                    self.phys_settings.append(setting)
+                    name = int(setting.name)
+                    self.transformations[name] = setting
+                elif storage == 'tallies':
+                    name = int(setting.name)
+                    self.tallies[name] = setting
                 else:
-                    self.settings.append(setting)
+                    name = None
+                    getattr(self, storage).append(setting)
+                self._settings_index.append((storage, name))
             self._is_reading = False
         except:
             # For CONTINUE decks
@@ -364,32 +899,147 @@ class Deck():
             for setting in settings:
                 self.settings.append(setting)
 
+    def _read_cached(self, filename='inp.mcnp', renumber=False, 
+                     preprocess=False, cleanup=False):
+        """For reading a deck through `mcnpy.deck_cache`.
+        """
+        with open_deck(filename) as f:
+            text = ''.join(deck_lines(f, preprocess, cleanup))
+        cache = default_cache()
+        key = cache.key(text, renumber=renumber)
+        if self._read_snapshot(key) is True:
+            return
+        self._read(StringIO(text), renumber)
+        # CONTINUE decks are not indexed.
+        if self.continue_run is None:
+            if cache.store(key, self._deck, self._card_index()) is True:
+                self._cache_key = key
+
+    def _read_snapshot(self, key):
+        """Load the deck stored under `key` in `mcnpy.deck_cache`. Returns 
+        False if there is none.
+        """
+        snapshot = default_cache().load(key)
+        if snapshot is None:
+            return False
+        self._deck, cards = snapshot
+        self._restore_indexes(cards)
+        self._cache_key = key
+        return True
+
+    def _card_index(self):
+        """Names and storage of the cards of a freshly read deck, in the 
+        order of the Java lists. See `_restore_indexes`.
+        """
+        return {'cells': list(self.cells), 'surfaces': list(self.surfaces), 
+                'materials': list(self.materials), 
+                'settings': self._settings_index, 
+                'densities': self.material_densities}
+
+    def _restore_indexes(self, cards):
+        """Fill the dicts and lists of a deck loaded from `mcnpy.deck_cache` 
+        from its card index instead of asking Java for names and types.
+        """
+        self._is_reading = True
+        for k, java_list in (('cells', self._deck.cells.cells), 
+                             ('surfaces', self._deck.surfaces.surfaces), 
+                             ('materials', self._deck.data.materials)):
+            storage = getattr(self, k)
+            for card, name in zip(fetch_list(java_list), cards[k]):
+                storage[name] = card
+        for setting, (k, name) in zip(fetch_list(self._deck.data.settings), 
+                                      cards['settings']):
+            storage = getattr(self, k)
+            if name is None:
+                storage.append(setting)
+            else:
+                storage[name] = setting
+        self.material_densities = {int(name): [tuple(rho) for rho in rhos] 
+                                   for name, rhos in cards['densities'].items()}
+        # Built from the cells when the universes are used first.
+        self._clear_universes()
+        self._universes_stale = True
+        self._is_reading = False
+
     def _direct_export(self):
         """For serializing the deck without any Python post-processing.
         """
+        self._materialize()
         return print_deck(self._deck)
 
-    def write(self, filename='deck.mcnp', title=None, renumber=False, direct=False):
+    def write(self, filename='deck.mcnp', title=None, renumber=False, direct=False, 
+              repeat=False, workers=1, copy=True, cache=False, incremental=False):
         """Write the deck to file.
 
         Parameters
         ----------
         filename : str
-            The name of the file to be written.
+            The name of the file to be written. Files ending in '.gz', '.xz' 
+            or '.zst' are compressed while they are written.
         title : str, optional
             Title line added to the MCNP deck.
         renumber : boolean, optional
             Use sequential numbering for named objects.
         direct : boolean, optional
             Serialize without extra formatting from Python.
+        repeat : boolean, optional
+            Shorten runs in lattice FILL arrays with the MCNP `nR` shorthand.
+        workers : int, optional
+            Format chunks of the deck in this many processes. None uses every 
+            CPU. The output does not depend on it.
+        copy : boolean, optional
+            Serialize a copy of the Java model. False serializes the model 
+            itself, which saves the time and memory of the copy, e.g. when a 
+            large deck is written many times. Comments of the input which 
+            are not attached to a card are kept then.
+        cache : boolean, optional
+            Keep the formatted cards and only format cards whose serialized 
+            text changed since the previous cached write, e.g. in a 
+            parameter sweep. The deck is still serialized every time. 
+            `write_stats` tells how much was reused. The cache holds the 
+            formatted deck in memory; False (the default) streams the 
+            formatted lines to the file and drops the cache.
+        incremental : boolean, optional
+            Patch the file left by the previous incremental write of this 
+            deck instead of writing all of it. Cards which did not grow are 
+            overwritten in place, padded with blanks or comment lines. The 
+            file is written in full the first time, after it was changed by 
+            anything else and for compressed files.
         """
-        with open(filename, 'w') as f:
-            if direct is False:
-                f.write(self.serialize(title, renumber))
-            else:
+        if incremental is True and direct is False:
+            self._write_incremental(filename, title, renumber, repeat, workers, 
+                                    copy)
+            return
+        with open_text(filename, 'w') as f:
+            if direct is True:
                 f.write(self._direct_export())
-
-    def serialize(self, title=None, renumber=False):
+            elif cache is True:
+                f.writelines(self._formatted(title, renumber, repeat, workers, 
+                                             copy))
+            else:
+                self._clear_cache()
+                # Formatted lines go straight to the file instead of being 
+                # joined into one string first.
+                write_formatted(self._print(renumber, copy), f, title, 
+                                repeat=repeat, workers=workers, 
+                                lattices=self._lattices())
+
+    def _write_incremental(self, filename, title=None, renumber=False, 
+                           repeat=False, workers=1, copy=True):
+        """For writing the deck with `write(incremental=True)`.
+        """
+        pieces = self._formatted(title, renumber, repeat, workers, copy)
+        if compression(filename) is not None:
+            with open_text(filename, 'w') as f:
+                f.writelines(pieces)
+            self._file_index = None
+            return
+        self._file_index, written = write_incremental(filename, pieces, 
+                                                      self._file_index)
+        self.write_stats = self.write_stats._replace(written=written)
+
+    def serialize(self, title=None, renumber=False, repeat=False, workers=1, 
+                  copy=True, cache=False):
         """Serialize the MCNP deck to a string.
 
         Parameters
@@ -398,13 +1048,82 @@ class Deck():
             User specified title for the deck.
         renumber : boolean, optional
             Use sequential numbering for named objects.
+        repeat : boolean, optional
+            Shorten runs in lattice FILL arrays with the MCNP `nR` shorthand.
+        workers : int, optional
+            Format chunks of the deck in this many processes. None uses every 
+            CPU. The output does not depend on it.
+        copy : boolean, optional
+            Serialize a copy of the Java model. False serializes the model 
+            itself. See `write`.
+        cache : boolean, optional
+            Only format cards which changed since the previous cached write 
+            or serialization. See `write`.
 
         Returns
         -------
         deck_string : str
             A textual representation of the MCNP deck.
         """
-
+        if cache is True:
+            return ''.join(self._formatted(title, renumber, repeat, workers, 
+                                           copy))
+        self._clear_cache()
+        return formatter(self._print(renumber, copy), title, repeat, workers, 
+                         self._lattices())
+
+    def _formatted(self, title=None, renumber=False, repeat=False, workers=1, 
+                   copy=True):
+        """Formatted text of the deck, card by card. The deck is always 
+        serialized, as edits made in Java lists or through `_e_object` are 
+        not seen by the edit counters. Cards which serialize the same as 
+        before are not formatted again.
+        """
+        text = self._print(renumber, copy)
+        changed = self._count_changed()
+        cache = self._card_cache
+        yield from cache.format(text, title, repeat, workers, 
+                                lattices=self._lattices())
+        self.write_stats = WriteStats(cache.cards, cache.reused, 
+                                      cache.formatted, changed)
+
+    def _lattices(self):
+        """FILL entries of the lattices given to `Cell.fill`, by cell ID. 
+        The formatter only uses them for cards holding the same entries."""
+        if len(_lattice_fills) == 0:
+            return {}
+        cells = [cell for cell in self.cells.values() if isinstance(cell, Cell)]
+        lattices = {}
+        for cell, key in zip(cells, _java_keys(cells)):
+            ids = _lattice_fills.get(key)
+            if ids is not None:
+                lattices[int(cell.name)] = ids
+        return lattices
+
+    def _count_changed(self):
+        """Number of cards edited or added since the previous call."""
+        revisions = {}
+        changed = 0
+        for k in _STORAGE:
+            storage = getattr(self, k)
+            for card in (storage.values() if isinstance(storage, dict) 
+                         else storage):
+                revision = edit_revision(card)
+                # The card is kept so its id is not reused.
+                previous = self._revisions.get(id(card))
+                if previous is None or previous[1] != revision:
+                    changed += 1
+                revisions[id(card)] = (card, revision)
+        self._revisions = revisions
+        return changed
+
+    def _clear_cache(self):
+        self._card_cache.clear()
+        self._revisions = {}
+
+    def _print(self, renumber=False, copy=True):
+        """Unformatted output of the serializer."""
+        self._materialize()
         if renumber is True:
             # CELLS
             i = 0
@@ -427,15 +1146,15 @@ class Deck():
                 i = i+1
                 self.materials[k].name = i
 
+        if copy is False:
+            return _print_in_place(self._deck)
         # Calling the serializer essentially "dumps" the deck to a string which
         # leaves the deck empty and useless. So instead, we serialize a copy of
         # the deck which leaves the original in working order.
         # Copying also removes comments assigned to hidden regions, which solves
         # some serialization oddities. Comments added directly with the API do
         # still appear.
-        deck_string = print_deck(deck_resource(self._deck))
-
-        return formatter(deck_string, title)
+        return print_deck(deck_resource(self._deck))
 
     def __repr__(self):
         string = 'MCNP Deck\n'
@@ -539,28 +1258,37 @@ class Deck():
         return string
 
     def get_universe(self, cell):
-        if cell.universe is not None:
-            u_id = cell.universe.name
-            if u_id in self.universes:
-                _universe = self.universes[u_id]
+        universe = cell.universe
+        if universe is not None:
+            u_id = universe.name
+            if u_id in self._universes:
+                _universe = self._universes[u_id]
                 _universe.add_only(cell)
             else:
                 _universe = UniverseList(name=u_id, cells=None)
-                if cell.universe.sign is not None:
-                    _universe.sign = cell.universe.sign
+                if universe.sign is not None:
+                    _universe.sign = universe.sign
                 _universe.add_only(cell)
-                self.universes[u_id] = _universe
-                _universe._e_object = cell.universe
+                self._universes[u_id] = _universe
+                _universe._e_object = universe
         # Makes a 0 universe for all non-assigned cells. Has no _e_object.
         else:
             u_id = 0
-            if u_id in self.universes:
-                _universe = self.universes[u_id]
+            if u_id in self._universes:
+                _universe = self._universes[u_id]
                 _universe.add_only(cell)
             else:
                 _universe = UniverseList(name=u_id, cells=None)
                 _universe.add_only(cell)
-                self.universes[u_id] = _universe
+                self._universes[u_id] = _universe
+        name = cell.name
+        self._cell_universes[name] = u_id
+        if name in self._cell_keys:
+            _unlisten(self, self._cell_keys.pop(name))
+        # Records of decks read with the Python backend have no Java cell.
+        if isinstance(cell, Cell):
+            key = self._cell_keys[name] = _java_keys([cell])[0]
+            _listen(self, key)
 
     def __add__(self, card):
         #new = Deck(self)
@@ -589,156 +1317,197 @@ class Deck():
     def add(self, card):
         """Add a card to the deck.
         """
+        self._materialize()
         # Ensure there are no nulls before seriaization.
         # _defaults must be added to each class.
         # This shouldn't be used anymore.
         defaults = getattr(card, '_defaults', None)
         if callable(defaults):
             card._defaults()
-        if isinstance(card, Cell):
+        storage = CARD_STORAGE.of(card)
+        if storage == 'cells':
             self.set_id(card, self.cells)
             # Because I'm just used to making the density negative.
             if card.density < 0:
                 card.density = abs(card.density)
                 card.density_unit = '-'
-            self._deck.cells.cells.addUnique(self.cells[card.name]._e_object)
+            self._insert('cells', self.cells[card.name]._e_object)
             self.get_universe(card)
-        elif isinstance(card, Surface):
+        elif storage == 'surfaces':
             self.set_id(card, self.surfaces)
-            self._deck.surfaces.surfaces.addUnique(self.surfaces
-                                                      [card.name]._e_object)
-        elif isinstance(card, Nuclide):
+            self._insert('surfaces', self.surfaces[card.name]._e_object)
+        elif storage == 'nuclides':
             _card = Material()
             _card += card
             self.set_id(_card, self.materials)
-            self._deck.data.materials.addUnique(self.materials
-                                                [card.name]._e_object)
-        elif isinstance(card, Material):
+            self._insert('materials', self.materials[card.name]._e_object)
+        elif storage == 'materials':
             self.set_id(card, self.materials)
-            self._deck.data.materials.addUnique(self.materials
-                                                [card.name]._e_object)
+            self._insert('materials', self.materials[card.name]._e_object)
             try:
                 if card.s_alpha_beta is not None:
                     self.mat_settings.append(card.s_alpha_beta)
-                    self._deck.data.settings.addUnique(card.s_alpha_beta._e_object)
+                    self._insert('settings', card.s_alpha_beta._e_object)
             except AttributeError:
                 card.s_alpha_beta = None
-        
-        elif isinstance(card, Transformation):
-            self._add_data(card, self.transformations)
-        elif isinstance(card, TallyABC):
-            self._add_data(card, self.tallies)
-        elif isinstance(card, GeometrySetting):
-            self._add_data(card, self.geom_settings)
-        elif isinstance(card, PhysicsSetting):
-            self._add_data(card, self.phys_settings)
-        elif isinstance(card, SourceSetting):
-            self._add_data(card, self.src_settings)
-        elif isinstance(card, VarianceReductionSetting):
-            self._add_data(card, self.vr_settings)
-        elif isinstance(card, TallySettingABC):
-            self._add_data(card, self.tally_settings)
-        elif isinstance(card, OutputSetting):
-            self._add_data(card, self.out_settings)
-        elif isinstance(card, TerminationSetting):
-            self._add_data(card, self.term_settings)
-        elif isinstance(card, MiscSetting):
-            self._add_data(card, self.misc_settings)
-        elif isinstance(card, MaterialSetting):
-            self._add_data(card, self.mat_settings)
         else:
-            self._add_data(card, self.settings)
+            self._add_data(card, getattr(self, storage))
 
     def _add_data(self, card, storage):
         try:
             self.set_id(card, storage)
-            self._deck.data.settings.addUnique(storage[card.name]._e_object)
+            self._insert('settings', storage[card.name]._e_object)
         except:
             storage.append(card)
-            self._deck.data.settings.addUnique(storage[-1]._e_object)
+            self._insert('settings', storage[-1]._e_object)
 
     def remove(self, card):
         """Remove a card from the deck.
         """
-        if isinstance(card, Cell):
+        storage = CARD_STORAGE.of(card)
+        if storage not in _STORAGE:
+            # Nuclides are added as a new material, but are not cards.
+            raise TypeError('Cannot remove a ' + type(card).__name__ 
+                            + ' from a deck. Remove the card holding it.')
+        self._materialize()
+        if storage == 'cells':
+            universe = None
             if card.universe is not None:
-                self.universes[card.universe.name].remove(card)
+                universe = self.universes[card.universe.name]
+            # Stop listening first, so clearing its universe does not call 
+            # back into the index.
+            key = self._cell_keys.pop(card.name, None)
+            if key is not None:
+                _unlisten(self, key)
+            if universe is not None:
+                universe.remove(card)
+            self._unindex_cell(card.name)
+            self._release_id(self.cells, card.name)
             del self.cells[card.name]
-            self._deck.cells.cells.remove(card._e_object)
-        elif isinstance(card, Surface):
+            self._discard('cells', card._e_object)
+        elif storage == 'surfaces':
+            self._release_id(self.surfaces, card.name)
             del self.surfaces[card.name]
             try:
-                self._deck.surfaces.surfaces.remove(card._e_object)
+                self._discard('surfaces', card._e_object)
             except:
                 pass
-        elif isinstance(card, Material):
+        elif storage == 'materials':
             if card.s_alpha_beta is not None:
                 self.mat_settings.remove(card.s_alpha_beta)
-                self._deck.data.settings.remove(card.s_alpha_beta._e_object)
+                self._discard('settings', card.s_alpha_beta._e_object)
+            self._release_id(self.materials, card.name)
             del self.materials[card.name]
-            self._deck.data.materials.remove(card._e_object)
-
-        elif isinstance(card, Transformation):
-            self._remove_data(card, self.transformations)
-        elif isinstance(card, TallyABC):
-            self._remove_data(card, self.tallies)
-        elif isinstance(card, GeometrySetting):
-            self._remove_data(card, self.geom_settings)
-        elif isinstance(card, PhysicsSetting):
-            self._remove_data(card, self.phys_settings)
-        elif isinstance(card, SourceSetting):
-            self._remove_data(card, self.src_settings)
-        elif isinstance(card, VarianceReductionSetting):
-            self._remove_data(card, self.vr_settings)
-        elif isinstance(card, TallySettingABC):
-            self._remove_data(card, self.tally_settings)
-        elif isinstance(card, OutputSetting):
-            self._remove_data(card, self.out_settings)
-        elif isinstance(card, TerminationSetting):
-            self._remove_data(card, self.term_settings)
-        elif isinstance(card, MiscSetting):
-            self._remove_data(card, self.misc_settings)
-        elif isinstance(card, MaterialSetting):
-            self._remove_data(card, self.mat_settings)
+            self._discard('materials', card._e_object)
         else:
-            self._remove_data(card, self.settings)
+            self._remove_data(card, getattr(self, storage))
 
     def _remove_data(self, card, storage):
         try:
             storage.remove(card)
         except AttributeError:
+            self._release_id(storage, card.name)
             del storage[card.name]
 
-        self._deck.data.settings.remove(card._e_object)
+        self._discard('settings', card._e_object)
 
     def add_all(self, cards):
         """Add a list of cards to the deck.
+
+        The Python dicts and lists are updated card by card, but each Java 
+        list of the deck receives all of its new cards in one call.
         """
-        for card in cards:
-            self.add(card)
+        with self._batched():
+            for card in cards:
+                self.add(card)
 
     def remove_all(self, cards):
         """Remove a list of cards from the deck.
+
+        Each Java list of the deck drops all of its cards in one call.
         """
-        for card in cards:
-            self.remove(card)
+        with self._batched():
+            for card in cards:
+                self.remove(card)
+
+    def _java_list(self, key):
+        """The Java list of the deck which holds cards of type `key`.
+        """
+        if key == 'cells':
+            return self._deck.cells.cells
+        elif key == 'surfaces':
+            return self._deck.surfaces.surfaces
+        elif key == 'materials':
+            return self._deck.data.materials
+        else:
+            return self._deck.data.settings
+
+    def _insert(self, key, e_object):
+        if self._batch is None:
+            self._java_list(key).addUnique(e_object)
+            mark_dirty()
+        else:
+            self._batch.setdefault(('add', key), []).append(e_object)
+
+    def _discard(self, key, e_object):
+        if self._batch is None:
+            self._java_list(key).remove(e_object)
+            mark_dirty()
+        else:
+            self._batch.setdefault(('remove', key), []).append(e_object)
+
+    @contextmanager
+    def _batched(self):
+        """Collect Java list updates and apply them per list on exit.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = {}
+        try:
+            yield
+        finally:
+            # Applied even after an error so Java matches the Python side.
+            batch, self._batch = self._batch, None
+            for (op, key), e_objects in batch.items():
+                if op == 'add':
+                    list_add_all(self._java_list(key), e_objects)
+                else:
+                    list_remove_all(self._java_list(key), e_objects)
 
     # Should be redundant with the IDManagerMixin class.
     def set_id(self, card, dict:dict):
         """To ensure every card is numbered.
         """
-        if card.name is None:
-            if len(dict) > 0:
-                new_name = max(dict) + 1
-            else:
-                new_name = 1
+        new_name = card.name
+        if new_name is None:
+            cls = type(card)
+            new_name = self._id_allocator(dict).next(*id_sequence(cls))
             card.name = new_name
-        else:
-            new_name = card.name
         if new_name in dict:
             print(str(type(card)) + ' Card with ID ' + str(new_name) 
                   + ' was overriden!')
-        dict[card.name] = card
+        dict[new_name] = card
+
+    def _id_allocator(self, storage):
+        """The `IDAllocator` for the IDs of one of the deck's dicts. Automatic 
+        IDs continue after the largest ID present when it is created.
+        """
+        allocator = self._id_allocators.get(id(storage))
+        if allocator is None or allocator.used is not storage:
+            if isinstance(storage, dict):
+                allocator = IDAllocator(storage)
+                if len(storage) > 0:
+                    allocator.set_next(max(storage) + 1)
+            else:
+                allocator = IDAllocator()
+            self._id_allocators[id(storage)] = allocator
+        return allocator
+
+    def _release_id(self, storage, name):
+        allocator = self._id_allocators.get(id(storage))
+        if allocator is not None and allocator.used is storage:
+            allocator.release(name)
 
     def get_all_surfaces(self):
         """
@@ -752,14 +1521,385 @@ class Deck():
         """
         surfaces = OrderedDict()
 
-        for c in self.cells:
-            cell = self.cells[c]
-            #print(cell, '\n')
-            if cell.region is not None:
-                #print('\nRegion:', cell.region)
-                surfaces = cell.region.get_surfaces(surfaces)
+        regions = fetch(self.cells.values(), ['region'])['region']
+        for region in regions:
+            if region is not None:
+                surfaces = region.get_surfaces(surfaces)
         return surfaces
 
+    def cells_table(self):
+        """Columns of cell data, read from Java in a few bulk requests.
+
+        Returns
+        -------
+        table : dict of numpy.ndarray
+            One entry per cell, in the order of `cells`: 'name', 'material' 
+            (0 for void), 'density' (NaN if unset), 'density_unit', 
+            'universe' (0 for none), 'fill' (universe ID, -1 for lattices, 
+            0 for none), 'temperature' (first value, NaN if unset) and an 
+            'imp:<particle>' column per particle with importances (NaN if 
+            unset).
+
+        Examples
+        --------
+        >>> table = deck.cells_table()
+        >>> table['name'][table['density'] > 10.0]
+        """
+        self._materialize()
+        cells = list(self.cells.values())
+        n = len(cells)
+        columns = fetch(cells, ['material', 'density', 'density_unit', 
+                                'universe', 'fill', 'lattice', 'temperature', 
+                                'importances'])
+        table = {'name': np.fromiter(self.cells, np.int64, n), 
+                 'material': _names(columns['material']), 
+                 'density': np.array([np.nan if rho is None else rho 
+                                      for rho in columns['density']], float), 
+                 'density_unit': np.array(['' if unit is None else str(unit) 
+                                           for unit in columns['density_unit']], 
+                                          str), 
+                 'universe': _names(columns['universe'])}
+        fills = [None if lattice is not None else fill 
+                 for fill, lattice in zip(columns['fill'], columns['lattice'])]
+        filled = [fill for fill in fills if fill is not None]
+        universes = iter(_names(fetch(filled, ['fill'])['fill']))
+        table['fill'] = np.array([-1 if lattice is not None and fill is not None 
+                                  else 0 if fill is None else next(universes) 
+                                  for fill, lattice 
+                                  in zip(columns['fill'], columns['lattice'])], 
+                                 np.int64)
+        table['temperature'] = np.array([tmp[0] if tmp else np.nan 
+                                         for tmp in columns['temperature']], 
+                                        float)
+        owners = [i for i, imps in enumerate(columns['importances']) 
+                  for _ in imps]
+        imps = [imp for imps in columns['importances'] for imp in imps]
+        values = fetch(imps, ['importance', 'particles'])
+        for i, value, particles in zip(owners, values['importance'], 
+                                       values['particles']):
+            for particle in particles:
+                key = 'imp:' + str(particle).lower()
+                if key not in table:
+                    table[key] = np.full(n, np.nan)
+                table[key][i] = value
+        return table
+
+    def surfaces_table(self):
+        """Columns of surface data, read from Java in a few bulk requests.
+
+        Returns
+        -------
+        table : dict of numpy.ndarray
+            One entry per surface, in the order of `surfaces`: 'name', 
+            'type' (the MCNPy class, e.g. 'Sphere'), 'boundary_type' and 
+            'transformation' (0 for none).
+        """
+        self._materialize()
+        surfaces = list(self.surfaces.values())
+        columns = fetch(surfaces, ['boundary_type', 'transformation'])
+        return {'name': np.fromiter(self.surfaces, np.int64, len(surfaces)), 
+                'type': np.array([type(surf).__name__ for surf in surfaces], 
+                                 str), 
+                'boundary_type': np.array(['' if b is None else str(b) 
+                                           for b in columns['boundary_type']], 
+                                          str), 
+                'transformation': _names(columns['transformation'])}
+
+    def materials_table(self):
+        """Nuclides of every material as columns, read from Java in a few bulk 
+        requests.
+
+        Returns
+        -------
+        table : dict of numpy.ndarray
+            One entry per nuclide, grouped by material in the order of 
+            `materials`: 'material', 'zaid', 'fraction' and 'unit'.
+        """
+        self._materialize()
+        lists = fetch(self.materials.values(), ['nuclides'])['nuclides']
+        owners = [name for name, nuclides in zip(self.materials, lists) 
+                  for _ in nuclides]
+        nuclides = [nuclide for nuclides in lists for nuclide in nuclides]
+        columns = fetch(nuclides, ['name', 'fraction', 'unit'])
+        return {'material': np.array(owners, np.int64), 
+                'zaid': np.array([str(zaid) for zaid in columns['name']], str), 
+                'fraction': np.array([np.nan if f is None else f 
+                                      for f in columns['fraction']], float), 
+                'unit': np.array(['' if unit is None else str(unit) 
+                                  for unit in columns['unit']], str)}
+
+    def to_arrays(self):
+        """`cells_table`, `surfaces_table` and `materials_table` by the names 
+        'cells', 'surfaces' and 'materials'.
+        """
+        return {'cells': self.cells_table(), 
+                'surfaces': self.surfaces_table(), 
+                'materials': self.materials_table()}
+
+    def from_arrays(self, cells=None, materials=None):
+        """Apply bulk edits from tables shaped like those of `to_arrays`.
+
+        Cells are picked by the 'name' column, which may hold any subset of 
+        the deck's cells. 'density' (negative for g/cm3, NaN for unset 
+        densities, which are left alone) and 'material' (0 for void) are 
+        applied. Densities go to Java in one pipelined request; materials 
+        are only set where they changed. 'temperature' 
+        and 'imp:<particle>' columns are applied with `set_cell_values` to 
+        the cells whose value changed (NaN removes it). Such cells lose 
+        their later temperatures and TMP IDs, as 'temperature' only holds 
+        the first. For materials, 
+        the 'fraction' column is applied to the nuclides in the order of 
+        `materials_table`, skipping NaN. Other columns are ignored.
+
+        Parameters
+        ----------
+        cells : dict of array_like, optional
+            Columns of `cells_table`.
+        materials : dict of array_like, optional
+            Columns of `materials_table`, covering all nuclides of each 
+            material listed.
+        """
+        self._materialize()
+        if cells is not None:
+            targets = [self.cells[int(name)] for name in cells['name']]
+            if 'density' in cells:
+                self.set_cell_values('density', cells['name'], 
+                                     cells['density'])
+            if 'material' in cells:
+                current = _names(fetch(targets, ['material'])['material'])
+                for cell, old, new in zip(targets, current, cells['material']):
+                    if old != new:
+                        cell.material = (None if new == 0 
+                                         else self.materials[int(new)])
+            self.update_material_densities(targets)
+            keys = [key for key in cells 
+                    if key == 'temperature' or key.startswith('imp:')]
+            if len(keys) > 0:
+                current = self.cells_table()
+                row = {name: i for i, name 
+                       in enumerate(current['name'].tolist())}
+                rows = [row[int(name)] for name in cells['name']]
+                names = np.asarray(cells['name'])
+                for key in keys:
+                    new = np.asarray(cells[key], float)
+                    old = current.get(key, np.full(len(row), np.nan))[rows]
+                    # Unchanged cells keep further temperatures and TMP IDs.
+                    changed = ~((new == old) | (np.isnan(new) & np.isnan(old)))
+                    if changed.any():
+                        self.set_cell_values(key, names[changed], new[changed])
+        if materials is not None and 'fraction' in materials:
+            owners = np.asarray(materials['material'])
+            fractions = np.asarray(materials['fraction'], float)
+            names = list(dict.fromkeys(owners.tolist()))
+            targets = [self.materials[name] for name in names]
+            lists = fetch(targets, ['nuclides'])['nuclides']
+            nuclides = []
+            for name, nuclide_list in zip(names, lists):
+                if np.count_nonzero(owners == name) != len(nuclide_list):
+                    raise ValueError('Material ' + str(name) + ' has ' 
+                                     + str(len(nuclide_list)) + ' nuclides')
+                nuclides.extend(nuclide_list)
+            # Rows are matched to nuclides in table order per material.
+            position = {name: i for i, name in enumerate(names)}
+            order = np.argsort([position[owner] for owner in owners.tolist()], 
+                               kind='stable')
+            fractions = fractions[order]
+            # Unset fractions read as NaN stay unset.
+            given = ~np.isnan(fractions)
+            nuclides = list(compress(nuclides, given))
+            fractions = fractions[given]
+            # Negative fractions are weight fractions, as with the setter.
+            for nuclide in compress(nuclides, fractions < 0):
+                nuclide.unit = 'WEIGHT'
+            call_all((nuclide, 'setFraction', (float(f),)) 
+                     for nuclide, f in zip(nuclides, np.abs(fractions)))
+            for nuclide in nuclides:
+                invalidate(nuclide, 'fraction')
+            for material in targets:
+                mark_dirty(material, 'nuclides')
+
+    def set_cell_values(self, feature, cells, values, particles=None, 
+                        data_card=False):
+        """Set one parameter of many cells at once. The values are pushed to 
+        Java in a few pipelined requests instead of several calls per cell.
+
+        Parameters
+        ----------
+        feature : str
+            'density' (negative for g/cm3), 'no_fission' (NONU, set for 
+            positive values), 'temperature' (TMP) or 'importance' (IMP). 
+            'imp:<particles>', e.g. 'imp:n' or 'imp:n,p' as in 
+            `cells_table`, is short for 'importance' with `particles`.
+        cells : array_like of int
+            Cell names.
+        values : array_like of float
+            One value per cell. Temperatures may also be rows of values for 
+            several times, which get the TMP IDs 1..k like the 
+            `Cell.temperature` setter with IDs. NaN removes a temperature or 
+            importance and leaves a density or NONU unchanged.
+        particles : iterable of str or mcnpy.Particle, optional
+            Particles of the importances.
+        data_card : bool, optional
+            Write the importances as one IMP card in the data block instead 
+            of an entry on each cell card, which gives a much smaller deck 
+            with `repeat=True`. `cells` must then hold every cell of the 
+            deck.
+
+        Examples
+        --------
+        >>> names = deck.cells_table()['name']
+        >>> deck.set_cell_values('temperature', names, temperatures)
+        >>> deck.set_cell_values('imp:n', names, np.ones(len(names)), 
+        ...                      data_card=True)
+        """
+        self._materialize()
+        if feature.startswith('imp:'):
+            particles = feature[4:].split(',')
+            feature = 'importance'
+        targets = [self.cells[int(name)] for name in cells]
+        values = np.asarray(values, float)
+        if len(values) != len(targets):
+            raise ValueError('Got ' + str(len(values)) + ' values for ' 
+                             + str(len(targets)) + ' cells')
+        if feature in ('density', 'no_fission'):
+            # Unset values read as NaN stay unset.
+            given = ~np.isnan(values)
+            targets = list(compress(targets, given))
+            values = values[given]
+        if feature == 'density':
+            for cell in compress(targets, values < 0):
+                cell.density_unit = 'G_CM3'
+            call_all((cell, 'setDensity', (float(rho),)) 
+                     for cell, rho in zip(targets, np.abs(values)))
+            features = ['setDensity']
+        elif feature == 'no_fission':
+            call_all((cell, 'setNoFission', (int(nonu > 0),)) 
+                     for cell, nonu in zip(targets, values))
+            features = ['setNoFission']
+        elif feature == 'temperature':
+            rows = values.reshape(len(targets), -1)
+            lists = call_all([(cell, 'getTemperature', ()) for cell in targets] 
+                             + [(cell, 'getTmpID', ()) for cell in targets])
+            call_all((java_list, 'clear', ()) for java_list in lists)
+            temperatures, ids = lists[:len(targets)], lists[len(targets):]
+            call_all((java_list, 'add', (float(t),)) 
+                     for java_list, row in zip(temperatures, rows) 
+                     for t in row if not np.isnan(t))
+            if rows.shape[1] > 1:
+                # Rows are the temperatures at times 1..k, as TMP1..TMPk.
+                call_all((java_list, 'add', (i,)) 
+                         for java_list, row in zip(ids, rows) 
+                         for i, t in enumerate(row, 1) if not np.isnan(t))
+            features = ['getTemperature', 'getTmpID']
+        elif feature == 'importance':
+            if particles is None:
+                raise ValueError('Importances need particles')
+            self._set_importances(targets, values, particles, data_card)
+            features = ['getImportances']
+        else:
+            raise ValueError('Cannot set ' + str(feature) + ' of many cells')
+        for name in features:
+            mark_dirty(targets, name)
+
+    def _set_importances(self, cells, values, particles, data_card=False):
+        """Replace the importances of `particles` in `cells`, see 
+        `set_cell_values`.
+        """
+        prototype = Cell.Importance(1.0, particles)
+        keys = {str(p).lower() 
+                for p in fetch([prototype], ['particles'])['particles'][0]}
+        cards = [card for card in self.vr_settings 
+                 if isinstance(card, CellImportances)]
+        covered = fetch(cards, ['particles'])['particles']
+        replaced = []
+        for card, card_particles in zip(cards, covered):
+            card_keys = {str(p).lower() for p in card_particles}
+            if card_keys <= keys and data_card:
+                replaced.append(card)
+            elif card_keys & keys:
+                raise ValueError('An IMP data card already sets importances '
+                                 'for ' + ', '.join(sorted(card_keys)))
+        if data_card:
+            order = [int(name) for name in 
+                     fetch(fetch_list(self._java_list('cells')), 
+                           ['name'])['name']]
+            given = dict(zip(_names(cells).tolist(), values))
+            if len(given) != len(order) or not all(name in given 
+                                                   for name in order):
+                raise ValueError('An IMP data card needs a value for every '
+                                 'cell')
+            card_values = [given[name] for name in order]
+            if np.isnan(card_values).any():
+                raise ValueError('An IMP data card needs a value for every '
+                                 'cell')
+        # Drop the cell card entries of these particles. Entries shared with 
+        # other particles are split with the setter.
+        lists = call_all((cell, 'getImportances', ()) for cell in cells)
+        entries = fetch(cells, ['importances'])['importances']
+        imps = [imp for cell_imps in entries for imp in cell_imps]
+        imp_particles = iter(fetch(imps, ['particles'])['particles'])
+        removals = []
+        split = []
+        for cell, java_list, cell_imps in zip(cells, lists, entries):
+            for imp in cell_imps:
+                imp_keys = {str(p).lower() for p in next(imp_particles)}
+                if imp_keys <= keys:
+                    removals.append((java_list, 'remove', (imp,)))
+                elif imp_keys & keys:
+                    split.append(cell)
+        call_all(removals)
+        for cell in dict.fromkeys(split):
+            kept = {p: imp for p, imp in cell.importances.items() 
+                    if str(p).lower() not in keys}
+            cell.importances = kept
+        if data_card:
+            for card in replaced:
+                self.remove(card)
+            card = CellImportances(particles=particles)
+            list_add_all(call_all([(card, 'getImportances', ())])[0], 
+                         [float(imp) for imp in card_values])
+            self.add(card)
+            return
+        # New entries are made by the EMF factory, one pipelined pass per 
+        # feature.
+        values_set = [(java_list, float(imp)) 
+                      for java_list, imp in zip(lists, values) 
+                      if not np.isnan(imp)]
+        e_class, shared = call_all([(prototype, 'eClass', ()), 
+                                    (prototype, 'getParticles', ())])
+        e_package, = call_all([(e_class, 'getEPackage', ())])
+        factory, = call_all([(e_package, 'getEFactoryInstance', ())])
+        created = call_all((factory, 'create', (e_class,)) 
+                           for _ in values_set)
+        call_all((imp, 'setImportance', (value,)) 
+                 for imp, (_, value) in zip(created, values_set))
+        imp_lists = call_all((imp, 'getParticles', ()) for imp in created)
+        call_all((imp_list, 'addAll', (shared,)) for imp_list in imp_lists)
+        call_all((java_list, 'add', (imp,)) 
+                 for imp, (java_list, _) in zip(created, values_set))
+
+    def update_material_densities(self, cells=None):
+        """Record every density each material is used at.
+
+        Parameters
+        ----------
+        cells : iterable of mcnpy.Cell, optional
+            Cells to inspect. Defaults to all cells in the deck.
+        """
+        if cells is None:
+            cells = self.cells.values()
+        cells = list(cells)
+        columns = fetch(cells, ['material', 'density'])
+        filled = [(cell, mat, rho) for cell, mat, rho 
+                  in zip(cells, columns['material'], columns['density']) 
+                  if mat is not None]
+        names = fetch([mat for _, mat, _ in filled], ['name'])['name']
+        for (cell, _, density), name in zip(filled, names):
+            rho = (density, cell.density_unit)
+            densities = self.material_densities.setdefault(int(name), [])
+            if rho not in densities:
+                densities.append(rho)
+
     def get_redundant_surfaces(self):
         """Return all of the topologically redundant surface IDs
 
@@ -0,0 +1,216 @@
+"""On-disk cache of parsed decks. `Deck.read(..., cache=True)` hashes the
+text handed to the parser together with the read options and the metamodel
+version. On a miss the parsed model is saved as an EMF binary resource, next
+to a JSON index of the cards which `Deck._read` would otherwise classify
+again. Later reads of the same text load the binary resource instead of
+parsing.
+
+Files are evicted least recently used first once the cache grows beyond
+`MCNPY_DECK_CACHE_SIZE` bytes (1 GB by default). The files live in the
+'decks' directory of `mcnpy.schema.cache_dir`.
+"""
+
+import json
+import os
+import time
+from hashlib import sha1
+from tempfile import NamedTemporaryFile
+
+from py4j.java_gateway import JavaClass
+from py4j.protocol import Py4JError
+
+from .schema import cache_dir, metamodel_version
+from .wrap import package, _java
+
+# Bump when the layout of the files changes.
+FORMAT = 1
+# Seconds after which a temporary file is taken to be left behind by a save 
+# which did not finish, rather than one still being written.
+TEMPORARY_AGE = 3600
+
+def cache_size():
+    """Largest total size of the cached files in bytes."""
+    return int(os.environ.get('MCNPY_DECK_CACHE_SIZE', 2**30))
+
+class DeckCache(object):
+    """Parsed decks by content hash.
+
+    Parameters
+    ----------
+    path : str
+        Directory holding the files.
+    max_size : int, optional
+        Largest total size of the files in bytes. Defaults to `cache_size`.
+    """
+
+    def __init__(self, path, max_size=None):
+        self.path = path
+        self.max_size = cache_size() if max_size is None else max_size
+        self.hits = 0
+        self.misses = 0
+        self._version = metamodel_version()
+
+    @classmethod
+    def default(cls):
+        """The cache in the user's cache directory."""
+        return cls(os.path.join(cache_dir(), 'decks'))
+
+    def key(self, text, **options):
+        """Key of a deck text read with `options`, e.g. `renumber`."""
+        digest = sha1()
+        digest.update(json.dumps([FORMAT, self._version,
+                                  sorted(options.items())]).encode())
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _files(self, key):
+        return (os.path.join(self.path, key + '.bin'),
+                os.path.join(self.path, key + '.json'))
+
+    def load(self, key):
+        """Return the Java deck and the card index stored under `key`, or
+        None."""
+        model, index = self._files(key)
+        try:
+            with open(index, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if data.get('format') != FORMAT or not os.path.isfile(model):
+            self.misses += 1
+            return None
+        try:
+            resource = self._resource(model)
+            resource.load(None)
+            deck = resource.getContents().get(0)
+        except Py4JError:
+            # E.g. a file cut short. It is replaced by the next store.
+            self.misses += 1
+            return None
+        # The modification time orders the files for eviction.
+        for path in (model, index):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        self.hits += 1
+        return deck, data['cards']
+
+    def store(self, key, deck, cards):
+        """Save a copy of the Java deck and its card index under `key`.
+
+        Parameters
+        ----------
+        key : str
+            From `key`.
+        deck : mcnpy._deck.Deck
+            The parsed deck. It is copied, so it stays in its resource.
+        cards : dict
+            Card index, see `Deck._card_index`.
+
+        Returns
+        -------
+        stored : bool
+            False if the deck could not be saved, e.g. to a read-only cache.
+        """
+        model, index = self._files(key)
+        try:
+            data = json.dumps({'format': FORMAT, 'cards': cards})
+        except (TypeError, ValueError):
+            # E.g. a density unit which is not a plain value.
+            return False
+        # Processes reading the same deck save it at the same time, so each
+        # writes its own files and moves them into place.
+        temporary = []
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            for _ in range(2):
+                with NamedTemporaryFile('w', dir=self.path, prefix=key,
+                                        suffix='.tmp', delete=False) as f:
+                    temporary.append(f.name)
+            gateway_client = _java(package)._gateway_client
+            copy = JavaClass('org.eclipse.emf.ecore.util.EcoreUtil',
+                             gateway_client).copy(_java(deck))
+            resource = self._resource(temporary[0])
+            resource.getContents().add(copy)
+            resource.save(None)
+            resource.getContents().clear()
+            with open(temporary[1], 'w') as f:
+                f.write(data)
+            os.replace(temporary[0], model)
+            os.replace(temporary[1], index)
+        except (OSError, Py4JError):
+            # A read-only cache only costs speed.
+            for path in temporary:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        """Remove the least recently used decks until the files fit into
+        `max_size`. Temporary files left behind by saves which did not
+        finish count too and are evicted on their own. Temporary files
+        younger than `TEMPORARY_AGE` may belong to a save in progress in
+        another process and are left alone."""
+        entries = {}
+        orphaned = time.time() - TEMPORARY_AGE
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if ext not in ('.bin', '.json', '.tmp'):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if ext == '.tmp':
+                if st.st_mtime > orphaned:
+                    continue
+                key = name
+            size, used, paths = entries.get(key, (0, 0, []))
+            entries[key] = (size + st.st_size, max(used, st.st_mtime_ns),
+                            paths + [path])
+        total = sum(size for size, used, paths in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k][1]):
+            if total <= self.max_size:
+                break
+            size, used, paths = entries[key]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def clear(self):
+        """Remove every cached deck."""
+        max_size, self.max_size = self.max_size, -1
+        try:
+            self.evict()
+        finally:
+            self.max_size = max_size
+
+    def _resource(self, path):
+        gateway_client = _java(package)._gateway_client
+        uri = JavaClass('org.eclipse.emf.common.util.URI',
+                        gateway_client).createFileURI(os.path.abspath(path))
+        return JavaClass(
+            'org.eclipse.emf.ecore.resource.impl.BinaryResourceImpl',
+            gateway_client)(uri)
+
+_default = []
+
+def default_cache():
+    """The `DeckCache` used by `Deck.read`, created on first use."""
+    if len(_default) == 0:
+        _default.append(DeckCache.default())
+    return _default[0]
@@ -1,35 +1,163 @@
-from re import search, compile, finditer, findall, IGNORECASE
+import gzip
+import lzma
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO, TextIOWrapper
+from locale import getpreferredencoding
+from itertools import chain
+from multiprocessing import get_all_start_methods, get_context
+from os import PathLike, cpu_count, fspath, stat
+from os.path import abspath, splitext
+from re import compile, finditer, IGNORECASE
+
+import numpy as np
+# Only needed for .zst decks.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .lexer import lex
+
+# Continuation lines start with 5 spaces.
+CONTINUATION = '\n     '
+_NON_SPACE = compile('\\S')
+
+def wrap(text, line_limit):
+    """Break `text` into lines of at most `line_limit` characters at spaces.
+    The first line keeps its leading space, continuation lines start with 
+    `CONTINUATION` and whitespace at the breaks is dropped. A word too long 
+    for a continuation line is kept whole on its own line.
+
+    Each break is found with one `rfind` over the line it ends, so the cost 
+    is linear in the length of `text`.
+
+    Parameters
+    ----------
+    text : str
+        Text of one card, without its `$` comment.
+    line_limit : int
+        Maximum number of characters per line.
+
+    Returns
+    -------
+    lines : list of str
+        The wrapped lines. All but the first start with `CONTINUATION`.
+    """
+    n = len(text)
+    if n <= line_limit:
+        return [text]
+    # The first line is broken at its last space. Without one, the card
+    # starts on a continuation line.
+    ws = text.rfind(' ', 0, line_limit)
+    lines = [text[:max(ws, 0)]]
+    width = line_limit - len(CONTINUATION)
+    m = _NON_SPACE.search(text, max(ws, 0))
+    while m is not None:
+        start = m.start()
+        if n - start <= width:
+            lines.append(CONTINUATION + text[start:])
+            break
+        ws = text.rfind(' ', start, start + width)
+        if ws < 0:
+            ws = text.find(' ', start + width)
+            if ws < 0:
+                lines.append(CONTINUATION + text[start:])
+                break
+        lines.append(CONTINUATION + text[start:ws])
+        m = _NON_SPACE.search(text, ws)
+    return lines
 
 def line_wrap(before_comment, comment, line_limit):
+    """Wrap a card at `line_limit` characters and append its `$` comment to 
+    the last line."""
     if (len(before_comment) > line_limit):
-        line = ''
-        ws_index = 0
-        while (len(before_comment) > line_limit):
-            for i in range(len(before_comment)):
-                if (before_comment[i] == ' '):
-                    ws_index = i
-                if (i >= line_limit-1):
-                    if (before_comment[ws_index:].lstrip() != ''):
-                        line = line + before_comment[:ws_index]
-                        before_comment = '\n     ' + before_comment[ws_index:].lstrip()
-                        ws_index = 5
-                    else:
-                        line = line + before_comment[:ws_index]
-                        before_comment = ''
-                    break
-        line = line + before_comment + comment
+        return ''.join(wrap(before_comment, line_limit)) + comment
+    return before_comment + comment
+
+def _repeat_runs(tokens):
+    """Rows of a 2D token array with runs of equal tokens written in the MCNP 
+    `nR` shorthand wherever that is shorter. Runs do not cross rows."""
+    rows, n = tokens.shape
+    change = np.ones(tokens.shape, dtype=bool)
+    change[:, 1:] = tokens[:, 1:] != tokens[:, :-1]
+    flat = change.ravel()
+    starts = np.flatnonzero(flat)
+    lengths = np.diff(np.append(starts, flat.size))
+    runs = tokens.ravel()[starts]
+    repeats = (lengths - 1).astype(str)
+    shorter = ((lengths > 1) & (np.char.str_len(repeats) + 2 
+                                < (lengths-1)*(np.char.str_len(runs)+1)))
+    plain = np.char.add(np.char.multiply(np.char.add(runs, ' '), lengths-1), 
+                        runs)
+    short = np.char.add(np.char.add(runs, ' '), np.char.add(repeats, 'R'))
+    texts = np.where(shorter, short, plain).tolist()
+    # Every row starts a run.
+    bounds = np.append(np.flatnonzero(starts % n == 0), len(texts)).tolist()
+    return [' '.join(texts[bounds[r]:bounds[r+1]]) for r in range(rows)]
+
+def lattice_fill(ids, indices, line_limit=120, repeat=False):
+    """Text of a lattice FILL array, one row per `j` with a `$ i = .., j = ..` 
+    comment and `C k = ..` comments between layers. Rows are built from the 
+    whole array at once instead of element by element.
+
+    Parameters
+    ----------
+    ids : array_like
+        Array of shape (k, j, i) holding universe IDs or other FILL entries 
+        such as `'2(3)'`.
+    indices : iterable of int
+        Lowest `i`, `j` and `k` index.
+    line_limit : int, optional
+        Line length of the card. Rows are wrapped 5 columns earlier.
+    repeat : bool, optional
+        Write runs of equal entries within a row as `u nR` where shorter.
+
+    Returns
+    -------
+    fill : str
+        The array, starting with a line break.
+    """
+    ids = np.asarray(ids)
+    if ids.ndim != 3 or ids.size == 0:
+        raise ValueError('Lattice FILL must be a non-empty 3D array.')
+    nk, nj, ni = ids.shape
+    i0, j0, k0 = [int(index) for index in indices][:3]
+    if ids.dtype.kind in 'iu':
+        tokens = _int_tokens(ids).reshape(nk*nj, ni)
+    else:
+        tokens = ids.astype(str).reshape(nk*nj, ni)
+    if repeat is True:
+        rows = _repeat_runs(tokens)
     else:
-        line = before_comment + comment
+        rows = [' '.join(row) for row in tokens.tolist()]
+    comments = ['$ i = (' + str(i0) + ' to ' + str(i0+ni-1) + '), j = ' 
+                + str(j0+j) for j in range(nj)]
 
-    return line
+    if (nk > 1):
+        fill = ['\nC    k = ' + str(k0) + ' (Bottom)\n     ']
+    else:
+        fill = ['\n     ']
+    for r in range(len(rows)):
+        k, j = divmod(r, nj)
+        fill.append(line_wrap(rows[r] + ' ', comments[j], line_limit-5))
+        if (j < nj-1):
+            fill.append('\n     ')
+        elif (k < nk-1):
+            fill.append('\nC    k = ' + str(k0+k+1) + '\n     ')
+    return ''.join(fill)
 
-def print_lattice(line, p, line_limit, comment):
+def print_lattice(line, p, line_limit, comment, repeat=False, ids=None):
+        """Wraps a lattice cell card with its FILL array laid out by 
+        `lattice_fill`. `ids` may hold the array of FILL entries the card 
+        was written from, see `Lattice.fill_ids`. If the card holds the same 
+        entries, they are used as they are instead of splitting the card."""
         dims = []
         indicies = []
         end = len(line)
         iters = finditer(p, line)
         q = 0
-        index = 0
         for m in iters:
             q = q+1
             if (q > 3):
@@ -41,79 +169,114 @@ def print_lattice(line, p, line_limit, comment):
 
         line_start = line_wrap(line[:end+1], comment, line_limit)
         line_new = line[end+1:len(line)]
-        lat = line_new.split()
 
-        if (dims[2] > 1):
-            lattice = '\nC    k = ' + str(indicies[2]) + ' (Bottom)\n     '
-        else:
-            lattice = '\n     '
-        for k in range(dims[2]):
-            for j in range(dims[1]):
-                lat_line = ''
-                for i in range(dims[0]):
-                    index = i + j*dims[0] + k*dims[0]*dims[1]
-                    lat_line = lat_line + lat[index] + ' '
-                comment = ('$ i = (' + str(indicies[0]) + ' to ' 
-                    + str(indicies[0]+i) + '), j = ' + str(indicies[1]+j))
-                lattice = lattice + line_wrap(lat_line, comment, line_limit-5)
-                if (j < dims[1]-1):
-                    lattice = lattice + '\n     '
-            if (k < dims[2]-1):
-                    lattice = lattice + '\nC    k = ' + str(indicies[2]+k+1) + '\n     '
-        if (len(lat) > index):
-            line_end = '\n     ' + line_wrap(' '.join(lat[index+1:]), '', line_limit-5)
-            if line_end.strip() == '':
-                line_end = ''
-            #line_end = line_wrap(line_end, '', line_limit)
+        if (min(dims[:3]) < 1):
+            raise ValueError('Invalid lattice indices.')
+        size = dims[0]*dims[1]*dims[2]
+        lattice = _known_fill(line_new, (dims[2], dims[1], dims[0]), ids)
+        if lattice is None:
+            lat = line_new.split()
+            if (len(lat) < size):
+                raise IndexError('Lattice FILL is too short.')
+            lattice = np.array(lat[:size]).reshape(dims[2], dims[1], dims[0])
+            lat = lat[size:]
         else:
+            lattice, rest = lattice
+            lat = rest.split()
+        lattice = lattice_fill(lattice, indicies, line_limit, repeat)
+        line_end = '\n     ' + line_wrap(' '.join(lat), '', line_limit-5)
+        if line_end.strip() == '':
             line_end = ''
         return line_start + lattice + line_end
 
+def _known_fill(text, shape, ids):
+    """Tuple(FILL entries, rest of `text`) if `text` starts with the integer 
+    entries of `ids` in order, otherwise None. The entries are compared as 
+    numbers, so neither `ids` nor `text` is joined or split."""
+    if ids is None or np.shape(ids) != shape:
+        return None
+    ids = np.asarray(ids)
+    if ids.dtype.kind not in 'iu':
+        return None
+    flat = ids.ravel().astype(np.int64)
+    # Where the entries end if `text` holds them separated by single spaces.
+    magnitude = np.abs(flat)
+    digits = np.ones(flat.size, dtype=np.int64)
+    for power in range(1, 19):
+        digits += magnitude >= 10**power
+    stop = int(digits.sum() + np.count_nonzero(flat < 0)) + flat.size - 1
+    if len(text) < stop or text[stop:stop+1] not in ('', ' '):
+        return None
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        values = np.fromstring(text[:stop], dtype=np.int64, sep=' ')
+    if not np.array_equal(values, flat):
+        return None
+    return _int_tokens(ids), text[stop:]
+
+def _int_tokens(ids):
+    """`ids.astype(str)` for integer arrays. Each distinct entry is converted 
+    once, and the array of text is only as wide as its longest entry."""
+    values, index = np.unique(ids, return_inverse=True)
+    names = values.astype(str)
+    names = names.astype('U' + str(max(len(name) for name in names)))
+    return names[index].reshape(ids.shape)
+
 def print_material(line, p, line_limit, comment):
     iters = finditer(p, line)
     q = 0
     end = len(line)
-    line_new = ''
+    line_new = []
     for m in iters:
         q = q+1
         if (q == 1):
             end = m.start()
-        line_new = line_new + line[m.start():m.end()]
-        if (line[m.end():].lstrip() != ''):
-            line_new = line_new + '\n     '
+        line_new.append(line[m.start():m.end()])
+        if (_NON_SPACE.search(line, m.end()) is not None):
+            line_new.append('\n     ')
             
     line_start = line_wrap(line[:end], comment, line_limit)
 
-    if (line_new == ''):
+    if (len(line_new) == 0):
         return line_start
     else:
-        return line_start + '\n     ' + line_new
+        return line_start + '\n     ' + ''.join(line_new)
 
-def preprocessor(filename):
+def preprocess_lines(lines):
     """Removes specific syntax features which parse correctly, but later serialize problematicly.
+    Generates the kept lines with line breaks.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        Lines of the deck without line breaks, e.g. from `iter_lines`.
     """
     #pos_hs = compile(' \+[0-9]')
-    sl_comment = compile('[$]')
-    #ml_comment = compile('^[C ].*', IGNORECASE)
-    ml_comment = compile('^C ', IGNORECASE)
-    
-    with open(filename, 'r') as input, open('modified_'+filename, 'w') as output:
-        deck = input.read().splitlines()
-        #end = False
-        string = ''
-        for line in deck:
-            if search(ml_comment, line):
-                line = ''
-            else:
-                if search(sl_comment, line):
-                    index = search(sl_comment, line).span()[0]
-                    if index != 0:
-                        line = line[:index]
-                string = string + line + '\n'
-        output.write(string)
-        
-    return 'modified_'+filename
+    for line in lines:
+        # 'C ' in column 1.
+        if line[:2] in ('C ', 'c '):
+            continue
+        index = line.find('$')
+        if index > 0:
+            line = line[:index]
+        yield line + '\n'
 
+def preprocessor(source):
+    """Removes specific syntax features which parse correctly, but later serialize problematicly.
+    Runs `preprocess_lines` in memory and writes no files.
+
+    Parameters
+    ----------
+    source : str, os.PathLike, bytes or file-like
+        See `open_deck`.
+
+    Returns
+    -------
+    text : str
+        The preprocessed deck.
+    """
+    with open_deck(source) as f:
+        return ''.join(deck_lines(f, preprocess=True))
 
 """8800 60  2.00000E-15      ((-8835  +8602  -8625)                 
                    :(-8817  +8604  +8625  -8630)          
@@ -124,92 +287,275 @@ c                   :(-8817  +8630  -8845  +8622  +8624)
 cmesh
 c4 """
 
-def deck_cleanup(inp):
+def cleanup_lines(lines):
+    """Fixes decks which MCNP accepts, but the parser does not. Adds a `$` to 
+    the title, drops blank lines and END statements after the input, adds 
+    missing and replaces `D` exponents, and comments out text before the 
+    first cell. Generates the cleaned text piece by piece.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        Lines of the deck with their line breaks, e.g. an open file.
+    """
+    lines = iter(lines)
+    for first in lines:
+        break
+    else:
+        return
+    # Need to add the $ title.
+    if first.startswith('$') is False:
+        if first.lower().startswith('continue'):
+            last = '$ \n' + first
+        else:
+            last = '$ ' + first
+    else:
+        last = first
+    yield last
+
+    # A lot of files have extra text after the end of the input.
+    # MCNP doesn't care, but the parser sure does.
+    # So we delete extraneous blank lines and other 'end' 
+    # statements. Comments should be left alone. Such lines are held back 
+    # until it is clear whether anything follows them.
+    held = []
+    cleanup = _Cleanup()
+    for i, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if i > 1 and (stripped in ('', 'end of input', 'end') 
+                      or stripped.lower().startswith('c ')):
+            held.append(line)
+            continue
+        for text in held:
+            yield cleanup(text)
+        held.clear()
+        last = cleanup(line)
+        yield last
+    for text in held:
+        if text.strip() not in ('', 'end of input', 'end'):
+            last = cleanup(text)
+            yield last
+
+    # Make sure there's at least one blank line at the end.
+    if last.endswith('\n') is False:
+        yield '\n'
+
+class _Cleanup(object):
+    """Per-line fixes of `cleanup_lines` after the title."""
+
     p_cell = compile('\s*\d+\s+\d+')
     p_cont = compile('\s*continue', IGNORECASE)
-    p_exp = compile('\d[-\+]\d')
-    p_dexp = compile('\dd[-\+]?\d', IGNORECASE)
-    new_text = ''
-    # Open the file and start the cleanup.
-    with open(inp, 'r') as f:
-        lines = f.readlines()
-        start = False
-        # Need to add the $ title.
-        if lines[0].startswith('$') is False:
-            if lines[0].lower().startswith('continue'):
-                new_text += '$ \n' + lines[0]
-            else:
-                new_text += '$ ' + lines[0]
-        else:
-            new_text += lines[0]
-        
-        # A lot of files have extra text after the end of the input.
-        # MCNP doesn't care, but the parser sure does.
-        # So we delete extraneous blank lines and other 'end' 
-        # statements. Comments should be left alone.
-        for i in range(len(lines)-1, 1, -1):
-            line = lines[i].strip()
-            if line == '' or line == 'end of input' or line == 'end':
-                lines.pop(i)
+
+    def __init__(self):
+        self.start = False
+
+    def __call__(self, line):
+        if (line.lower().startswith('c ') is False 
+            and line.startswith('$') is False):
+            # Fixes exponents without the 'E' or using 'D' instead of 'E'.
+            line = lex(line).fix_exponents()
+
+        # Some files have title sections that can't be validated.
+        # Comment out everything before a cell or continue card.
+        # Should fix most files.
+        if self.start is False:
+            cell = self.p_cell.search(line)
+            cont = self.p_cont.search(line)
+            if cell is not None or cont is not None:
+                self.start = True
+                return line
             elif line.lower().startswith('c '):
-                pass
-            else:
-                break
-        
-        # Exponents must have the 'E'.
-        for i in range(1, len(lines)):
-            exp = findall(p_exp, lines[i])
-            dexp = findall(p_dexp, lines[i])
-            if (lines[i].lower().startswith('c ') is False 
-                and lines[i].startswith('$') is False):
-                # Fixes exponents without the 'E'.
-                for e in exp:
-                    sign = 'E' + e[1]
-                    lines[i] = lines[i].replace(e, e[:1]+sign+e[-1])
-                # Fixes exponents using 'D' instead of 'E'.
-                for d in dexp:
-                    lines[i] = lines[i].replace(d, d[0]+'E' +d[2:])
-            
-            # Some files have title sections that can't be validated.
-            # Comment out everything before a cell or continue card.
-            # Should fix most files.
-            if start is False:
-                cell = search(p_cell, lines[i])
-                cont = search(p_cont, lines[i])
-                if cell is not None or cont is not None:
-                    start = True
-                    new_text += lines[i]
-                elif lines[i].lower().startswith('c '):
-                    new_text += lines[i]
-                else:
-                    new_text += 'C ' + lines[i]
-            elif (lines[i].lower().strip().startswith('#ifdef') 
-                    or lines[i].lower().strip().startswith('#else')
-                    or lines[i].lower().strip().startswith('#endif')):
-                    new_text += 'C ' + lines[i]
+                return line
             else:
-                new_text += lines[i]
-        
-        # Make sure there's at least one blank line at the end.
-        if new_text.endswith('\n') is False:
-            new_text += '\n'
-                
-    # Rename with '.mcnp' extension.
-    """if inp.endswith('.mcnp') is False:
-        new_name = 'cleaned_' + inp + '.mcnp'
+                return 'C ' + line
+        elif (line.lower().strip().startswith('#ifdef') 
+                or line.lower().strip().startswith('#else')
+                or line.lower().strip().startswith('#endif')):
+                return 'C ' + line
+        else:
+            return line
+
+def deck_cleanup(source):
+    """Fixes decks which MCNP accepts, but the parser does not. Runs 
+    `cleanup_lines` in memory and writes no files.
+
+    Parameters
+    ----------
+    source : str, os.PathLike, bytes or file-like
+        See `open_deck`.
+
+    Returns
+    -------
+    text : str
+        The cleaned deck.
+    """
+    with open_deck(source) as f:
+        return ''.join(deck_lines(f, cleanup=True))
+
+# File extensions and leading bytes of the supported compression formats.
+COMPRESSION = {'.gz': 'gzip', '.xz': 'xz', '.zst': 'zstd'}
+_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'), 
+          (b'\x28\xb5\x2f\xfd', 'zstd'))
+
+def compression(path):
+    """Compression format of a deck file by its extension, or None."""
+    return COMPRESSION.get(splitext(str(path))[1].lower())
+
+def open_text(path, mode='r'):
+    """Open a deck file as text. '.gz', '.xz' and '.zst' files are 
+    (de)compressed on the fly. Zstandard needs the `zstandard` package.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The file.
+    mode : {'r', 'w', 'a'}, optional
+        Text mode to open the file in.
+    """
+    fmt = compression(path)
+    if fmt == 'gzip':
+        return gzip.open(path, mode + 't', compresslevel=6)
+    if fmt == 'xz':
+        return lzma.open(path, mode + 't')
+    if fmt == 'zstd':
+        if zstandard is None:
+            raise ImportError('Reading and writing .zst decks requires the '
+                              + '"zstandard" package.')
+        f = open(path, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(f)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(f)
+        return TextIOWrapper(stream)
+    return open(path, mode)
+
+def _decompress(data):
+    """`data` decompressed if it starts like a compressed file."""
+    for magic, fmt in _MAGIC:
+        if data.startswith(magic):
+            if fmt == 'gzip':
+                return gzip.decompress(data)
+            if fmt == 'xz':
+                return lzma.decompress(data)
+            if zstandard is None:
+                raise ImportError('Reading .zst decks requires the '
+                                  + '"zstandard" package.')
+            return zstandard.ZstdDecompressor().decompressobj().decompress(
+                data)
+    return data
+
+def open_deck(source):
+    """Text stream of a deck given as a path, its bytes or a stream.
+
+    Parameters
+    ----------
+    source : str, os.PathLike, bytes or file-like
+        A str is a path. Pass the text of a deck as a `io.StringIO`. Streams 
+        may be text or binary. Compressed files (see `open_text`) and 
+        compressed bytes are decompressed.
+
+    Returns
+    -------
+    stream : file-like
+        Text stream with universal newlines. Close it when done.
+    """
+    if isinstance(source, (str, PathLike)):
+        return open_text(source, 'r')
+    if isinstance(source, (bytes, bytearray)):
+        text = source
     else:
-        new_name = 'cleaned_' + inp"""
-    new_name = inp + '_cleaned.mcnp'
-    
-    with open(new_name, 'w') as f:
-        f.write(new_text)
+        text = source.read()
+    if isinstance(text, (bytes, bytearray)):
+        text = _decompress(bytes(text)).decode('utf-8', 'replace')
+    return StringIO(text, newline=None)
 
-    return new_name
+def deck_lines(deck, preprocess=False, cleanup=False):
+    """Lines of a deck passed through `cleanup_lines` and `preprocess_lines`, 
+    generated lazily with their line breaks.
 
-def formatter(deck, title=None):
-    """Used to serialize the deck as a string. There are currently some spacing issues when making new deck objects.
-    Some ad-hoc corrections are made. Will address this later.
+    Parameters
+    ----------
+    deck : iterable of str
+        Lines of the deck with their line breaks, e.g. from `open_deck`.
+    preprocess : bool, optional
+        Strip comments which parse correctly, but serialize poorly.
+    cleanup : bool, optional
+        Fix decks which MCNP accepts, but the parser does not.
     """
+    lines = deck
+    if cleanup is True:
+        lines = cleanup_lines(lines)
+    if preprocess is True:
+        lines = preprocess_lines(iter_lines(lines))
+    return lines
+
+# Line boundaries recognized by `str.splitlines`.
+_LINE_BREAK = compile('\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+def iter_lines(deck):
+    """Lines of `deck` without their line breaks, one at a time.
+
+    Parameters
+    ----------
+    deck : str or iterable of str
+        Deck text, or its lines, e.g. an open file. Lines are split the same 
+        way as the joined text.
+    """
+    if isinstance(deck, str):
+        start = 0
+        for m in _LINE_BREAK.finditer(deck):
+            yield deck[start:m.start()]
+            start = m.end()
+        if start < len(deck):
+            yield deck[start:]
+    else:
+        for line in deck:
+            # Split like `str.splitlines` would on the joined text.
+            lines = _LINE_BREAK.split(line)
+            if len(lines) > 1 and lines[-1] == '':
+                lines.pop()
+            yield from lines
+
+def format_lines(deck, title=None, repeat=False, lattices=None):
+    """Formatted lines of a serialized deck, generated one at a time with 
+    their line breaks. Joined, they equal `formatter(deck, title)`.
+
+    Parameters
+    ----------
+    deck : str or iterable of str
+        Output of `print_deck`, or its lines.
+    title : str, optional
+        Title line used if the deck has none.
+    repeat : bool, optional
+        Shorten runs in lattice FILL arrays with the `nR` shorthand.
+    lattices : dict, optional
+        FILL entries of lattice cells by cell ID, see `Lattice.fill_ids`. 
+        Cards holding the same entries are laid out from these arrays.
+    """
+    lines = iter_lines(deck)
+    for first in lines:
+        break
+    else:
+        return
+    header = _title(first, title)
+    if header:
+        yield header
+    yield from _format_lines(chain([first], lines), repeat, lattices)
+
+def _title(first, title):
+    """Title line to add in front of a deck starting with `first`, or ''."""
+    if (first.startswith('$') == False):
+        if title is None:
+            return '$ This file was written with mcnpy\n'
+        elif title.startswith('$'):
+            return title + '\n'
+        else:
+            return '$ ' + title + '\n'
+    return ''
+
+def _format_lines(lines, repeat=False, lattices=None):
+    """Formats lines of a serialized deck one by one. Lines do not depend on 
+    each other, so any range of lines can be formatted on its own."""
     line_limit = 120
     # +/- int, a colon, and another +/- int
     p_lat = compile('-?\d+:-?\d+')
@@ -233,25 +579,13 @@ def formatter(deck, title=None):
     tmesh[' FM '] = '\nFM'
     tmesh[' +FM '] = '\n+FM'
 
-    d = deck.splitlines()
-    
-    if (d[0].startswith('$') == False):
-        if title is None:
-            string = '$ This file was written with mcnpy\n'
-        elif title.startswith('$'):
-            string = title + '\n'
-        else:
-            string = '$ ' + title + '\n'
-
-    else:
-        string = ''
-    for line in d:
-        tmesh_block = False
+    for line in lines:
         # Removes leading space.
         if (line.startswith('     ') == False):
             line = line.lstrip()
         # Check for $ comment to avoid changing comments.
-        index = line.find('$')
+        lexed = lex(line)
+        index = lexed.dollar
         if (index > -1):
             before_comment = line[:index]
             comment = line[index:]
@@ -260,26 +594,435 @@ def formatter(deck, title=None):
             comment = ''
 
         # Don't do anything for C comment lines.
-        if (before_comment.upper().startswith('C ') == False):# and line.upper().startswith('MODE') == False):
-            if before_comment.upper().startswith('TMESH'):
-                tmesh_block = True
-            # Only replacing '##' right now.
+        # Upper-casing once up front is the same as upper-casing before each
+        # replacement, as the replacements are upper case already.
+        upper = before_comment.upper()
+        if (upper.startswith('C ') == False):
+            before_comment = upper
             for k in chars:
-                before_comment = before_comment.upper().replace(k, chars[k])
+                before_comment = before_comment.replace(k, chars[k])
             # Because the serializer epic fails with TMESH...
-            if tmesh_block is True:
+            if upper.startswith('TMESH'):
                 for k in tmesh:
-                    before_comment = before_comment.upper().replace(k, tmesh[k])
-                
-            if search(p_fill, before_comment):
+                    before_comment = before_comment.replace(k, tmesh[k])
+
+            # Removing '##' is the only change above that could form a FILL.
+            if lexed.fill or ('##' in upper and p_fill.search(before_comment)):
                 try:
-                    line = print_lattice(before_comment, p_lat, line_limit, comment)
+                    line = print_lattice(before_comment, p_lat, line_limit, comment, 
+                                         repeat, _card_fill(lattices, 
+                                                            before_comment))
                 except:
                     line = line_wrap(before_comment, comment, line_limit)
             else:
                 line = line_wrap(before_comment, comment, line_limit)
-            if tmesh_block is True and 'ENDMD' in before_comment.upper():
-                tmesh_block = False
 
-        string = string + line + '\n'
-    return string
+        yield line + '\n'
+
+def _card_fill(lattices, line):
+    """Entry of `lattices` for the cell card `line`, or None."""
+    if not lattices:
+        return None
+    name = line.split(None, 1)[:1]
+    try:
+        return lattices.get(int(name[0]))
+    except (IndexError, ValueError):
+        return None
+
+def _chunks(lines, size):
+    """Lists of about `size` lines, each ending before a line which starts a 
+    card, a comment or a block."""
+    chunk = []
+    for line in lines:
+        if (len(chunk) >= size and line[:1] not in (' ', '\t') 
+            and chunk[-1].rstrip().endswith('&') is False):
+            yield chunk
+            chunk = []
+        chunk.append(line)
+    if len(chunk) > 0:
+        yield chunk
+
+def _format_chunk(lines, repeat=False):
+    return ''.join(_format_lines(lines, repeat))
+
+def _pool_context(method=None):
+    """Context of the formatting pools. Forking a process whose gateway 
+    client may be in use by other threads copies its sockets and locks 
+    mid-command, so workers come from a fork server, or are spawned, unless 
+    `method` asks for 'fork'. The fork server imports this module once, so 
+    workers do not each import mcnpy and start a gateway."""
+    if method is None:
+        if 'forkserver' in get_all_start_methods():
+            method = 'forkserver'
+        else:
+            method = 'spawn'
+    context = get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload([__name__])
+    return context
+
+def format_chunks(deck, title=None, repeat=False, workers=None, 
+                  chunk_lines=16384, mp_context=None):
+    """Formatted text of a serialized deck, in chunks of whole cards which 
+    are formatted by a pool of processes and generated in order. Joined, the 
+    chunks equal `formatter(deck, title)`.
+
+    Parameters
+    ----------
+    deck : str or iterable of str
+        Output of `print_deck`, or its lines.
+    title : str, optional
+        Title line used if the deck has none.
+    repeat : bool, optional
+        Shorten runs in lattice FILL arrays with the `nR` shorthand.
+    workers : int, optional
+        Number of processes. Defaults to the number of CPUs. With 1, chunks 
+        are formatted in this process.
+    chunk_lines : int, optional
+        Approximate number of lines per chunk.
+    mp_context : multiprocessing context or str, optional
+        Context or start method of the pool. Defaults to 'forkserver' where 
+        available, otherwise 'spawn'. 'fork' starts faster, but is only 
+        safe while no other thread uses the gateway.
+    """
+    lines = iter_lines(deck)
+    for first in lines:
+        break
+    else:
+        return
+    header = _title(first, title)
+    if header:
+        yield header
+    chunks = _chunks(chain([first], lines), chunk_lines)
+    if workers is None:
+        workers = cpu_count() or 1
+    if workers < 2:
+        for chunk in chunks:
+            yield _format_chunk(chunk, repeat)
+        return
+    if mp_context is None or isinstance(mp_context, str):
+        mp_context = _pool_context(mp_context)
+    with ProcessPoolExecutor(workers, mp_context=mp_context) as pool:
+        # A few chunks per worker are in flight. The rest of the deck is 
+        # only split once results are written.
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_format_chunk, chunk, repeat))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _format_cards(cards, repeat=False):
+    return [''.join(_format_lines(card, repeat)) for card in cards]
+
+class CardCache(object):
+    """Formatted text of the cards of the last deck formatted through it, 
+    keyed by their serialized text. Formatting the next version of the deck 
+    only formats cards which serialize differently.
+
+    Attributes
+    ----------
+    cards : int
+        Number of cards, including comment and blank lines, of the last 
+        deck.
+    reused : int
+        Cards of the last deck which were taken from the cache.
+    """
+
+    def __init__(self):
+        self._cards = {}
+        self._repeat = False
+        self.cards = 0
+        self.reused = 0
+
+    @property
+    def formatted(self):
+        """Cards of the last deck which had to be formatted."""
+        return self.cards - self.reused
+
+    def clear(self):
+        self._cards = {}
+
+    def format(self, deck, title=None, repeat=False, workers=1, 
+               chunk_lines=16384, mp_context=None, lattices=None):
+        """Formatted text of a serialized deck, one card at a time. Joined, 
+        it equals `formatter(deck, title, repeat)`.
+
+        Parameters
+        ----------
+        deck : str or iterable of str
+            Output of `print_deck`, or its lines.
+        title : str, optional
+            Title line used if the deck has none.
+        repeat : bool, optional
+            Shorten runs in lattice FILL arrays with the `nR` shorthand.
+        workers : int, optional
+            Format cards which are not cached in this many processes, see 
+            `format_chunks`. None uses every CPU.
+        chunk_lines : int, optional
+            Approximate number of lines sent to a process at a time.
+        mp_context : multiprocessing context or str, optional
+            Context or start method of the pool, see `format_chunks`.
+        lattices : dict, optional
+            FILL entries of lattice cells by cell ID, see `format_lines`. 
+            Only used for cards formatted in this process.
+        """
+        previous = self._cards if repeat == self._repeat else {}
+        cards = {}
+        self.cards = 0
+        self.reused = 0
+        lines = iter_lines(deck)
+        for first in lines:
+            break
+        else:
+            self._cards = cards
+            return
+        header = _title(first, title)
+        if header:
+            yield header
+        if workers is None:
+            workers = cpu_count() or 1
+        pool = None
+        if workers > 1:
+            if mp_context is None or isinstance(mp_context, str):
+                mp_context = _pool_context(mp_context)
+            pool = ProcessPoolExecutor(workers, mp_context=mp_context)
+        try:
+            # Cached text, or futures of missing cards, in deck order.
+            pending = deque()
+            missing = []
+            size = 0
+            for card in _chunks(chain([first], lines), 1):
+                self.cards += 1
+                key = '\n'.join(card)
+                text = cards.get(key)
+                if text is None:
+                    text = previous.get(key)
+                if text is not None:
+                    self.reused += 1
+                    cards[key] = text
+                    if len(pending) == 0 and len(missing) == 0:
+                        yield text
+                    else:
+                        pending.append((key, text))
+                    continue
+                if pool is None:
+                    text = cards[key] = ''.join(_format_lines(card, repeat, 
+                                                              lattices))
+                    yield text
+                    continue
+                missing.append(card)
+                pending.append((key, None))
+                size += len(card)
+                if size >= chunk_lines:
+                    pending.append((None, pool.submit(_format_cards, missing, 
+                                                      repeat)))
+                    missing = []
+                    size = 0
+                    for text in self._ready(pending, cards, 2*workers):
+                        yield text
+            if len(missing) > 0:
+                pending.append((None, pool.submit(_format_cards, missing, 
+                                                  repeat)))
+            for text in self._ready(pending, cards, 0):
+                yield text
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        self._cards = cards
+        self._repeat = repeat
+
+    @staticmethod
+    def _ready(pending, cards, in_flight):
+        """Yield texts from the front of `pending` until at most `in_flight` 
+        batches of missing cards remain. Placeholders are filled with the 
+        results of the batch which follows them."""
+        batches = sum(1 for key, item in pending if key is None)
+        while len(pending) > 0 and batches > in_flight:
+            # Everything up to the next batch waits for its results.
+            end = next(i for i, (key, item) in enumerate(pending) 
+                       if key is None)
+            texts = iter(pending[end][1].result())
+            for _ in range(end):
+                key, text = pending.popleft()
+                if text is None:
+                    text = cards[key] = next(texts)
+                yield text
+            pending.popleft()
+            batches -= 1
+
+class FileIndex(object):
+    """Cards of a deck file as left by `write_incremental`.
+
+    Attributes
+    ----------
+    path : str
+        The file.
+    stat : tuple
+        Size and modification time of the file after the write. The index 
+        is not used once the file changes.
+    texts : list of str
+        Formatted text of each card, comment and blank line.
+    slots : list of int
+        Bytes each card takes up in the file. A card which got shorter 
+        keeps its slot and is padded.
+    """
+
+    __slots__ = ('path', 'stat', 'texts', 'slots')
+
+    def __init__(self, path, texts, slots):
+        self.path = path
+        self.texts = texts
+        self.slots = slots
+        self.stat = _file_stat(path)
+
+def _file_stat(path):
+    try:
+        st = stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def _pad(text, size):
+    """`text` followed by `size` bytes which MCNP ignores: a trailing blank 
+    for one byte, comment lines otherwise."""
+    if size == 0:
+        return text
+    if size == 1:
+        return text[:-1] + ' \n' if text.endswith('\n') else text + ' '
+    lines = [text]
+    while size > 0:
+        n = min(size, 80)
+        if size - n == 1:
+            n = n - 1
+        lines.append('C' + ' '*(n - 2) + '\n')
+        size = size - n
+    return ''.join(lines)
+
+def write_incremental(path, pieces, index=None, encoding=None):
+    """Write formatted cards to a file, only rewriting what changed since 
+    the write which produced `index`.
+
+    Cards which are as long as before, or shorter, are overwritten in place 
+    and padded with blanks or comment lines. From the first card which 
+    grew, or where cards were added or removed, the rest of the file is 
+    written again. Without a usable index, e.g. if the file was changed in 
+    the meantime, the whole file is written.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Uncompressed deck file.
+    pieces : iterable of str
+        Formatted text card by card, e.g. from `CardCache.format`.
+    index : mcnpy.deck_formatter.FileIndex, optional
+        Index of the last write to `path`.
+    encoding : str, optional
+        Defaults to the locale's encoding, as for `open_text`. Line breaks 
+        are written as '\\n'.
+
+    Returns
+    -------
+    index : mcnpy.deck_formatter.FileIndex
+        Index of this write.
+    written : int
+        Number of bytes written.
+    """
+    path = abspath(fspath(path))
+    if compression(path) is not None:
+        raise ValueError('Compressed decks can not be patched: ' + path)
+    if encoding is None:
+        encoding = getpreferredencoding(False)
+    texts = list(pieces)
+    if (index is None or index.path != path 
+        or index.stat is None or index.stat != _file_stat(path)):
+        data = [text.encode(encoding) for text in texts]
+        with open(path, 'wb') as f:
+            f.write(b''.join(data))
+        return (FileIndex(path, texts, [len(d) for d in data]), 
+                sum(len(d) for d in data))
+    old = index.texts
+    slots = list(index.slots)
+    # Cards before `start` and after `end` are unchanged.
+    start = 0
+    limit = min(len(old), len(texts))
+    while start < limit and old[start] == texts[start]:
+        start += 1
+    end = 0
+    while (end < limit - start 
+           and old[len(old)-1-end] == texts[len(texts)-1-end]):
+        end += 1
+    written = 0
+    with open(path, 'r+b') as f:
+        offset = sum(slots[:start])
+        i = start
+        if len(old) == len(texts):
+            # Cards are patched one by one until one does not fit.
+            while i < len(texts) - end:
+                if old[i] != texts[i]:
+                    data = texts[i].encode(encoding)
+                    if len(data) > slots[i]:
+                        break
+                    data = _pad(texts[i], slots[i] - len(data)).encode(encoding)
+                    f.seek(offset)
+                    f.write(data)
+                    written += len(data)
+                offset += slots[i]
+                i += 1
+        if i < len(texts) - end or len(old) != len(texts):
+            # The rest of the file moves.
+            data = [text.encode(encoding) for text in texts[i:]]
+            slots[i:] = [len(d) for d in data]
+            f.seek(offset)
+            f.write(b''.join(data))
+            f.truncate()
+            written += sum(slots[i:])
+    return FileIndex(path, texts, slots), written
+
+def write_formatted(deck, stream, title=None, buffer_lines=4096, 
+                    repeat=False, workers=1, lattices=None):
+    """Format a serialized deck straight into a text stream. Only 
+    `buffer_lines` formatted lines are held in memory at a time.
+
+    Parameters
+    ----------
+    deck : str or iterable of str
+        Output of `print_deck`, or its lines.
+    stream : file-like
+        Text stream with a `write` method.
+    title : str, optional
+        Title line used if the deck has none.
+    buffer_lines : int, optional
+        Number of lines written per `write` call.
+    repeat : bool, optional
+        Shorten runs in lattice FILL arrays with the `nR` shorthand.
+    workers : int, optional
+        Format chunks of the deck in this many processes, see 
+        `format_chunks`. None uses every CPU.
+    lattices : dict, optional
+        FILL entries of lattice cells by cell ID, see `format_lines`. Only 
+        used when `workers` is 1.
+    """
+    if workers != 1:
+        for text in format_chunks(deck, title, repeat, workers):
+            stream.write(text)
+        return
+    chunk = []
+    for line in format_lines(deck, title, repeat, lattices):
+        chunk.append(line)
+        if len(chunk) >= buffer_lines:
+            stream.write(''.join(chunk))
+            chunk.clear()
+    if len(chunk) > 0:
+        stream.write(''.join(chunk))
+
+def formatter(deck, title=None, repeat=False, workers=1, lattices=None):
+    """Used to serialize the deck as a string. There are currently some spacing issues when making new deck objects.
+    Some ad-hoc corrections are made. Will address this later.
+    `workers` other than 1 formats chunks of the deck in a process pool, see `format_chunks`.
+    `lattices` holds FILL entries of lattice cells by cell ID, see `format_lines`.
+    """
+    if workers != 1:
+        return ''.join(format_chunks(deck, title, repeat, workers))
+    return ''.join(format_lines(deck, title, repeat, lattices))
@@ -0,0 +1,434 @@
+"""Pure-Python reader for MCNP decks. Splits a deck into logical cards and
+extracts the fields `mcnpy.Deck` indexes by (names, materials, densities,
+universes, etc.) without going through the Java parser.
+"""
+
+from re import compile, IGNORECASE
+
+from .lexer import lex, BLANK, COMMENT, CONTINUATION
+from .enum_keywords import DensityUnit
+
+# Data card names such as 'm1', '*tr2', 'imp:n', 'f4:n' or 'fmesh14:n'.
+p_data_name = compile(r'^([*+]?)([a-z]+)(\d*)(:\S*)?$', IGNORECASE)
+# Cell parameters that end the geometry specification.
+p_cell_param = compile(r'(?<!\S)(\*?(?:imp|vol|pwt|ext|fcl|wwn|dxc|nonu|pd|tmp'
+                       r'|u|trcl|lat|fill|elpt|cosy|bflcl|unc|mat|rho)\d*'
+                       r'(?::[a-z,/|]+)?)(?:\s*=\s*|\s+)', IGNORECASE)
+
+# Surface mnemonics that reserve extra IDs for their facets when renumbering.
+MACROBODY_FACETS = {'rpp': 6, 'box': 6, 'arb': 6, 'rcc': 3, 'rec': 3,
+                    'trc': 3, 'wed': 5, 'rhp': 8, 'hex': 8, 'ell': 1}
+
+# Data card keywords mapped to the `mcnpy.Deck` attribute they're stored in. 
+# Only a guess until the deck is materialized: the wrappers are then sorted 
+# by `mcnpy.deck.CARD_STORAGE`, which wins where the two differ.
+DATA_STORAGE = {}
+for _storage, _keywords in (
+        ('transformations', 'tr'),
+        ('tallies', 'f fmesh tmesh'),
+        ('geom_settings', 'vol area u lat fill trcl uran dm embed embee '
+                          'dawwg'),
+        ('mat_settings', 'mt mx otfdb totnu nonu awtab xs void pikmt mgopt '
+                         'drxs'),
+        ('phys_settings', 'mode phys tmp thtme cut elpt act lca lcb lcc lea '
+                          'leb fmult tropt unc cosyp cosy bfld bflcl field'),
+        ('src_settings', 'sdef si sp sb ds sc ssw ssr kcode ksrc kopts hsrc '
+                         'burn source'),
+        ('vr_settings', 'imp wwe wwn wwp wwg wwge wwgt mesh ext vect fcl dxt '
+                        'dd pd dxc bbrem esplt tsplt spabi pwt'),
+        ('tally_settings', 'fc e t c fq fm de df em tm cm cf sf fs sd fu tf '
+                           'ft spdtl notrn pert kpert ksen fip fir fic'),
+        ('out_settings', 'print prdmp ptrac mplot histp talnp dbcn lost '
+                         'files'),
+        ('term_settings', 'nps ctme stop'),
+        ('misc_settings', 'rand idum rdum zz')):
+    for _keyword in _keywords.split():
+        DATA_STORAGE[_keyword] = _storage
+
+class Card(object):
+    """One logical card with its continuation lines joined.
+
+    Attributes
+    ----------
+    block : int
+        0 for cells, 1 for surfaces and 2 for data.
+    text : str
+        The card without comments or continuation markers.
+    start : int
+        Offset of the card's first character in the source.
+    end : int
+        Offset just after the card's last line.
+    line : int
+        Line number of the first line of the card.
+    """
+
+    __slots__ = ('block', 'text', 'start', 'end', 'line')
+
+    def __init__(self, block, text, start, end, line):
+        self.block = block
+        self.text = text
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def __repr__(self):
+        return '(Card ' + str(self.block) + ': ' + self.text[:40] + ')'
+
+def split_cards(text):
+    """Split the text of a deck into its title and logical cards.
+
+    Parameters
+    ----------
+    text : str
+        The MCNP deck.
+
+    Returns
+    -------
+    title : str
+        The title card.
+    cards : list of mcnpy.deck_parser.Card
+        Cards in the order they appear.
+    """
+    lines = text.splitlines(True)
+    offset = 0
+    n = 0
+    # Skip the message block.
+    if lines and lines[0].lstrip().lower().startswith('message:'):
+        while n < len(lines) and lines[n].strip() != '':
+            offset += len(lines[n])
+            n += 1
+        offset += len(lines[n]) if n < len(lines) else 0
+        n += 1
+    title = lines[n].rstrip('\r\n') if n < len(lines) else ''
+    offset += len(title) + (len(lines[n]) - len(title) if n < len(lines) else 0)
+    n += 1
+
+    cards = []
+    block = 0
+    parts = None
+    start = 0
+    first = 0
+    end = 0
+    ampersand = False
+    for number, line in enumerate(lines[n:], n+1):
+        length = len(line)
+        lexed = lex(line.rstrip('\r\n'))
+        line = lexed.code
+        if lexed.kind == BLANK:
+            if parts is not None:
+                cards.append(Card(block, ' '.join(parts), start, end, first))
+                parts = None
+            block += 1
+            offset += length
+            if block > 2:
+                break
+            continue
+        if lexed.kind == COMMENT:
+            offset += length
+            continue
+        continued = ampersand or lexed.kind == CONTINUATION
+        ampersand = line.rstrip().endswith('&')
+        if ampersand:
+            line = line.rstrip()[:-1]
+        if continued and parts is not None:
+            parts.append(line.strip())
+        else:
+            if parts is not None:
+                cards.append(Card(block, ' '.join(parts), start, end, first))
+            parts = [line.strip()]
+            start = offset
+            first = number
+            # A CONTINUE run only has data cards.
+            if not cards and block == 0 and line.strip().lower() == 'continue':
+                block = 2
+        offset += length
+        end = offset
+    if parts is not None:
+        cards.append(Card(block, ' '.join(parts), start, end, first))
+
+    return title, cards
+
+def _float(value):
+    """Parse an MCNP number, including exponents without the 'E'."""
+    try:
+        return float(value)
+    except ValueError:
+        value = value.lower().replace('d', 'e')
+        for i in range(len(value)-1, 0, -1):
+            if value[i] in '+-' and value[i-1] not in 'e':
+                value = value[:i] + 'e' + value[i:]
+                break
+        return float(value)
+
+class TextCard(object):
+    """A card read without the Java parser.
+
+    Reading the fields parsed from the text is free. Any other attribute
+    materializes the deck through the Java parser and is forwarded to the
+    wrapper that replaces this card.
+    """
+
+    def __init__(self, deck, card, name=None):
+        self._deck = deck
+        self._text = card
+        self._card = None
+        self._name = name
+
+    @property
+    def name(self):
+        if self._card is not None:
+            return self._card.name
+        return self._name
+
+    @property
+    def text(self):
+        """The card as written, without comments."""
+        return self._text.text
+
+    def _materialized(self):
+        if self._card is None:
+            self._deck._materialize()
+        return self._card
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._materialized(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        elif self._card is None and name == 'name' and self._deck._is_reading:
+            self._name = value
+        else:
+            setattr(self._materialized(), name, value)
+
+    def __repr__(self):
+        return '(' + type(self).__name__[4:] + ' ' + str(self.name) + ')'
+
+class TextCell(TextCard):
+    """A cell card read without the Java parser."""
+
+    def __init__(self, deck, card):
+        tokens = card.text.split(None, 3)
+        super().__init__(deck, card, int(tokens[0]))
+        self._like = None
+        self._material = 0
+        self._material_card = None
+        self._density = None
+        params = ''
+        if len(tokens) > 1 and tokens[1].lower() == 'like':
+            self._like = int(tokens[2])
+            params = card.text.lower().split('but', 1)[-1]
+            region = ''
+        else:
+            self._material = int(tokens[1])
+            if self._material != 0:
+                rest = card.text.split(None, 3)
+                self._density = _float(rest[2])
+                region = rest[3] if len(rest) > 3 else ''
+            else:
+                region = card.text.split(None, 2)[2:]
+                region = region[0] if region else ''
+            m = p_cell_param.search(region)
+            if m is not None:
+                params = region[m.start():]
+                region = region[:m.start()]
+        self._region = region.strip()
+        self._params = {}
+        matches = list(p_cell_param.finditer(params))
+        for m, after in zip(matches, matches[1:] + [None]):
+            stop = len(params) if after is None else after.start()
+            self._params[m.group(1).lower()] = params[m.end():stop].strip()
+        # LIKE n BUT cards may change the material and density.
+        if 'mat' in self._params:
+            self._material = int(self._params['mat'])
+        if 'rho' in self._params:
+            self._density = _float(self._params['rho'])
+
+    @property
+    def material(self):
+        if self._card is not None:
+            return self._card.material
+        return self._material_card
+
+    @property
+    def density(self):
+        if self._card is not None:
+            return self._card.density
+        if self._density is None:
+            return 0.0
+        return abs(self._density)
+
+    @property
+    def density_unit(self):
+        if self._card is not None:
+            return self._card.density_unit
+        if self._density is not None and self._density < 0:
+            return DensityUnit.G_CM3
+        return DensityUnit.A_BCM
+
+    @property
+    def universe(self):
+        if self._card is not None:
+            return self._card.universe
+        if 'u' not in self._params:
+            return None
+        return TextUniverse(self._params['u'])
+
+    @property
+    def lattice(self):
+        if self._card is not None:
+            return self._card.lattice
+        return self._params.get('lat')
+
+    @property
+    def params(self):
+        """Cell parameters by lowercase keyword (e.g. `imp:n`, `u`, `fill`)."""
+        return self._params
+
+    @property
+    def region_text(self):
+        """The geometry specification as written."""
+        return self._region
+
+class TextUniverse(object):
+    """Universe keyword of a `TextCell`."""
+
+    def __init__(self, value):
+        value = value.strip()
+        self.sign = '-' if value.startswith('-') else None
+        self.name = abs(int(value))
+
+    def __str__(self):
+        return 'U' + str(self.name)
+
+    def __repr__(self):
+        return 'U' + str(self.name)
+
+class TextSurface(TextCard):
+    """A surface card read without the Java parser."""
+
+    def __init__(self, deck, card):
+        tokens = card.text.split()
+        name = tokens[0]
+        self._boundary = name[0] if name[0] in '*+' else None
+        super().__init__(deck, card, int(name.lstrip('*+')))
+        self._transformation = None
+        self._transformation_card = None
+        if tokens[1].lstrip('-').isdigit():
+            self._transformation = int(tokens[1])
+            tokens = tokens[1:]
+        self._mnemonic = tokens[1].lower()
+        self._coefficients = tokens[2:]
+
+    @property
+    def mnemonic(self):
+        """Lowercase surface mnemonic (e.g. `pz`, `rcc`)."""
+        return self._mnemonic
+
+    @property
+    def coefficients(self):
+        """Surface coefficients as floats."""
+        return [_float(c) for c in self._coefficients]
+
+    @property
+    def boundary_type(self):
+        if self._card is not None:
+            return self._card.boundary_type
+        return self._boundary
+
+    @property
+    def transformation(self):
+        if self._card is not None:
+            return self._card.transformation
+        return self._transformation_card
+
+class TextData(TextCard):
+    """A data card read without the Java parser."""
+
+    def __init__(self, deck, card):
+        token = card.text.split(None, 1)[0]
+        m = p_data_name.match(token)
+        if m is None:
+            keyword, name, particles, prefix = token.lower(), None, None, ''
+        else:
+            prefix, keyword, name, particles = m.groups()
+            keyword = keyword.lower()
+            name = int(name) if name != '' else None
+        super().__init__(deck, card, name)
+        self._keyword = keyword
+        self._prefix = prefix
+        self._particles = particles[1:].lower() if particles else None
+
+    @property
+    def keyword(self):
+        """Lowercase card keyword (e.g. `m`, `tr`, `f`, `kcode`)."""
+        return self._keyword
+
+    @property
+    def particles(self):
+        """Particle designator(s) following the ':' or None."""
+        return self._particles
+
+    @property
+    def storage(self):
+        """Name of the `mcnpy.Deck` attribute holding this card."""
+        if self._keyword == 'm' and self._prefix == '':
+            return 'materials'
+        storage = DATA_STORAGE.get(self._keyword, 'settings')
+        # Cards stored by ID need one.
+        if storage in ('transformations', 'tallies') and self._name is None:
+            return 'settings'
+        return storage
+
+class TextMaterial(TextData):
+    """A material card read without the Java parser."""
+
+    @property
+    def entries(self):
+        """Pairs of (ZAID, fraction) as written."""
+        tokens = self.text.split()[1:]
+        pairs = []
+        i = 0
+        while i < len(tokens)-1:
+            if '=' in tokens[i]:
+                i += 1
+                continue
+            pairs.append((tokens[i], _float(tokens[i+1])))
+            i += 2
+        return pairs
+
+def read_cards(deck, text):
+    """Build `TextCard` records for every card of an MCNP deck.
+
+    Parameters
+    ----------
+    deck : mcnpy.Deck
+        Deck the records belong to.
+    text : str
+        The MCNP deck.
+
+    Returns
+    -------
+    title : str
+        The title card.
+    cells : list of mcnpy.deck_parser.TextCell
+    surfaces : list of mcnpy.deck_parser.TextSurface
+    data : list of mcnpy.deck_parser.TextData
+    """
+    title, cards = split_cards(text)
+    cells = []
+    surfaces = []
+    data = []
+    for card in cards:
+        if card.block == 0:
+            cells.append(TextCell(deck, card))
+        elif card.block == 1:
+            surfaces.append(TextSurface(deck, card))
+        else:
+            record = TextData(deck, card)
+            if record.storage == 'materials':
+                record = TextMaterial(deck, card)
+            data.append(record)
+    return title, cells, surfaces, data
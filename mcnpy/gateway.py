@@ -0,0 +1,246 @@
+"""Connections to the metapy gateway for concurrent use.
+
+py4j opens one socket per concurrent caller and keeps idle sockets in the
+`deque` of its client. `GatewayPool` bounds how many are in use: every
+command sent by its client waits for a free slot, as do the connections it
+hands out to threads (`connection`) and coroutines (`aconnection`). It also
+runs blocking MCNPy calls such as `Deck.read` off the event loop (`run`).
+
+Hooks on the commands of a client (the pool's slots, `mcnpy.wrap.profile`'s 
+timing) are chained with `_route` and taken out again with `_unroute` in any 
+order, so the client gets its own `send_command` back once all are gone.
+
+A forked child inherits the sockets of its parent. Using them from both
+processes mixes up the answers, and closing them would shut them down for
+the parent as well. The idle sockets of every known client are therefore
+dropped in the child right after `os.fork`, so it opens its own.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from threading import BoundedSemaphore, Lock, RLock
+from weakref import WeakSet
+
+# Every client and pool which is reset after a fork.
+_clients = WeakSet()
+_pools = WeakSet()
+_lock = RLock()
+# Slots held by the running thread or task, so its own commands do not wait 
+# for another one.
+_held = ContextVar('held', default=0)
+
+def default_size():
+    """Default number of connections of a pool."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+class GatewayPool(object):
+    """Bounded pool of connections to one py4j gateway. Once created, every 
+    command sent through `gateway_client` holds one of `size` slots while it 
+    runs, so no more than `size` sockets are in use at a time.
+
+    Parameters
+    ----------
+    gateway_client : py4j.java_gateway.GatewayClient
+        Client of the gateway, e.g. `mcnpy.wrap.package._gateway_client`.
+    size : int, optional
+        Most connections in use at once. Defaults to `default_size`.
+
+    Examples
+    --------
+    >>> pool = mcnpy.gateway.pool()
+    >>> decks = await asyncio.gather(*[pool.run(mcnpy.Deck.read, path)
+    ...                                for path in paths])
+    """
+
+    def __init__(self, gateway_client, size=None):
+        self.gateway_client = gateway_client
+        self.size = default_size() if size is None else size
+        self._slots = BoundedSemaphore(self.size)
+        self._executor = None
+        self._lock = Lock()
+        # Every command of the client waits for a slot.
+        self._hook = _route(gateway_client, self._send)
+        track(gateway_client)
+        _pools.add(self)
+
+    def _send(self, send_command, command, *args, **kwargs):
+        with self._slot():
+            return send_command(command, *args, **kwargs)
+
+    @contextmanager
+    def _slot(self):
+        """Hold a slot, unless the caller holds one already."""
+        held = _held.get()
+        if held == 0:
+            self._slots.acquire()
+        token = _held.set(held + 1)
+        try:
+            yield
+        finally:
+            _held.reset(token)
+            if held == 0:
+                self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the calling thread. Blocks while all
+        `size` connections are in use.
+
+        A connection which raised is closed instead of being reused, as its
+        stream may hold unread answers.
+        """
+        with self._slot(), _checkout(self.gateway_client) as connection:
+            yield connection
+
+    @asynccontextmanager
+    async def aconnection(self):
+        """Async version of `connection`. Waiting for a free connection does
+        not block the event loop."""
+        held = _held.get()
+        if held == 0:
+            loop = asyncio.get_running_loop()
+            acquired = loop.run_in_executor(None, self._slots.acquire)
+            try:
+                await asyncio.shield(acquired)
+            except asyncio.CancelledError:
+                # The slot is still taken once the wait ends.
+                acquired.add_done_callback(lambda _: self._slots.release())
+                raise
+        # Commands sent by this task while it holds the slot use it.
+        token = _held.set(held + 1)
+        try:
+            with _checkout(self.gateway_client) as connection:
+                yield connection
+        finally:
+            _held.reset(token)
+            if held == 0:
+                self._slots.release()
+
+    async def run(self, function, *args, **kwargs):
+        """Call a blocking function, e.g. `Deck.read` or `Deck.serialize`,
+        in one of `size` threads and wait for it without blocking the event
+        loop. Each thread gets its own connection from py4j."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads(),
+                                          partial(function, *args, **kwargs))
+
+    def _threads(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.size, thread_name_prefix='mcnpy-gateway')
+            return self._executor
+
+    def close(self):
+        """Stop the threads of `run` and give the client back its own 
+        `send_command`. Connections stay with the client. `pool` creates a 
+        new pool for the client afterwards."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            hook, self._hook = self._hook, None
+        if hook is not None:
+            _unroute(self.gateway_client, hook)
+        with _lock:
+            if _default.get(id(self.gateway_client)) is self:
+                del _default[id(self.gateway_client)]
+        if executor is not None:
+            executor.shutdown()
+
+    def _after_fork(self):
+        # Threads and held slots do not survive a fork.
+        self._slots = BoundedSemaphore(self.size)
+        self._executor = None
+        self._lock = Lock()
+
+@contextmanager
+def _checkout(gateway_client):
+    """Check out a connection of `gateway_client`. A connection which raised 
+    is closed instead of being reused, as its stream may hold unread 
+    answers."""
+    connection = gateway_client._get_connection()
+    try:
+        yield connection
+    except BaseException:
+        connection.close(True)
+        raise
+    else:
+        gateway_client._give_back_connection(connection)
+
+def connection(gateway_client):
+    """Context manager checking out a connection of `gateway_client` for the 
+    calling thread, through its pool if one was created with `pool`. No 
+    pool is created otherwise."""
+    with _lock:
+        gateway_pool = _default.get(id(gateway_client))
+    if (gateway_pool is None 
+        or gateway_pool.gateway_client is not gateway_client):
+        return _checkout(gateway_client)
+    return gateway_pool.connection()
+
+def _route(gateway_client, around):
+    """Send every command of `gateway_client` through 
+    `around(send_command, command, *args, **kwargs)`, where `send_command` 
+    sends it on. Returns the hook to pass to `_unroute`."""
+    def hook(command, *args, **kwargs):
+        return around(hook._send_on, command, *args, **kwargs)
+    hook._send_on = gateway_client.send_command
+    gateway_client.send_command = hook
+    return hook
+
+def _unroute(gateway_client, hook):
+    """Take a hook of `_route` out of the commands of `gateway_client`, also 
+    if other hooks were chained after it."""
+    if gateway_client.send_command is hook:
+        gateway_client.send_command = hook._send_on
+        return
+    later = gateway_client.send_command
+    while getattr(later, '_send_on', None) is not None:
+        if later._send_on is hook:
+            later._send_on = hook._send_on
+            return
+        later = later._send_on
+
+def track(gateway_client):
+    """Drop the idle connections of `gateway_client` in children forked
+    from now on."""
+    with _lock:
+        _clients.add(gateway_client)
+
+def _after_fork():
+    global _lock
+    _lock = RLock()
+    for gateway_client in list(_clients):
+        # Not closed, that would shut the sockets down for the parent too.
+        gateway_client.deque.clear()
+    for pool in list(_pools):
+        pool._after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+_default = {}
+
+def pool(gateway_client=None, size=None):
+    """The `GatewayPool` of a gateway client, created on first use.
+
+    Parameters
+    ----------
+    gateway_client : py4j.java_gateway.GatewayClient, optional
+        Defaults to the client of the MCNPy package.
+    size : int, optional
+        Size of a new pool. Ignored if the pool exists.
+    """
+    if gateway_client is None:
+        from .wrap import package
+        gateway_client = package._gateway_client
+    with _lock:
+        gateway_pool = _default.get(id(gateway_client))
+        if (gateway_pool is None 
+            or gateway_pool.gateway_client is not gateway_client):
+            gateway_pool = GatewayPool(gateway_client, size)
+            _default[id(gateway_client)] = gateway_pool
+    return gateway_pool
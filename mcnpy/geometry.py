@@ -1,16 +1,65 @@
 import numpy as np
 from abc import ABC
 from random import random
+from weakref import WeakKeyDictionary
 from .tally import Tally
 from .region import Complement
 from .points import Vector
 from .mixin import IDManagerMixin
 from .variance_reduction import DeterministicTransport as Dt
-from .wrap import wrappers, overrides, subclass_overrides
+from .wrap import base_wrappers, register_overrides, subclass_overrides
+from .wrap import call_all, _java
 from .wrap import package as ePackage
+from .deck_formatter import lattice_fill
 from mcnpy.enum_keywords import DensityUnit
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
+
+# Decks holding a cell in their universe index, by the Java identity hash 
+# of the cell, and how many of their cells have that hash. They are told 
+# about changes of the cell's universe through `_universe_changed(cell, name)`.
+_universe_listeners = {}
+
+# FILL entries of lattices given to `Cell.fill`, by the Java identity hash 
+# of the cell, so they outlive the wrapper. `Deck.write` checks them against 
+# the written card before using them.
+_lattice_fills = {}
+
+def _java_keys(cells):
+    """Java identity hashes of cells, used as keys of `_universe_listeners` 
+    and `_lattice_fills`. 
+    Hashes which are not known yet are fetched in one batch."""
+    keys = []
+    missing = []
+    for cell in cells:
+        obj = _java(cell)
+        known = cell.__dict__.get('_java_key')
+        if known is None or known[0] is not obj:
+            missing.append((cell, obj))
+    if len(missing) > 0:
+        hashes = call_all((obj, 'hashCode', ()) for _, obj in missing)
+        for (cell, obj), key in zip(missing, hashes):
+            cell.__dict__['_java_key'] = (obj, key)
+    return [cell.__dict__['_java_key'][1] for cell in cells]
+
+def _listen(deck, key):
+    """Tell `deck` about universe changes of cells with the hash `key`."""
+    decks = _universe_listeners.get(key)
+    if decks is None:
+        decks = _universe_listeners[key] = WeakKeyDictionary()
+    decks[deck] = decks.get(deck, 0) + 1
+
+def _unlisten(deck, key):
+    """Undo one `_listen(deck, key)`."""
+    decks = _universe_listeners.get(key)
+    if decks is None or deck not in decks:
+        return
+    if decks[deck] > 1:
+        decks[deck] -= 1
+    else:
+        del decks[deck]
+    if len(decks) == 0:
+        del _universe_listeners[key]
 
 class GeometrySetting(ABC):
     """
@@ -230,6 +279,10 @@ class Cell(IDManagerMixin, CellBase):
                 self.lattice = '1'
             else:
                 self.lattice = '2'
+            try:
+                ids = np.array(fill.fill_ids())
+            except ValueError:
+                ids = None
         else:
             if type(fill).__name__ == 'UniverseList':
                 _fill.fill = fill._e_object
@@ -239,8 +292,13 @@ class Cell(IDManagerMixin, CellBase):
                 _fill.transform = transform
             if transformation is not None:
                 _fill.transformation = transformation
+            ids = None
         
         self._e_object.setFill(_fill)
+        if ids is not None:
+            _lattice_fills[_java_keys([self])[0]] = ids
+        elif len(_lattice_fills) > 0:
+            _lattice_fills.pop(_java_keys([self])[0], None)
 
     @importances.setter
     def importances(self, importances):
@@ -255,12 +313,23 @@ class Cell(IDManagerMixin, CellBase):
         for i in _imps:
             imp.append(Cell.Importance(i, _imps[i]))
             
-    """@property
+    @property
     def universe(self):
         return self._e_object.getUniverse()
 
     @universe.setter
-    def universe(self, universe):"""
+    def universe(self, universe):
+        self._e_object.setUniverse(universe)
+        if len(_universe_listeners) > 0:
+            key = _java_keys([self])[0]
+            decks = _universe_listeners.get(key)
+            if decks is not None and len(decks) == 0:
+                # Every deck listening was dropped.
+                del _universe_listeners[key]
+            elif decks is not None:
+                name = self.name
+                for deck in list(decks):
+                    deck._universe_changed(self, name)
 
 
     def __invert__(self):
@@ -1493,6 +1562,84 @@ class Lattice():
                 _lattice.append(lattice[i]._e_object)
         return _lattice
             
+    def fill_ids(self):
+        """The FILL array entries of the lattice, one per element.
+
+        Returns
+        -------
+        ids : numpy.ndarray
+            Array of shape (k, j, i). Integer arrays are returned as they 
+            are, anything else as an object array of strings like `1` or 
+            `1(2)`.
+
+        Raises
+        ------
+        ValueError
+            If `lattice` does not have one entry for every index of `i`, `j` 
+            and `k`, or an entry cannot be written to a FILL array.
+        """
+        shape = tuple(self.dims[::-1])
+        lattice = self.lattice
+        if isinstance(lattice, np.ndarray) and lattice.shape == shape:
+            if lattice.dtype.kind in 'iu':
+                return lattice
+        else:
+            # Nested sequences, or arrays with tuple(universe, transformation) 
+            # entries, are indexed one element at a time so the pairs are kept.
+            _lattice = np.empty(shape, dtype=object)
+            try:
+                for k in range(shape[0]):
+                    for j in range(shape[1]):
+                        for i in range(shape[2]):
+                            _lattice[k,j,i] = lattice[k][j][i]
+            except (IndexError, KeyError, TypeError):
+                raise ValueError('Lattice must have ' + ' x '.join(
+                    str(n) for n in shape) + ' (k, j, i) elements.') from None
+            lattice = _lattice
+        return np.frompyfunc(Lattice._fill_entry, 1, 1)(lattice)
+
+    def fill_array(self, line_limit=120, repeat=False):
+        """The lattice as the array of an MCNP FILL card. Universe IDs are 
+        taken from `lattice` directly, so numeric arrays are written without 
+        touching the elements one by one.
+
+        Parameters
+        ----------
+        line_limit : int, optional
+            Line length of the card.
+        repeat : bool, optional
+            Write runs of equal entries within a row with the `nR` shorthand.
+
+        Returns
+        -------
+        fill : str
+            The FILL array, starting with a line break.
+        """
+        return lattice_fill(self.fill_ids(), 
+                            (self.i[0], self.j[0], self.k[0]), line_limit, 
+                            repeat)
+
+    @staticmethod
+    def _fill_entry(element):
+        """FILL array entry for a universe ID, a tuple(universe ID, 
+        transformation ID), a `Lattice.Element` or a universe."""
+        if isinstance(element, Lattice.Element):
+            element = element.element
+        if isinstance(element, (tuple, list, np.ndarray)):
+            universe = Lattice._fill_entry(element[0])
+            if len(element) < 2 or element[1] == 0:
+                return universe
+            if isinstance(element[1], Transform):
+                raise ValueError('Transforms have no ID to write in a FILL '
+                                 + 'array. Use a Transformation.')
+            transformation = element[1]
+            if hasattr(transformation, 'name'):
+                transformation = transformation.name
+            return universe + '(' + str(int(transformation)) + ')'
+        if hasattr(element, 'name'):
+            return str(int(element.name))
+        return str(int(element))
+
     def rings(self):
         """For HEX lattices. Lattice must have equal X and Y dimensions. Returns a list of rings describing the lattice. 
         """
@@ -1986,7 +2133,7 @@ class UniverseList():
         del self.cells[cell.name]
         # This should ensure that references aren't broken when removing cells
         # from the universe. 
-        if self._e_object == cell.universe:
+        if len(self.cells) > 0 and self._e_object == cell.universe:
             key = list(self.cells.keys())[0]
             #self._e_object = self.cells[key].universe
             self.cells[key].universe = self._e_object
@@ -2052,10 +2199,7 @@ class Universes(UniversesBase):
         for k in kwargs:
             setattr(self, k, kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
+register_overrides(globals())
 
 subclass_overrides(Cell)
 subclass_overrides(Transform)
@@ -0,0 +1,129 @@
+"""Single-pass lexer for lines of MCNP decks.
+
+One regular expression classifies a line (blank, comment, continuation or
+card) and finds its first `$`, FILL keywords and exponents written without
+an `E` (`1.5-3`) or with a `D` (`2d+4`) in a single scan. The formatter, the
+cleanup of decks and the Python parser backend share it instead of running
+a search per feature.
+"""
+
+from re import compile, IGNORECASE
+
+BLANK = 'blank'
+COMMENT = 'comment'
+CONTINUATION = 'continuation'
+CARD = 'card'
+
+_TOKENS = compile(
+    # Only whitespace.
+    '^(?:(?P<blank>\\s*$)'
+    # 'C' in columns 1-5 followed by a blank or the end of the line.
+    '|(?P<comment> {0,4}c)(?= |$)'
+    # 5 leading blanks continue the previous card.
+    '|(?P<continuation> {5}))'
+    # Checking the first character up front skips most positions quickly.
+    '|(?=[$fd+-])(?:(?P<dollar>\\$)'
+    '|(?P<fill>fill)'
+    # A 'D' exponent letter, or a sign right after the mantissa.
+    '|(?<=\\d)(?P<exponent>d(?=[-+]?\\d)|(?=[-+]\\d)))', IGNORECASE)
+
+class Line(object):
+    """One lexed line of a deck.
+
+    Attributes
+    ----------
+    text : str
+        The line without its line break.
+    kind : str
+        `BLANK`, `COMMENT`, `CONTINUATION` or `CARD`.
+    dollar : int
+        Index of the first `$`, or -1.
+    fill : bool
+        Whether 'FILL' (in any case) appears before the first `$`.
+    exponents : list of int
+        Indices where an exponent letter is missing (the index of the sign)
+        or is a `D` (the index of the `D`), anywhere on the line.
+    """
+
+    __slots__ = ('text', 'kind', 'dollar', 'fill', 'exponents')
+
+    def __init__(self, text, kind, dollar, fill, exponents):
+        self.text = text
+        self.kind = kind
+        self.dollar = dollar
+        self.fill = fill
+        self.exponents = exponents
+
+    @property
+    def code(self):
+        """The line up to the first `$`."""
+        return self.text if self.dollar < 0 else self.text[:self.dollar]
+
+    @property
+    def comment(self):
+        """The `$` comment, or ''."""
+        return '' if self.dollar < 0 else self.text[self.dollar:]
+
+    def fix_exponents(self):
+        """The line with every exponent written with an `E`."""
+        if not self.exponents:
+            return self.text
+        text = self.text
+        parts = []
+        last = 0
+        for i in self.exponents:
+            parts.append(text[last:i])
+            parts.append('E')
+            # A 'D' is replaced, a sign is kept.
+            last = i + 1 if text[i] in 'dD' else i
+        parts.append(text[last:])
+        return ''.join(parts)
+
+    def __repr__(self):
+        return '(Line ' + self.kind + ': ' + self.text[:40] + ')'
+
+def lex(text):
+    """Lex one line of a deck.
+
+    Parameters
+    ----------
+    text : str
+        The line without its line break.
+
+    Returns
+    -------
+    line : mcnpy.lexer.Line
+    """
+    kind = CARD
+    dollar = -1
+    fill = False
+    exponents = []
+    for m in _TOKENS.finditer(text):
+        group = m.lastgroup
+        if group == 'exponent':
+            exponents.append(m.start())
+        elif group == 'dollar':
+            if dollar < 0:
+                dollar = m.start()
+        elif group == 'fill':
+            if dollar < 0:
+                fill = True
+        elif group == 'blank':
+            return Line(text, BLANK, -1, False, exponents)
+        elif group == 'comment':
+            kind = COMMENT
+        else:
+            kind = CONTINUATION
+    return Line(text, kind, dollar, fill, exponents)
+
+def lex_lines(lines):
+    """Lex lines of a deck one at a time.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        Lines without line breaks, e.g. from
+        `mcnpy.deck_formatter.iter_lines`.
+    """
+    for text in lines:
+        yield lex(text)
@@ -1,9 +1,10 @@
 from abc import ABC
-from .wrap import wrappers, overrides
+from .wrap import base_wrappers, register_overrides
+from .wrap import list_add_all, list_remove_all, mark_dirty
 from .mixin import IDManagerMixin
 from metapy.zaid_helper import element_to_zaid, zaid_to_element, library_check
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class MaterialSetting(ABC):
     """
@@ -90,11 +91,12 @@ class Material(IDManagerMixin, MaterialBase):
     def __iadd__(self, nuclide):
         #if self.unit is None:
         if isinstance(nuclide, list):
-            self.nuclides.extend(nuclide)
+            list_add_all(self.nuclides, nuclide)
         elif isinstance(nuclide, Material):
-            self.nuclides.extend(nuclide.nuclides)
+            list_add_all(self.nuclides, nuclide.nuclides)
         else:
             self.nuclides.addUnique(nuclide._e_object)
+        mark_dirty(self, 'nuclides')
         """else:
             if isinstance(nuclide, list):
                 for i in nuclide:
@@ -117,10 +119,10 @@ class Material(IDManagerMixin, MaterialBase):
 
     def __isub__(self, nuclide):
         if isinstance(nuclide, list):
-            for i in nuclide:
-                self.nuclides.remove(i)
+            list_remove_all(self.nuclides, nuclide)
         else:
             self.nuclides.remove(nuclide)
+        mark_dirty(self, 'nuclides')
         return self
 
     def __mul__(self, density):
@@ -213,8 +215,7 @@ class Material(IDManagerMixin, MaterialBase):
         _nucides = self._e_object.getNuclides()
         del _nucides[:]
         if isinstance(nuclides, (list, tuple)):
-            for i in nuclides:
-                _nucides.addUnique(i)
+            list_add_all(_nucides, nuclides)
         else:
             try:
                 for i in nuclides.nuclides():
@@ -652,7 +653,4 @@ class DiscreteReactionCrossSection(DiscreteReactionCrossSectionBase, MaterialSet
         for k in kwargs:
             setattr(self, k.lower(), kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
\ No newline at end of file
+register_overrides(globals())
@@ -22,7 +22,10 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+from bisect import bisect_right
+from heapq import heappop, heappush
 from numbers import Integral
+from threading import RLock
 from warnings import warn
 
 import numpy as np
@@ -57,12 +60,208 @@ class NoIDMixin:
     #TODO: Name them by class or keyword for dict storage.
     pass
 
+class IDAllocator:
+    """Hands out unique integer IDs for one namespace (e.g. cells or tallies).
+
+    Automatic IDs follow sequences `start, start + increment, ...` which 
+    resume where the last ID was taken, so allocation is O(1) amortized. IDs 
+    given back with `release` are reused first, smallest first. Reserved 
+    ranges are never handed out automatically but can still be claimed 
+    explicitly. All methods are thread-safe.
+
+    Parameters
+    ----------
+    used : set or dict, optional
+        IDs already taken. Sets are updated in place. Dicts (e.g. 
+        `Deck.cells`) are only read; their keys are filled by the caller.
+    """
+
+    def __init__(self, used=None):
+        self.used = set() if used is None else used
+        # IDs handed out or claimed through this allocator.
+        self._taken = set()
+        # Sorted, non-overlapping inclusive ranges.
+        self._reserved = []
+        # (start, increment) -> [next candidate, heap of released IDs]
+        self._sequences = {}
+        self._floor = None
+        self._lock = RLock()
+
+    def __contains__(self, uid):
+        return uid in self._taken or uid in self.used
+
+    def _take(self, uid):
+        self._taken.add(uid)
+        if isinstance(self.used, set):
+            self.used.add(uid)
+
+    def _sequence(self, start, increment):
+        try:
+            return self._sequences[(start, increment)]
+        except KeyError:
+            cursor = start
+            if self._floor is not None and self._floor > start:
+                cursor = start + -(-(self._floor - start)//increment)*increment
+            sequence = self._sequences[(start, increment)] = [cursor, []]
+            return sequence
+
+    def _reserved_stop(self, uid):
+        """End of the reserved range containing `uid` or None."""
+        i = bisect_right(self._reserved, (uid, float('inf'))) - 1
+        if i >= 0 and self._reserved[i][0] <= uid <= self._reserved[i][1]:
+            return self._reserved[i][1]
+        return None
+
+    def next(self, start=1, increment=1):
+        """Take the next free ID of the sequence `start, start + increment, 
+        ...`.
+
+        Parameters
+        ----------
+        start : int, optional
+            First ID of the sequence.
+        increment : int, optional
+            Step of the sequence, e.g. 10 for tallies of one type.
+
+        Returns
+        -------
+        int
+            The new ID.
+        """
+        with self._lock:
+            sequence = self._sequence(start, increment)
+            released = sequence[1]
+            while len(released) > 0:
+                uid = heappop(released)
+                if uid not in self and self._reserved_stop(uid) is None:
+                    self._take(uid)
+                    return uid
+            uid = sequence[0]
+            while True:
+                if uid in self:
+                    uid += increment
+                    continue
+                stop = self._reserved_stop(uid)
+                if stop is None:
+                    break
+                uid += -(-(stop + 1 - uid)//increment)*increment
+            self._take(uid)
+            sequence[0] = uid + increment
+            return uid
+
+    def claim(self, uid):
+        """Take a specific ID.
+
+        Returns
+        -------
+        bool
+            False if the ID was already taken.
+        """
+        with self._lock:
+            if uid in self:
+                return False
+            self._take(uid)
+            return True
+
+    def release(self, uid):
+        """Give an ID back so it can be handed out again."""
+        with self._lock:
+            self._taken.discard(uid)
+            if isinstance(self.used, set):
+                self.used.discard(uid)
+            for (start, increment), sequence in self._sequences.items():
+                if (uid >= start and (uid - start) % increment == 0 
+                    and uid < sequence[0]):
+                    heappush(sequence[1], uid)
+
+    def reserve(self, start, stop):
+        """Keep the IDs `start` to `stop` (inclusive) out of automatic 
+        allocation."""
+        with self._lock:
+            ranges = self._reserved + [(start, stop)]
+            ranges.sort()
+            merged = [ranges[0]]
+            for lo, hi in ranges[1:]:
+                if lo <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+                else:
+                    merged.append((lo, hi))
+            self._reserved = merged
+
+    def set_next(self, next_id):
+        """Continue every sequence from `next_id` or the first ID after it."""
+        with self._lock:
+            self._floor = next_id
+            sequences = list(self._sequences)
+            self._sequences.clear()
+            for start, increment in sequences:
+                self._sequence(start, increment)
+
+    def reset(self):
+        """Forget all taken, released and reserved IDs."""
+        with self._lock:
+            self._taken.clear()
+            if isinstance(self.used, set):
+                self.used.clear()
+            self._reserved = []
+            self._sequences.clear()
+            self._floor = None
+
+# Allocator of each class which holds a `used_ids` set.
+_allocators = {}
+
+def id_allocator(cls):
+    """The `IDAllocator` shared by `cls` and the classes using the same 
+    `used_ids` (e.g. all tally types)."""
+    for holder in cls.__mro__:
+        if 'used_ids' in holder.__dict__:
+            break
+    allocator = _allocators.get(holder)
+    # A replaced `used_ids` set starts a new namespace.
+    if allocator is None or allocator.used is not holder.used_ids:
+        allocator = _allocators[holder] = IDAllocator(holder.used_ids)
+    return allocator
+
+def _id_holder(cls):
+    """The class of `cls`'s MRO which defines `next_id`, or None."""
+    for holder in cls.__mro__:
+        if 'next_id' in holder.__dict__:
+            return holder
+    return None
+
+def id_sequence(cls):
+    """`(start, increment)` of the automatic IDs of `cls`.
+
+    `next_id` follows the IDs handed out, so the start is kept apart. 
+    Assigning `next_id` by hand starts the sequence over from there.
+    """
+    increment = getattr(cls, 'increment', 1)
+    holder = _id_holder(cls)
+    if holder is None:
+        return 1, increment
+    attributes = holder.__dict__
+    if '_id_first' not in attributes:
+        holder._id_first = holder.next_id
+    if attributes.get('_id_last') != holder.next_id:
+        holder._id_start = holder.next_id
+    return holder._id_start, increment
+
+def _id_classes(cls=None):
+    """All classes below `cls` (default `IDManagerMixin`)."""
+    for sub in (IDManagerMixin if cls is None else cls).__subclasses__():
+        yield sub
+        yield from _id_classes(sub)
+
 class IDManagerMixin:
     """A Class which automatically manages unique IDs.
     This mixin gives any subclass the ability to assign unique IDs through a
     'name' property and keeps track of which ones have already been
     assigned. Crucially, each subclass must define class variables 'next_id' and
     'used_ids' as they are used in the 'name' property that is supplied here.
+    IDs are handed out by the `IDAllocator` of the class holding 'used_ids', 
+    starting from 'next_id' in steps of 'increment' (default 1). 'next_id' 
+    is then set to the last ID handed out, and setting it by hand continues 
+    the sequence from there (`id_sequence`).
     """
 
     @property
@@ -75,41 +274,40 @@ class IDManagerMixin:
     @name.setter
     def name(self, uid):
         # The first time this is called for a class, we search through the MRO
-        # to determine which class actually holds next_id and used_ids. Since
-        # next_id is an integer (immutable), we can't modify it directly through
-        # the instance without just creating a new attribute
+        # to determine which class actually holds next_id and used_ids.
         try:
             cls = self._id_class
         except AttributeError:
             for cls in self.__class__.__mro__:
                 if 'next_id' in cls.__dict__:
                     break
-        try:
-            inc = cls.increment
-        except:
-            inc = 1
+        allocator = id_allocator(cls)
         if uid is None:
-            while cls.next_id in cls.used_ids:
-                cls.next_id += inc
-            self._e_object.setName(str(cls.next_id))
-            cls.used_ids.add(cls.next_id)
+            uid = allocator.next(*id_sequence(cls))
+            holder = _id_holder(cls)
+            if holder is not None:
+                holder.next_id = holder._id_last = uid
+            self._e_object.setName(str(uid))
         else:
             name = cls.__name__
             cv.check_type(f'{name} ID', uid, Integral)
             cv.check_greater_than(f'{name} ID', uid, 0, equality=True)
-            if uid in cls.used_ids:
+            if allocator.claim(uid) is False:
                 msg = f'Another {name} instance already exists with id={uid}.'
                 warn(msg, IDWarning)
-            else:
-                cls.used_ids.add(uid)
             self._e_object.setName(str(uid))
 
 
 def reset_auto_ids():
     """Reset counters for all auto-generated IDs"""
-    for cls in IDManagerMixin.__subclasses__():
-        cls.used_ids.clear()
-        cls.next_id = 1
+    for cls in _id_classes():
+        id_allocator(cls).reset()
+        attributes = cls.__dict__
+        if '_id_first' in attributes:
+            cls.next_id = attributes['_id_first']
+            for name in ('_id_first', '_id_start', '_id_last'):
+                if name in attributes:
+                    delattr(cls, name)
 
 
 def reserve_ids(ids, cls=None):
@@ -129,12 +327,39 @@ def reserve_ids(ids, cls=None):
         cls.used_ids |= set(ids)
 
 
+def reserve_id_range(start, stop, cls=None):
+    """Keep a range of IDs out of automatic allocation. Unlike `reserve_ids`, 
+    the IDs can still be assigned explicitly.
+    Parameters
+    ----------
+    start : int
+        First reserved ID.
+    stop : int
+        Last reserved ID.
+    cls : type or None
+        Class for which IDs should be reserved. If None, all classes that have 
+        auto-generated IDs will be used.
+    """
+    classes = _id_classes() if cls is None else [cls]
+    for allocator in {id(a): a for a in map(id_allocator, classes)}.values():
+        allocator.reserve(start, stop)
+
+
 def set_auto_id(next_id):
     """Set the next ID for auto-generated IDs.
+
+    Every sequence continues from `next_id` or the first ID after it which 
+    belongs to the sequence, so tallies keep their type (e.g. 104 for F4 
+    tallies after `set_auto_id(100)`). The `next_id` of each class is set 
+    to `next_id`.
+
     Parameters
     ----------
     next_id : int
         The next ID to assign to objects with auto-generated IDs.
     """
-    for cls in IDManagerMixin.__subclasses__():
-        cls.next_id = next_id
\ No newline at end of file
+    for cls in _id_classes():
+        id_allocator(cls).set_next(next_id)
+        if 'next_id' in cls.__dict__:
+            id_sequence(cls)
+            cls.next_id = cls._id_last = next_id
\ No newline at end of file
@@ -1,7 +1,7 @@
 from abc import ABC
-from mcnpy.wrap import wrappers, overrides, subclass_overrides
+from mcnpy.wrap import base_wrappers, register_overrides, subclass_overrides
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class OutputSetting(ABC):
     """
@@ -333,9 +333,6 @@ class ParticleTrackTally(ParticleTrackTallyBase):
         for k in kwargs:
             setattr(self, k, kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
+register_overrides(globals())
 
 subclass_overrides(ParticleTrack)
\ No newline at end of file
@@ -1,8 +1,8 @@
 from abc import ABC
-from mcnpy.wrap import wrappers, overrides
+from mcnpy.wrap import base_wrappers, register_overrides
 from .points import Point
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class PhysicsSetting(ABC):
     """
@@ -924,7 +924,4 @@ class CosyMap(CosyMapBase, PhysicsSetting):
         for k in kwargs:
             setattr(self, k.lower(), kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
\ No newline at end of file
+register_overrides(globals())
@@ -1,6 +1,6 @@
-from .wrap import wrappers, overrides
+from .wrap import base_wrappers, register_overrides
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class Point(PointBase):
     """
@@ -123,7 +123,4 @@ class Point_WS(Point_WSBase):
         for k in kwargs:
             setattr(self, k, kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
\ No newline at end of file
+register_overrides(globals())
@@ -26,10 +26,10 @@ from collections import OrderedDict
 from collections.abc import MutableSequence
 from abc import ABC
 
-from .wrap import wrappers, overrides
+from .wrap import base_wrappers, register_overrides
 import mcnpy
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class Region(RegionBase, ABC):
     """
@@ -407,7 +407,4 @@ class Complement(ComplementBase, Region):
         for region in self.node:
             region.remove_redundant_surfaces(redundant_surfaces)
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
\ No newline at end of file
+register_overrides(globals())
@@ -0,0 +1,282 @@
+"""On-disk cache of the wrapper schema. Generating a wrapper class asks its
+EClass for names, features, multiplicities, types, etc. over the gateway
+(`e_class_body`). The answers are recorded per EClass and saved together with
+the EClass names of the package, so later interpreters replay them instead of
+walking the EPackage again. Only calls which were never seen before reach
+Java.
+
+The cache file is keyed by the contents of the metamodel jars shipped with
+metapy and is ignored as soon as any of them changes. Set
+`MCNPY_SCHEMA_CACHE=0` to turn it off and `MCNPY_CACHE_DIR` to move it.
+"""
+
+import atexit
+import json
+import os
+from functools import lru_cache
+from glob import glob
+from hashlib import sha1
+from tempfile import NamedTemporaryFile
+from threading import RLock
+
+from py4j.java_gateway import JavaObject
+from py4j.java_collections import JavaArray, JavaList
+
+# Bump when the layout of the file changes.
+FORMAT = 1
+
+def cache_dir():
+    """Directory holding the schema files."""
+    path = os.environ.get('MCNPY_CACHE_DIR')
+    if path is None:
+        path = os.path.join(os.environ.get('XDG_CACHE_HOME',
+                                           os.path.expanduser('~/.cache')),
+                            'mcnpy')
+    return path
+
+@lru_cache(maxsize=None)
+def metamodel_version():
+    """Digest of the contents of the metamodel jars shipped with metapy, or
+    None if there are none to compare against. Computed once per process.
+
+    Sizes and modification times are not enough: reinstalling metapy can
+    bring a different jar with the same size and timestamp.
+    """
+    import metapy
+    root = os.path.dirname(os.path.abspath(metapy.__file__))
+    jars = sorted(glob(os.path.join(root, '**', '*.jar'), recursive=True))
+    if len(jars) == 0:
+        return None
+    digest = sha1()
+    for jar in jars:
+        digest.update((os.path.relpath(jar, root) + ':'
+                       + str(os.path.getsize(jar)) + ';').encode())
+        with open(jar, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+class Schema(object):
+    """Recorded EClass names and `e_class_body` calls of one EPackage.
+
+    Parameters
+    ----------
+    path : str
+        Cache file.
+    version : str
+        Metamodel version the file must match.
+
+    Attributes
+    ----------
+    classes : list of str
+        EClass names of the package, or None until the package was scanned.
+    bodies : dict
+        Recorded calls by EClass name.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.classes = None
+        self.bodies = {}
+        self.dirty = False
+        self._lock = RLock()
+
+    @classmethod
+    def load(cls, package_name):
+        """Open the schema of `package_name` for the installed metamodel.
+        Returns None if the cache is turned off or cannot be keyed."""
+        if os.environ.get('MCNPY_SCHEMA_CACHE', '1') == '0':
+            return None
+        version = metamodel_version()
+        if version is None:
+            return None
+        path = os.path.join(cache_dir(), 'schema-' + package_name + '-'
+                            + version[:16] + '.json')
+        schema = cls(path, version)
+        data = schema._read()
+        if data is not None:
+            schema.classes = data['classes']
+            schema.bodies = data['bodies']
+        atexit.register(schema.save)
+        return schema
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('format') != FORMAT or data.get('version') != self.version:
+            return None
+        return data
+
+    def save(self):
+        """Write the schema if anything was recorded. Bodies recorded by other
+        processes in the meantime are kept."""
+        with self._lock:
+            if self.dirty is False or self.classes is None:
+                return
+            data = self._read()
+            bodies = {} if data is None else data['bodies']
+            bodies.update(self.bodies)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with NamedTemporaryFile('w', dir=os.path.dirname(self.path),
+                                        delete=False) as f:
+                    json.dump({'format': FORMAT, 'version': self.version,
+                               'classes': self.classes, 'bodies': bodies}, f)
+                os.replace(f.name, self.path)
+            except OSError:
+                # A read-only cache only costs speed.
+                return
+            self.dirty = False
+
+    def e_class(self, name, resolve):
+        """Stand-in for the EClass `name` to pass to `e_class_body`.
+
+        Parameters
+        ----------
+        name : str
+            EClass name.
+        resolve : callable
+            Returns the live EClass. Only called for calls which have not been
+            recorded yet.
+        """
+        with self._lock:
+            calls = self.bodies.setdefault(name, {})
+        return SchemaNode(self, name, calls, _once(resolve))
+
+    def _encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return {'v': value}
+        if isinstance(value, (JavaList, JavaArray)):
+            items = [self._encode(item) for item in value]
+            return None if None in items else {'l': items}
+        if isinstance(value, JavaObject):
+            return {'o': {}}
+        # Python wrappers and the like are not part of the schema.
+        return None
+
+    def _decode(self, result, path, resolve):
+        if 'v' in result:
+            return result['v']
+        if 'o' in result:
+            return SchemaNode(self, path, result['o'], resolve)
+        return SchemaList(self._decode(item, path + '[' + str(i) + ']',
+                                       _once(_item(resolve, i)))
+                          for i, item in enumerate(result['l']))
+
+class SchemaList(list):
+    """Recorded Java list. Supports the `EList` calls used on features."""
+
+    def size(self):
+        return len(self)
+
+    def get(self, index):
+        return self[index]
+
+    def isEmpty(self):
+        return len(self) == 0
+
+class SchemaNode(object):
+    """Recorded stand-in for a metamodel object (EClass, EStructuralFeature,
+    EClassifier, ...). Method calls with plain arguments are answered from
+    the schema and recorded on a miss. It converts to the live object when
+    passed to Java."""
+
+    __slots__ = ('_schema', '_path', '_calls', '_resolve', '_children')
+
+    def __init__(self, schema, path, calls, resolve):
+        self._schema = schema
+        self._path = path
+        self._calls = calls
+        self._resolve = resolve
+        self._children = {}
+
+    def _get_object_id(self):
+        return self._resolve()._get_object_id()
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'Java':
+            raise AttributeError(name)
+        return _SchemaMethod(self, name)
+
+    def __str__(self):
+        return self.toString()
+
+    def __repr__(self):
+        return '<SchemaNode ' + str(self) + '>'
+
+class _SchemaMethod(object):
+
+    __slots__ = ('_node', '_name')
+
+    def __init__(self, node, name):
+        self._node = node
+        self._name = name
+
+    def __call__(self, *args):
+        node = self._node
+        keys = [_arg_key(arg) for arg in args]
+        live = lambda: getattr(node._resolve(), self._name)(*[
+            arg._resolve() if isinstance(arg, SchemaNode) else arg 
+            for arg in args])
+        if None in keys:
+            # Not a schema query, e.g. `isInstance` on a wrapper.
+            return live()
+        key = self._name + json.dumps(keys)
+        if key in node._children:
+            return node._children[key]
+        schema = node._schema
+        result = node._calls.get(key)
+        if result is None:
+            answer = live()
+            result = schema._encode(answer)
+            if result is None:
+                return answer
+            with schema._lock:
+                node._calls[key] = result
+                schema.dirty = True
+            resolve = lambda: answer
+        else:
+            resolve = _once(live)
+        value = schema._decode(result, node._path + '.' + key, resolve)
+        node._children[key] = value
+        return value
+
+def _arg_key(arg):
+    if arg is None or isinstance(arg, (bool, int, float, str)):
+        return [arg]
+    if isinstance(arg, SchemaNode):
+        return {'n': arg._path}
+    return None
+
+def _once(fn):
+    """Memoize a function without arguments."""
+    cache = []
+    def call():
+        if len(cache) == 0:
+            cache.append(fn())
+        return cache[0]
+    return call
+
+def _item(resolve, index):
+    return lambda: resolve()[index]
+
+class LiveObject(object):
+    """Looks up a Java object on first use, e.g. the EFactory of a package
+    which was not scanned in this interpreter. Nothing is recorded."""
+
+    __slots__ = ('_resolve',)
+
+    def __init__(self, resolve):
+        self._resolve = _once(resolve)
+
+    def _get_object_id(self):
+        return self._resolve()._get_object_id()
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'Java':
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
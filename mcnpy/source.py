@@ -1,12 +1,12 @@
 from abc import ABC
 from enum import Enum
-from .wrap import wrappers, overrides, subclass_overrides
+from .wrap import base_wrappers, register_overrides, subclass_overrides
 from .wrap import package as ePackage
 from metapy.zaid_helper import element_to_zaid, zaid_to_element
 from .points import Point
 import mcnpy
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 PARTICLE = {
     'COSMIC' : 'CR',
@@ -1768,10 +1768,7 @@ class ZeroDist(ZeroDistBase):
             setattr(self, k, kwargs[k])
 
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
+register_overrides(globals())
 
 subclass_overrides(SurfaceSource)
 subclass_overrides(SourceProbability)
@@ -26,13 +26,13 @@ from collections import OrderedDict
 from abc import ABC
 import numpy as np
 from .tally import Tally
-from .wrap import wrappers, overrides
+from .wrap import base_wrappers, register_overrides
 from .region import *
 from .points import Point, PPoint
 from .mixin import IDManagerMixin
 from mcnpy.enum_keywords import BoundaryType
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 def convert_surface(p_surf):
     """Convert from point surface to standard surface.
@@ -2133,7 +2133,4 @@ class Sheet(SheetBase):
     def __repr__(self):
         return str(self)
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
\ No newline at end of file
+register_overrides(globals())
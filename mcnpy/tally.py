@@ -2,10 +2,10 @@ import mcnpy as mp
 from abc import ABC
 from collections.abc import MutableSequence
 from .mixin import IDManagerMixin, NoIDMixin
-from .wrap import wrappers, overrides, subclass_overrides
+from .wrap import base_wrappers, register_overrides, subclass_overrides
 import mcnpy
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 def str_name(obj):
     if isinstance(obj, mp.Surface):
@@ -2580,10 +2580,7 @@ class Tally():
                 for k in kwargs:
                     setattr(self, k.lower(), kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
+register_overrides(globals())
 
 subclass_overrides(Tally, ignore=[Tally.Bin, Tally.Bins, Tally.Setting])
 subclass_overrides(Tally.Bin, ignore=[Tally.Bin.Level])
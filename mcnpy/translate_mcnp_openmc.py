@@ -108,14 +108,8 @@ def decompose_mcnp(deck):
         #print(deck.cells[k], region_str)
         cell.region = mp.Region.from_expression(region_str, deck.surfaces, deck.cells)
 
-        # Generate densities list
-        if cell.material is not None:
-            rho = (cell.density, cell.density_unit)
-            if cell.material.name in deck.material_densities:
-                if rho not in deck.material_densities[int(cell.material.name)]:
-                    deck.material_densities[int(cell.material.name)].append(rho)
-            else:
-                deck.material_densities[int(cell.material.name)] = [rho]
+    # Generate densities list
+    deck.update_material_densities()
 
 def make_openmc_cell(mcnp_cell, openmc_trans, openmc_surfs, openmc_mats, 
                     openmc_universes):
@@ -391,12 +385,14 @@ def mcnp_to_openmc(mcnp_deck: mp.Deck):
 
     # Translate surfaces.
     print('Translating Surfaces...')
-    for k in mcnp_deck.surfaces:
+    surf_trans = mp.wrap.fetch(mcnp_deck.surfaces.values(), 
+                               ['transformation'])['transformation']
+    for k, trans in zip(mcnp_deck.surfaces, surf_trans):
         surf = mcnp_deck.surfaces[k]
         openmc_surfaces[int(k)] = mcnp_surfs_to_openmc(surf)
         
-        if surf.transformation is not None:
-            tr = openmc_transformations[surf.transformation.name]
+        if trans is not None:
+            tr = openmc_transformations[trans.name]
             if tr[1] is not None:
                 openmc_surfaces[int(k)] = openmc_surfaces[int(k)].rotate(tr[1])
             openmc_surfaces[int(k)] = openmc_surfaces[int(k)].translate(tr[0])
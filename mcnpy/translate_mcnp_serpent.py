@@ -220,16 +220,9 @@ def apply_mcnp_cell_trans(mcnp_deck):
     """
 
     fill_trans = {}
+    # Generate densities list
+    mcnp_deck.update_material_densities()
     for cell in mcnp_deck.cells.values():
-        # Generate densities list
-        if cell.material is not None:
-            rho = (cell.density, cell.density_unit)
-            if cell.material.name in mcnp_deck.material_densities:
-                if rho not in mcnp_deck.material_densities[int(cell.material.name)]:
-                    mcnp_deck.material_densities[int(cell.material.name)].append(rho)
-            else:
-                mcnp_deck.material_densities[int(cell.material.name)] = [rho]
-
         trcl = cell.transformation
         names = {}
         # No TR card.
@@ -694,7 +687,9 @@ def mcnp_to_serpent(mcnp_deck: mp.Deck):
             pass
 
     print('Translating Surfaces...')
-    for surf in mcnp_deck.surfaces.values():
+    surfaces = list(mcnp_deck.surfaces.values())
+    surf_trans = mp.wrap.fetch(surfaces, ['transformation'])['transformation']
+    for surf, trans in zip(surfaces, surf_trans):
         if bc_type == 1:
             if surf.boundary_type == 'reflective' or surf.boundary_type == '*':
                 bc_type = 2
@@ -702,8 +697,8 @@ def mcnp_to_serpent(mcnp_deck: mp.Deck):
         serp_deck += serp_surf
         #serp_deck += mcnp_surfs_to_serpent(surf).surface()
         # Surface transformations
-        if surf.transformation is not None:
-            tr = mcnp_deck.transformations[surf.transformation.name]
+        if trans is not None:
+            tr = mcnp_deck.transformations[trans.name]
             disp, rot = decompose_mcnp_transformation(tr.transformation)
             strans = sp.Transform.Surface(unit=serp_surf, transform=sp.Transform.Data(displacement=disp, rot_matrix=rot))
             serp_deck += sp.Transformation.Surface(unit=serp_surf, transform=strans)
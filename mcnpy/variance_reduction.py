@@ -1,7 +1,7 @@
 from abc import ABC
-from .wrap import wrappers, overrides, subclass_overrides
+from .wrap import base_wrappers, register_overrides, subclass_overrides
 
-globals().update({name+'Base': wrapper for name, wrapper in wrappers.items()})
+globals().update(base_wrappers())
 
 class VarianceReductionSetting(ABC):
     """
@@ -758,10 +758,7 @@ class ExponentialTransform(ExponentialTransformBase):
         for k in kwargs:
             setattr(self, k, kwargs[k])
 
-for name, wrapper in overrides.items():
-    override = globals().get(name, None)
-    if override is not None:
-        overrides[name] = override
+register_overrides(globals())
 
 subclass_overrides(PhotonBias)
 subclass_overrides(WeightWindow)
@@ -1,11 +1,169 @@
 from py4j.protocol import register_output_converter, register_input_converter, REFERENCE_TYPE
+from py4j.protocol import (CALL_COMMAND_NAME, END_COMMAND_PART, RETURN_MESSAGE, 
+                           ERROR_ON_RECEIVE, Py4JNetworkError, get_command_part, 
+                           get_return_value, smart_decode)
+from py4j.java_gateway import JavaObject, JavaClass
+from py4j.java_collections import JavaList
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import RLock, local
+from time import perf_counter
+from types import CodeType
+import json
+import sys
 from metapy.gateway import ePackage
 from metapy.wrap import wrap_e_object, wrap_e_package, e_class_body, _subclass_overrides
+try:
+    from metapy.wrap import InternalEObject as _InternalEObject
+except ImportError:
+    _InternalEObject = None
+from .schema import Schema, LiveObject
+from . import gateway
+import numpy as np
 
-overrides = {}
+class WrapperRegistry(dict):
+    """EClass name to generated wrapper class.
+
+    Classes are generated the first time they are looked up instead of for 
+    the whole package at import. Iterating `keys` does not generate 
+    anything; `values` and `items` generate every class.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = RLock()
+
+    def defer(self, classes):
+        """Register the classes returned by `wrap_e_package`. Classes given 
+        as `_PendingClass` are generated on first lookup."""
+        for name, klass in classes.items():
+            if isinstance(klass, _PendingClass):
+                self._pending[name] = klass
+            else:
+                dict.__setitem__(self, name, klass)
+
+    def __missing__(self, name):
+        with self._lock:
+            if dict.__contains__(self, name):
+                return dict.__getitem__(self, name)
+            pending = self._pending[name]
+            klass = wrap_e_class(pending.e_class, pending.e_factory, 
+                                 pending.InternalEObject, overrides, 
+                                 package_name)
+            dict.__setitem__(self, name, klass)
+            del self._pending[name]
+            return klass
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self._pending
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def __iter__(self):
+        yield from list(dict.keys(self))
+        yield from list(self._pending)
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._pending)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+    def load(self):
+        """Generate every pending class."""
+        for name in list(self._pending):
+            self[name]
+
+class OverrideRegistry(WrapperRegistry):
+    """EClass name to the class used when wrapping Java objects. Falls back 
+    to the generated wrapper for classes without a custom implementation."""
+
+    def __init__(self, wrappers):
+        WrapperRegistry.__init__(self)
+        self._wrappers = wrappers
+
+    def __missing__(self, name):
+        klass = self._wrappers[name]
+        return self.setdefault(name, klass)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self._wrappers
+
+    def __iter__(self):
+        yield from list(dict.keys(self))
+        for name in self._wrappers:
+            if not dict.__contains__(self, name):
+                yield name
+
+    def __len__(self):
+        return dict.__len__(self) + sum(1 for name in self._wrappers 
+                                        if not dict.__contains__(self, name))
+
+    def load(self):
+        self._wrappers.load()
+
+class _PendingClass(object):
+    """Arguments for a wrapper class which has not been generated yet."""
+
+    __slots__ = ('e_class', 'e_factory', 'InternalEObject')
+
+    def __init__(self, e_class, e_factory, InternalEObject):
+        self.e_class = e_class
+        self.e_factory = e_factory
+        self.InternalEObject = InternalEObject
+
+def _defer_e_class(e_class, e_factory, InternalEObject, overrides, package_name):
+    """Stand-in for `wrap_e_class` while the package is scanned."""
+    return _PendingClass(e_class, e_factory, InternalEObject)
+
+def _code_names(code):
+    """Global and attribute names used by a code object and its nested code."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names.update(_code_names(const))
+    return names
+
+def base_wrappers():
+    """Return `{<Name>Base: wrapper}` for the wrappers the calling module 
+    refers to. Only those classes are generated.
+
+    Used as `globals().update(base_wrappers())` at the top of the modules 
+    which customize wrappers.
+    """
+    names = _code_names(sys._getframe(1).f_code)
+    return {name: wrappers[name[:-4]] for name in names 
+            if name.endswith('Base') and name[:-4] in wrappers}
+
+def register_overrides(namespace):
+    """Use the custom classes in a module namespace for wrapping Java objects 
+    of the EClass with the same name."""
+    for name, override in list(namespace.items()):
+        if override is not None and name in overrides:
+            overrides[name] = override
+
+def load_wrappers():
+    """Generate every wrapper class now, e.g. before forking workers."""
+    wrappers.load()
+
+wrappers = WrapperRegistry()
+overrides = OverrideRegistry(wrappers)
 package_name = 'mcnpy'
 numeric_ids = True
 package = ePackage(package_name)
+# Children forked later open their own connections. The pool bounding them 
+# is only created by `gateway.pool`, on first concurrent use.
+gateway.track(package._gateway_client)
+# Number of commands written to the gateway before reading the answers back.
+# Keeps the socket buffers from filling up on either end of a pipeline.
+batch_size = 256
 
 # Apply overrides to nested subclasses.
 # Can provide a custom naming prefix and classes to ignore.
@@ -17,14 +175,746 @@ class WrapperConverter(object):
         return type(object).__bases__[0].__name__ in overrides
 
     def convert(self, object, gateway_client):
-        return object._e_object
+        return _java(object)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'invalidations', 'enabled'])
+
+class _CacheState(object):
+    """Switch and counters shared by every cached wrapper."""
+    enabled = False
+    hits = 0
+    misses = 0
+    invalidations = 0
+    # Bumped by `cache_clear`, and when the cache is switched on, so stale
+    # per-wrapper caches drop themselves without counting as invalidations.
+    generation = 0
+    # Whether the wrapper classes hold an `_EObjectSlot`.
+    installed = False
+
+_cache = _CacheState()
+
+class CachedEObject(object):
+    """View of an EObject which serves `get`/`is` calls from memory.
+
+    Setters write through to Java and count as an edit of their feature
+    (`mark_dirty`), which drops that feature from every view. py4j hands out
+    a new object for each reference to the same Java object, so the views of
+    the written object can not be told apart from the others. The other
+    features stay cached. `eSet` and `eUnset` don't name the feature and
+    drop every cached value.
+    """
+
+    __slots__ = ('_obj', '_values', '_generation', '_flushes')
+
+    def __init__(self, obj):
+        self._obj = obj
+        # Getter name to (value, edits of the feature when it was read).
+        self._values = {}
+        self._generation = _cache.generation
+        self._flushes = _edits.flushes
+
+    def _check(self):
+        if self._generation != _cache.generation:
+            self._values.clear()
+            self._generation = _cache.generation
+        elif self._flushes != _edits.flushes:
+            _cache.invalidations += len(self._values)
+            self._values.clear()
+        self._flushes = _edits.flushes
+
+    def _get(self, getter):
+        """Cached value of a getter, or `_missing`."""
+        entry = self._values.get(getter)
+        if entry is None:
+            return _missing
+        if entry[1] != _edits.features.get(_feature(getter), 0):
+            del self._values[getter]
+            _cache.invalidations += 1
+            return _missing
+        return entry[0]
+
+    def __getattr__(self, name):
+        member = getattr(self._obj, name)
+        if name.startswith(('get', 'is')):
+            def getter(*args):
+                if len(args) > 0:
+                    return member(*args)
+                self._check()
+                value = self._get(name)
+                if value is _missing:
+                    _cache.misses += 1
+                    stamp = _edits.features.get(_feature(name), 0)
+                    value = member()
+                    self._values[name] = (value, stamp)
+                else:
+                    _cache.hits += 1
+                return value
+            return getter
+        elif name.startswith(('set', 'unset')) or name in ('eSet', 'eUnset'):
+            feature = None if name in ('eSet', 'eUnset') else name
+            def setter(*args):
+                try:
+                    return member(*args)
+                finally:
+                    mark_dirty(feature=feature)
+            return setter
+        return member
+
+    def __eq__(self, other):
+        return self._obj == _java(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._obj)
+
+    def __str__(self):
+        return str(self._obj)
+
+    def __repr__(self):
+        return repr(self._obj)
+
+_missing = object()
+
+class _EObjectSlot(object):
+    """Holds a wrapper's py4j object and hands out a `CachedEObject` view 
+    while caching is enabled.
+
+    Only installed on the wrapper classes while the cache or a profile is 
+    active (`_install_slots`). Otherwise `_e_object` is a plain attribute.
+    """
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            obj = instance.__dict__['_e_object']
+        except KeyError:
+            raise AttributeError('_e_object')
+        if _cache.enabled is True:
+            view = instance.__dict__.get('_e_view')
+            if view is None or view._obj is not obj:
+                view = instance.__dict__['_e_view'] = CachedEObject(obj)
+            obj = view
+        if len(_profiles) > 0:
+            return ProfiledEObject(obj, owner.__name__)
+        return obj
+
+    def __set__(self, instance, value):
+        instance.__dict__['_e_object'] = _java(value)
+        instance.__dict__.pop('_e_view', None)
+
+def _install_slots():
+    """Add or remove the `_EObjectSlot` of every generated wrapper class, so 
+    wrappers pay for the descriptor only while the cache or a profile is 
+    active."""
+    with wrappers._lock:
+        needed = _cache.enabled is True or len(_profiles) > 0
+        if needed == _cache.installed:
+            return
+        if needed:
+            # Views kept from an earlier session missed the edits made 
+            # without the slot.
+            _cache.generation += 1
+        for klass in dict.values(wrappers):
+            if needed:
+                klass._e_object = _EObjectSlot()
+            elif '_e_object' in klass.__dict__:
+                del klass._e_object
+        _cache.installed = needed
 
 # Defined per package to ensure proper wrapper ownership.
 def wrap_e_class(e_class, e_factory, InternalEObject, overrides, package_name):
     """Return a Python class which wraps and implements an EClass."""
 
-    return type(e_class.getName(), (InternalEObject,), 
-                e_class_body(e_class, e_factory, overrides, numeric_ids, package_name))
+    body = e_class_body(e_class, e_factory, overrides, numeric_ids, package_name)
+    if _cache.installed:
+        body['_e_object'] = _EObjectSlot()
+    body['__setattr__'] = _tracked_setattr(InternalEObject.__setattr__)
+    return type(e_class.getName(), (InternalEObject,), body)
+
+def _tracked_setattr(base_setattr):
+    """`__setattr__` which counts assignments to public attributes, i.e. the 
+    feature setters, as edits of the wrapper."""
+    def __setattr__(self, name, value):
+        base_setattr(self, name, value)
+        if name[:1] != '_':
+            mark_dirty(self, name)
+    return __setattr__
+
+class _EditState(object):
+    """Edit counters shared by every wrapper."""
+
+    def __init__(self):
+        self.edits = 0
+        # Edits of unknown features, which drop every cached value.
+        self.flushes = 0
+        # Edits by feature stem (`_feature`).
+        self.features = {}
+
+_edits = _EditState()
+
+_ACCESSOR_PREFIXES = ('isSet', 'unset', 'get', 'set', 'is')
+
+def _feature(name):
+    """Stem shared by a wrapper feature and its Java accessors, e.g. 
+    'DensityUnit' for `density_unit`, `getDensityUnit` and 
+    `setDensityUnit`."""
+    if '_' not in name:
+        for prefix in _ACCESSOR_PREFIXES:
+            if name.startswith(prefix) and name[len(prefix):][:1].isupper():
+                return name[len(prefix):]
+    return ''.join(p[:1].upper() + p[1:] for p in name.split('_'))
+
+def mark_dirty(wrapper=None, feature=None):
+    """Record an edit which was made outside of a wrapper's setters (e.g. 
+    directly in Java), so cached reads and serializations are not reused.
+
+    Setting a feature of a wrapper marks it by itself.
+
+    Parameters
+    ----------
+    wrapper : EObject wrapper or list of them, optional
+        The edited wrapper, or all wrappers edited the same way, which is 
+        one edit. If None, only the total is bumped.
+    feature : str, optional
+        Edited feature as a wrapper name such as `'density_unit'` or a Java 
+        accessor such as `'setDensityUnit'`. Cached values of this feature 
+        are dropped from every wrapper. If None, every cached value is 
+        dropped.
+    """
+    _edits.edits += 1
+    if feature is None:
+        _edits.flushes += 1
+    else:
+        stem = _feature(feature)
+        _edits.features[stem] = _edits.features.get(stem, 0) + 1
+    if wrapper is None:
+        return
+    for edited in (wrapper if isinstance(wrapper, list) else (wrapper,)):
+        attributes = edited.__dict__
+        attributes['_revision'] = attributes.get('_revision', 0) + 1
+
+def edit_revision(wrapper=None):
+    """Number of edits of a wrapper, or of all wrappers if None. Compare two 
+    revisions to tell whether anything was changed in between.
+
+    Parameters
+    ----------
+    wrapper : EObject wrapper, optional
+        Wrapper to count edits of.
+    """
+    if wrapper is None:
+        return _edits.edits
+    return getattr(wrapper, '__dict__', {}).get('_revision', 0)
+
+def enable_cache():
+    """Serve repeated wrapper reads from Python memory."""
+    _cache.enabled = True
+    _install_slots()
+
+def disable_cache():
+    """Send every wrapper read to Java again."""
+    _cache.enabled = False
+    _install_slots()
+
+@contextmanager
+def caching():
+    """Context manager which enables the wrapper cache inside its block."""
+    enabled = _cache.enabled
+    _cache.enabled = True
+    _install_slots()
+    try:
+        yield
+    finally:
+        _cache.enabled = enabled
+        _install_slots()
+
+def cache_info():
+    """Return the wrapper cache counters as a `CacheInfo`."""
+    return CacheInfo(_cache.hits, _cache.misses, _cache.invalidations, 
+                     _cache.enabled)
+
+def cache_clear():
+    """Drop every cached value and reset the counters."""
+    _cache.generation += 1
+    _cache.hits = 0
+    _cache.misses = 0
+    _cache.invalidations = 0
+
+def invalidate(wrapper, feature=None):
+    """Drop cached values after a wrapper was changed outside of its setters 
+    (e.g. directly in Java).
+
+    Other wrappers of the same Java object can not be told apart from 
+    wrappers of other objects, so the feature is dropped from every wrapper. 
+    The change is recorded as an edit of `wrapper` (`mark_dirty`).
+
+    Parameters
+    ----------
+    wrapper : EObject wrapper
+        The changed wrapper.
+    feature : str, optional
+        Feature name such as `'density'` or `'density_unit'`. If None, every 
+        cached value is dropped.
+    """
+    mark_dirty(wrapper, feature)
+
+ProfileRow = namedtuple('ProfileRow', ['function', 'wrapper', 'feature', 
+                                       'calls', 'time'])
+
+class Profile(object):
+    """Java calls counted and timed while profiling.
+
+    Calls are keyed by the outermost MCNPy function within `caller_depth` 
+    frames of the call (e.g. `Deck._read`), the wrapper class whose `_e_object` made the call and the 
+    Java method. Calls which don't go through a wrapper, such as the pipelined 
+    requests of `fetch`, have an empty wrapper. Served cache hits are not 
+    Java calls and are not counted.
+
+    Attributes
+    ----------
+    stats : dict
+        `[calls, time]` by `(function, wrapper, feature)`.
+    callers : bool
+        Whether calls are keyed by function. If False, it is empty.
+    """
+
+    def __init__(self, callers=True):
+        self.stats = {}
+        self.callers = callers
+
+    @property
+    def calls(self):
+        """Total number of Java calls."""
+        return sum(v[0] for v in self.stats.values())
+
+    @property
+    def time(self):
+        """Total time spent in Java calls in seconds."""
+        return sum(v[1] for v in self.stats.values())
+
+    def rows(self, by=('function', 'wrapper', 'feature')):
+        """Return `ProfileRow` tuples aggregated by the fields in `by`, most 
+        expensive first. Fields not in `by` are None."""
+        fields = ('function', 'wrapper', 'feature')
+        totals = {}
+        for key, (calls, time) in list(self.stats.items()):
+            key = tuple(k if f in by else None for f, k in zip(fields, key))
+            total = totals.setdefault(key, [0, 0.0])
+            total[0] += calls
+            total[1] += time
+        rows = [ProfileRow(*key, *total) for key, total in totals.items()]
+        return sorted(rows, key=lambda row: (-row.time, -row.calls))
+
+    def report(self, by=('function', 'wrapper', 'feature'), limit=None):
+        """Return a table of the Java calls as a string.
+
+        Parameters
+        ----------
+        by : tuple of str, optional
+            Any of 'function', 'wrapper' and 'feature'.
+        limit : int, optional
+            Only show the most expensive rows.
+        """
+        rows = self.rows(by)[:limit]
+        lines = [''.join('{:<32}'.format(f) for f in by) 
+                 + '{:>10}{:>12}'.format('calls', 'time [s]')]
+        for row in rows:
+            lines.append(''.join('{:<32}'.format(getattr(row, f) or '-') 
+                                 for f in by) 
+                         + '{:>10}{:>12.4f}'.format(row.calls, row.time))
+        lines.append('{:<{}}{:>10}{:>12.4f}'.format('total', 32*len(by), 
+                                                     self.calls, self.time))
+        return '\n'.join(lines)
+
+    def to_json(self, filename=None):
+        """Return the rows as JSON, e.g. for comparing bridge traffic between 
+        benchmark runs. The string is written to `filename` if given."""
+        string = json.dumps([row._asdict() for row in self.rows()], indent=1)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(string)
+        return string
+
+    def clear(self):
+        self.stats.clear()
+
+    def __str__(self):
+        return self.report()
+
+# Active profiles. Calls are recorded into all of them.
+_profiles = []
+_profile_lock = RLock()
+_profile_local = local()
+_hooked_clients = {}
+
+class ProfiledEObject(object):
+    """View of an EObject which labels Java calls with the wrapper class and 
+    method while profiling."""
+
+    __slots__ = ('_obj', '_wrapper')
+
+    def __init__(self, obj, wrapper):
+        self._obj = obj
+        self._wrapper = wrapper
+
+    def __getattr__(self, name):
+        member = getattr(self._obj, name)
+        if not callable(member):
+            return member
+        def call(*args):
+            labels = _labels()
+            labels.append((self._wrapper, name))
+            try:
+                return member(*args)
+            finally:
+                labels.pop()
+        return call
+
+    def __eq__(self, other):
+        return _java(self) == _java(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(_java(self))
+
+    def __str__(self):
+        return str(self._obj)
+
+    def __repr__(self):
+        return repr(self._obj)
+
+def _labels():
+    try:
+        return _profile_local.labels
+    except AttributeError:
+        _profile_local.labels = []
+        return _profile_local.labels
+
+# Frames above a gateway call which `_caller` looks through. Enough to get 
+# from a wrapper getter up to public entry points such as `Deck.read` 
+# without walking the whole stack on every round trip.
+caller_depth = 24
+
+def _caller():
+    """Qualified name of the outermost MCNPy function among the 
+    `caller_depth` frames above the caller."""
+    name = ''
+    frame = sys._getframe(2)
+    for _ in range(caller_depth):
+        if frame is None:
+            break
+        module = frame.f_globals.get('__name__', '')
+        if (module.startswith(package_name + '.') 
+            and module not in (__name__, gateway.__name__) 
+            and frame.f_code.co_name != '<module>'):
+            code = frame.f_code
+            name = getattr(code, 'co_qualname', code.co_name)
+        frame = frame.f_back
+    return name
+
+# Non-call commands of the py4j protocol.
+_COMMAND_NAMES = {'m': '<memory>', 'r': '<reflection>', 'f': '<field>', 
+                  'l': '<list>', 'a': '<array>', 'i': '<jvm import>', 
+                  'h': '<help>', 'd': '<dir>', 's': '<stream>'}
+
+def _record(command, time, caller=None):
+    parts = command.split('\n', 3)
+    if parts[0] == CALL_COMMAND_NAME[:-1]:
+        feature = parts[2]
+    else:
+        feature = _COMMAND_NAMES.get(parts[0], parts[0])
+    labels = _labels()
+    wrapper = labels[-1][0] if len(labels) > 0 else ''
+    if caller is None:
+        caller = _caller() if _want_callers() else ''
+    with _profile_lock:
+        for profile in _profiles:
+            key = (caller if profile.callers else '', wrapper, feature)
+            stats = profile.stats.setdefault(key, [0, 0.0])
+            stats[0] += 1
+            stats[1] += time
+
+def _want_callers():
+    """Whether any active profile keys calls by function."""
+    return any(profile.callers for profile in _profiles)
+
+def _timed(send_command, command, *args, **kwargs):
+    if len(_profiles) == 0:
+        return send_command(command, *args, **kwargs)
+    t = perf_counter()
+    try:
+        return send_command(command, *args, **kwargs)
+    finally:
+        _record(command, perf_counter() - t)
+
+def _hook_client(gateway_client):
+    """Time every round trip of a gateway client."""
+    _hooked_clients[id(gateway_client)] = (
+        gateway_client, gateway._route(gateway_client, _timed))
+
+def _unhook_client(gateway_client):
+    """Undo `_hook_client`, also if a `gateway.GatewayPool` routed the 
+    commands of the client through itself in the meantime."""
+    client, hook = _hooked_clients.pop(id(gateway_client))
+    gateway._unroute(client, hook)
+
+@contextmanager
+def profile(callers=True):
+    """Context manager which counts and times every Java call made inside its 
+    block.
+
+    Parameters
+    ----------
+    callers : bool, optional
+        Key calls by the MCNPy function which made them. Finding it looks 
+        through the stack on every round trip. Without it, the 'function' 
+        of every row is empty.
+
+    Yields
+    ------
+    Profile
+        Filled in while the block runs.
+
+    Examples
+    --------
+    >>> with mcnpy.wrap.profile() as prof:
+    ...     deck = mcnpy.Deck.read('inp.mcnp')
+    >>> print(prof.report(by=('function',)))
+    """
+    prof = Profile(callers)
+    gateway_client = package._gateway_client
+    with _profile_lock:
+        if id(gateway_client) not in _hooked_clients:
+            _hook_client(gateway_client)
+        _profiles.append(prof)
+        _install_slots()
+    try:
+        yield prof
+    finally:
+        with _profile_lock:
+            _profiles.remove(prof)
+            try:
+                if len(_profiles) == 0:
+                    _unhook_client(gateway_client)
+            finally:
+                _install_slots()
+
+def _java(obj):
+    """The py4j object behind a wrapper."""
+    if isinstance(obj, JavaObject):
+        return obj
+    if isinstance(obj, ProfiledEObject):
+        obj = obj._obj
+    if isinstance(obj, CachedEObject):
+        return obj._obj
+    try:
+        return obj.__dict__['_e_object']
+    except (AttributeError, KeyError):
+        return getattr(obj, '_e_object', obj)
+
+def _view(obj):
+    """The cache view of a wrapper, if caching is on."""
+    if _cache.enabled is False or isinstance(obj, JavaObject):
+        return None
+    view = getattr(obj, '_e_object', None)
+    if isinstance(view, ProfiledEObject):
+        view = view._obj
+    if isinstance(view, CachedEObject):
+        view._check()
+        return view
+    return None
+
+def _getter(feature):
+    """Java getter for a wrapper feature name (e.g. `density_unit`)."""
+    if feature.startswith(('get', 'is')) and '_' not in feature:
+        return feature
+    return 'get' + ''.join(p[:1].upper() + p[1:] for p in feature.split('_'))
+
+def _send_all(gateway_client, commands):
+    """Pipeline commands over a single gateway connection.
+
+    Commands are written in chunks of `batch_size` and the answers are read
+    back in order, so each chunk costs one round trip instead of one per call.
+    """
+    answers = []
+    # The pool closes the connection on errors, as the stream position is 
+    # unknown then.
+    with gateway.connection(gateway_client) as connection:
+        for start in range(0, len(commands), batch_size):
+            chunk = commands[start:start+batch_size]
+            t = perf_counter()
+            connection.socket.sendall(''.join(chunk).encode('utf-8'))
+            for _ in chunk:
+                answer = smart_decode(connection.stream.readline()[:-1])
+                if answer.startswith(RETURN_MESSAGE):
+                    answer = answer[1:]
+                if answer.strip() == '':
+                    raise Py4JNetworkError('Answer from Java side is empty', 
+                                           when=ERROR_ON_RECEIVE)
+                answers.append(answer)
+            if len(_profiles) > 0:
+                t = (perf_counter() - t)/len(chunk)
+                caller = _caller() if _want_callers() else ''
+                for command in chunk:
+                    _record(command, t, caller)
+    return answers
+
+def call_all(calls):
+    """Invoke many Java methods with as few gateway round trips as possible.
+
+    Parameters
+    ----------
+    calls : iterable of tuple
+        `(obj, method, args)` where `obj` is a wrapper or py4j object, 
+        `method` is the name of the Java method and `args` is a sequence of 
+        arguments. Wrappers passed as arguments are unwrapped.
+
+    Returns
+    -------
+    results : list
+        Return values in the same order as `calls`.
+    """
+    calls = list(calls)
+    if len(calls) == 0:
+        return []
+    gateway_client = _java(calls[0][0])._gateway_client
+    pool = gateway_client.gateway_property.pool
+    commands = []
+    headers = []
+    for obj, method, args in calls:
+        target_id = _java(obj)._target_id
+        commands.append(CALL_COMMAND_NAME + target_id + '\n' + method + '\n' 
+                        + ''.join(get_command_part(_java(a), pool) for a in args) 
+                        + END_COMMAND_PART)
+        headers.append((target_id, method))
+    answers = _send_all(gateway_client, commands)
+    # Every answer is read before converting so an exception can't leave
+    # unread answers on the connection.
+    return [get_return_value(answer, gateway_client, *header) 
+            for answer, header in zip(answers, headers)]
+
+def fetch_list(java_list):
+    """Copy the contents of a Java list into a Python list.
+
+    Parameters
+    ----------
+    java_list : py4j.java_collections.JavaList
+        An `EList` or any other Java list.
+
+    Returns
+    -------
+    list
+        The (wrapped) elements of `java_list`.
+    """
+    java_list = _java(java_list)
+    return call_all((java_list, 'get', (i,)) for i in range(java_list.size()))
+
+def to_java_list(objects, gateway_client):
+    """Copy wrappers or py4j objects into a new `java.util.ArrayList` with 
+    pipelined `add` calls."""
+    objects = list(objects)
+    java_list = JavaClass('java.util.ArrayList', gateway_client)(len(objects))
+    call_all((java_list, 'add', (obj,)) for obj in objects)
+    return java_list
+
+def list_add_all(e_list, objects):
+    """Append many objects to an `EList` with one `addAllUnique` call.
+
+    Like `addUnique`, the list is not checked for objects it already holds.
+
+    Parameters
+    ----------
+    e_list : py4j.java_collections.JavaList
+        Containment or reference list of an EObject.
+    objects : iterable
+        Wrappers or py4j objects to append.
+    """
+    objects = list(objects)
+    if len(objects) > 0:
+        e_list = _java(e_list)
+        e_list.addAllUnique(to_java_list(objects, e_list._gateway_client))
+        mark_dirty()
+
+def list_remove_all(e_list, objects):
+    """Remove many objects from an `EList` with one `removeAll` call.
+
+    Parameters
+    ----------
+    e_list : py4j.java_collections.JavaList
+        Containment or reference list of an EObject.
+    objects : iterable
+        Wrappers or py4j objects to remove. Objects not in the list are 
+        ignored.
+    """
+    objects = list(objects)
+    if len(objects) > 0:
+        e_list = _java(e_list)
+        e_list.removeAll(to_java_list(objects, e_list._gateway_client))
+        mark_dirty()
+
+def fetch(objects, features):
+    """Read several features from many EObjects in bulk.
+
+    Parameters
+    ----------
+    objects : iterable of EObject wrappers
+        Objects to read from. All must share one gateway.
+    features : iterable of str or dict
+        Wrapper feature names such as `'name'` or `'density_unit'`. If a dict 
+        mapping names to NumPy dtypes is given, each column is returned as a 
+        `numpy.ndarray` with missing values as NaN for floating point dtypes.
+
+    Returns
+    -------
+    columns : dict
+        Feature names mapped to a list (or array) of raw Java values with one 
+        entry per object. Many-valued features are returned as Python lists.
+    """
+    objects = list(objects)
+    names = list(features)
+    getters = [_getter(f) for f in names]
+    keys = [(obj, getter) for obj in objects for getter in getters]
+    values = [_missing]*len(keys)
+    views = [_view(obj) for obj, _ in keys]
+    for q, ((_, getter), view) in enumerate(zip(keys, views)):
+        if view is not None:
+            values[q] = view._get(getter)
+            if values[q] is not _missing:
+                _cache.hits += 1
+    missing = [q for q, v in enumerate(values) if v is _missing]
+    stamps = {getter: _edits.features.get(_feature(getter), 0) 
+              for getter in getters}
+    fetched = call_all((keys[q][0], keys[q][1], ()) for q in missing)
+    for q, value in zip(missing, fetched):
+        values[q] = value
+        if views[q] is not None:
+            _cache.misses += 1
+            getter = keys[q][1]
+            views[q]._values[getter] = (value, stamps[getter])
+    # Replace Java lists with Python lists using two more pipelined passes.
+    lists = [i for i, v in enumerate(values) if isinstance(v, JavaList)]
+    sizes = call_all((values[i], 'size', ()) for i in lists)
+    items = call_all((values[i], 'get', (j,)) for i, n in zip(lists, sizes) 
+                     for j in range(n))
+    start = 0
+    for i, n in zip(lists, sizes):
+        values[i] = items[start:start+n]
+        start += n
+    n = len(names)
+    columns = {name: values[q::n] for q, name in enumerate(names)}
+    if isinstance(features, dict):
+        for name, dtype in features.items():
+            dtype = np.dtype(dtype)
+            column = columns[name]
+            if dtype.kind == 'f':
+                column = [np.nan if v is None else v for v in column]
+            columns[name] = np.array(column, dtype=dtype)
+    return columns
 
 register_input_converter(WrapperConverter(), prepend=True)
 
@@ -33,5 +923,29 @@ register_output_converter(REFERENCE_TYPE,
     (lambda target_id, 
     gateway_client: wrap_e_object(target_id, gateway_client, overrides, package_name)))
 
-wrappers = wrap_e_package(package, overrides, package_name, wrap_e_class)
-overrides.update(wrappers)
\ No newline at end of file
+def _pending_classes(schema):
+    """EClass names of the package mapped to `_PendingClass` records. With a 
+    schema cache the package is not scanned and the class bodies are built 
+    from recorded answers."""
+    if (schema is not None and schema.classes is not None 
+        and _InternalEObject is not None):
+        e_factory = LiveObject(package.getEFactoryInstance)
+        return {name: _PendingClass(
+                    schema.e_class(name, lambda name=name: 
+                                   package.getEClassifier(name)), 
+                    e_factory, _InternalEObject) 
+                for name in schema.classes}
+    classes = wrap_e_package(package, overrides, package_name, _defer_e_class)
+    if (schema is not None and all(isinstance(klass, _PendingClass) 
+                                   for klass in classes.values())):
+        for name, klass in classes.items():
+            klass.e_class = schema.e_class(name, lambda e_class=klass.e_class: 
+                                           e_class)
+        schema.classes = list(classes)
+        schema.dirty = True
+    return classes
+
+# Only the EClass names are collected here. The wrappers are generated when 
+# first used.
+_schema = Schema.load(package_name)
+wrappers.defer(_pending_classes(_schema))
\ No newline at end of file
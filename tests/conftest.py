@@ -0,0 +1,21 @@
+"""Test setup. Importing `mcnpy` starts the metapy gateway. Without it, the
+package is registered without running its `__init__`, so the modules which do
+not use Java (the formatter, lexer, parser and ID allocation) can still be
+tested.
+"""
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import mcnpy
+except Exception:
+    for name in [name for name in sys.modules
+                 if name == 'mcnpy' or name.startswith('mcnpy.')]:
+        del sys.modules[name]
+    mcnpy = types.ModuleType('mcnpy')
+    mcnpy.__path__ = [os.path.join(ROOT, 'mcnpy')]
+    sys.modules['mcnpy'] = mcnpy
@@ -0,0 +1,140 @@
+"""Line wrapping and formatting of `mcnpy.deck_formatter` as they were before 
+they were rewritten to run in linear time and to stream. The tests check the 
+current functions against these, and the benchmarks (`bench_wrap.py`, 
+`bench_format.py`) time them.
+"""
+from re import compile, finditer, search, IGNORECASE
+
+def legacy_line_wrap(before_comment, comment, line_limit):
+    if (len(before_comment) > line_limit):
+        line = ''
+        ws_index = 0
+        while (len(before_comment) > line_limit):
+            for i in range(len(before_comment)):
+                if (before_comment[i] == ' '):
+                    ws_index = i
+                if (i >= line_limit-1):
+                    if (before_comment[ws_index:].lstrip() != ''):
+                        line = line + before_comment[:ws_index]
+                        before_comment = ('\n     ' 
+                                          + before_comment[ws_index:].lstrip())
+                        ws_index = 5
+                    else:
+                        line = line + before_comment[:ws_index]
+                        before_comment = ''
+                    break
+        line = line + before_comment + comment
+    else:
+        line = before_comment + comment
+    return line
+
+def legacy_print_lattice(line, p, line_limit, comment):
+    dims = []
+    indicies = []
+    end = len(line)
+    q = 0
+    index = 0
+    for m in finditer(p, line):
+        q = q+1
+        if (q > 3):
+            break
+        nums = line[m.start():m.end()].replace(':', ' ').split()
+        dims.append(1+int(nums[1])-int(nums[0]))
+        indicies.append(int(nums[0]))
+        end = m.end()
+    line_start = legacy_line_wrap(line[:end+1], comment, line_limit)
+    lat = line[end+1:len(line)].split()
+    if (dims[2] > 1):
+        lattice = '\nC    k = ' + str(indicies[2]) + ' (Bottom)\n     '
+    else:
+        lattice = '\n     '
+    for k in range(dims[2]):
+        for j in range(dims[1]):
+            lat_line = ''
+            for i in range(dims[0]):
+                index = i + j*dims[0] + k*dims[0]*dims[1]
+                lat_line = lat_line + lat[index] + ' '
+            comment = ('$ i = (' + str(indicies[0]) + ' to ' 
+                + str(indicies[0]+i) + '), j = ' + str(indicies[1]+j))
+            lattice = lattice + legacy_line_wrap(lat_line, comment, 
+                                                 line_limit-5)
+            if (j < dims[1]-1):
+                lattice = lattice + '\n     '
+        if (k < dims[2]-1):
+            lattice = (lattice + '\nC    k = ' + str(indicies[2]+k+1) 
+                       + '\n     ')
+    if (len(lat) > index):
+        line_end = '\n     ' + legacy_line_wrap(' '.join(lat[index+1:]), '', 
+                                                line_limit-5)
+        if line_end.strip() == '':
+            line_end = ''
+    else:
+        line_end = ''
+    return line_start + lattice + line_end
+
+def legacy_print_material(line, p, line_limit, comment):
+    q = 0
+    end = len(line)
+    line_new = ''
+    for m in finditer(p, line):
+        q = q+1
+        if (q == 1):
+            end = m.start()
+        line_new = line_new + line[m.start():m.end()]
+        if (line[m.end():].lstrip() != ''):
+            line_new = line_new + '\n     '
+    line_start = legacy_line_wrap(line[:end], comment, line_limit)
+    if (line_new == ''):
+        return line_start
+    else:
+        return line_start + '\n     ' + line_new
+
+def legacy_formatter(deck, title=None):
+    line_limit = 120
+    p_lat = compile('-?\\d+:-?\\d+')
+    p_fill = compile('fill', IGNORECASE)
+    chars = {'##': ''}
+    tmesh = {}
+    for key in ('CORA', 'CORB', 'CORC', 'RMESH', 'CMESH', 'SMESH', 'ERGSH', 
+                'MSHMF', 'FM', '+FM'):
+        tmesh[' ' + key + ' '] = '\n' + key
+    d = deck.splitlines()
+    if (d[0].startswith('$') == False):
+        if title is None:
+            string = '$ This file was written with mcnpy\n'
+        elif title.startswith('$'):
+            string = title + '\n'
+        else:
+            string = '$ ' + title + '\n'
+    else:
+        string = ''
+    for line in d:
+        tmesh_block = False
+        if (line.startswith('     ') == False):
+            line = line.lstrip()
+        index = line.find('$')
+        if (index > -1):
+            before_comment = line[:index]
+            comment = line[index:]
+        else:
+            before_comment = line
+            comment = ''
+        if (before_comment.upper().startswith('C ') == False):
+            if before_comment.upper().startswith('TMESH'):
+                tmesh_block = True
+            for k in chars:
+                before_comment = before_comment.upper().replace(k, chars[k])
+            if tmesh_block is True:
+                for k in tmesh:
+                    before_comment = before_comment.upper().replace(k, tmesh[k])
+            if search(p_fill, before_comment):
+                try:
+                    line = legacy_print_lattice(before_comment, p_lat, 
+                                                line_limit, comment)
+                except:
+                    line = legacy_line_wrap(before_comment, comment, 
+                                            line_limit)
+            else:
+                line = legacy_line_wrap(before_comment, comment, line_limit)
+        string = string + line + '\n'
+    return string
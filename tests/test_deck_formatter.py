@@ -0,0 +1,302 @@
+import gzip
+import io
+import lzma
+import random
+from multiprocessing import get_all_start_methods
+from re import compile
+
+import numpy as np
+import pytest
+
+from mcnpy.deck_formatter import (wrap, line_wrap, print_lattice,
+                                  print_material, lattice_fill, formatter,
+                                  format_lines, format_chunks, write_formatted,
+                                  CardCache, write_incremental, _pad,
+                                  _known_fill, _pool_context,
+                                  open_deck, cleanup_lines, deck_lines,
+                                  preprocess_lines, iter_lines, compression,
+                                  preprocessor, deck_cleanup,
+                                  CONTINUATION)
+from legacy import (legacy_line_wrap, legacy_print_lattice,
+                    legacy_print_material, legacy_formatter)
+
+LIMITS = (75, 80, 115, 120)
+P_LAT = compile('-?\\d+:-?\\d+')
+P_MAT = compile('\\d{4,6}(\\.\\d\\d\\w)?\\s+-?\\d*\\.?\\d+(e[+-]?\\d+)?')
+
+DECK = '''Test deck
+1 1 -10.4 -1 imp:n=1 u=2 $ fuel
+2 0 -2 lat=1 u=5 fill=0:2 0:1 0:0 1 2 2 3 3 3 imp:n=1
+3 0 2 imp:n=0
+
+1 so 1.0
+2 rpp -5 5 -5 5 -5 5
+
+m1 92235.80c 0.05 92238.80c 0.95
+nps 1e6
+'''
+
+def same(new, old, *args):
+    try:
+        expected = old(*args)
+    except Exception as e:
+        expected = type(e)
+    try:
+        result = new(*args)
+    except Exception as e:
+        result = type(e)
+    assert result == expected, args
+
+def card(rng, words, max_word):
+    text = rng.choice(['', ' ', '     '])
+    for _ in range(words):
+        text += 'x'*rng.randint(1, max_word) + ' '*rng.choice([1, 1, 1, 2, 7])
+    return text if rng.random() < 0.5 else text.rstrip()
+
+def lattice(rng):
+    dims = [rng.randint(1, 12), rng.randint(1, 6), rng.randint(1, 3)]
+    lo = [rng.randint(-6, 0) for _ in dims]
+    count = dims[0]*dims[1]*dims[2] + rng.choice([-1, 0, 0, 3])
+    ranges = ' '.join(str(l) + ':' + str(l+d-1) for l, d in zip(lo, dims))
+    fill = ' '.join(str(rng.randint(1, 99999)) for _ in range(count))
+    return '10 0 -1 LAT=1 U=2 FILL=' + ranges + ' ' + fill + ' IMP:N=1'
+
+def material(rng):
+    pairs = ' '.join(str(rng.randint(1001, 999999)) + '.80c '
+                     + str(rng.random()) for _ in range(rng.randint(0, 30)))
+    return 'M' + str(rng.randint(1, 99)) + ' ' + pairs
+
+def expand(text):
+    """Entries of a FILL array with `nR` expanded and comments dropped."""
+    entries = []
+    for line in text.splitlines():
+        if line.upper().startswith('C '):
+            continue
+        for token in line.split('$')[0].split():
+            if token.upper().endswith('R'):
+                entries.extend([entries[-1]]*int(token[:-1]))
+            else:
+                entries.append(token)
+    return entries
+
+@pytest.mark.parametrize('seed', range(4))
+def test_line_wrap_matches_legacy(seed):
+    # Words stay shorter than a continuation line, the legacy loop never
+    # ends otherwise.
+    rng = random.Random(seed)
+    for _ in range(2000):
+        limit = rng.choice(LIMITS)
+        comment = rng.choice(['', '$ comment'])
+        same(line_wrap, legacy_line_wrap,
+             card(rng, rng.randint(0, 80), limit - 7), comment, limit)
+
+@pytest.mark.parametrize('seed', range(4))
+def test_print_lattice_matches_legacy(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        limit = rng.choice(LIMITS)
+        comment = rng.choice(['', '$ comment'])
+        same(print_lattice, legacy_print_lattice, lattice(rng), P_LAT,
+             limit, comment)
+
+@pytest.mark.parametrize('seed', range(4))
+def test_print_material_matches_legacy(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        limit = rng.choice(LIMITS)
+        comment = rng.choice(['', '$ comment'])
+        same(print_material, legacy_print_material, material(rng), P_MAT,
+             limit, comment)
+
+def test_wrap_keeps_long_words():
+    text = 'a ' + 'x'*200 + ' b'
+    lines = wrap(text, 80)
+    assert lines == ['a', CONTINUATION + 'x'*200, CONTINUATION + 'b']
+    assert wrap('short', 80) == ['short']
+
+def test_lattice_fill():
+    ids = np.arange(12).reshape(2, 2, 3)
+    text = lattice_fill(ids, (-1, 0, 1))
+    assert text.startswith('\nC    k = 1 (Bottom)\n     0 1 2 $ i = (-1 to 1)')
+    assert '\nC    k = 2\n' in text
+    assert expand(text) == [str(i) for i in range(12)]
+    with pytest.raises(ValueError):
+        lattice_fill(np.zeros((0, 1, 1)), (0, 0, 0))
+
+def test_lattice_fill_repeat():
+    rng = np.random.default_rng(0)
+    ids = np.repeat(rng.choice([1, 20, 300], size=200),
+                    rng.integers(1, 9, size=200))[:4*5*30].reshape(4, 5, 30)
+    short = lattice_fill(ids, (0, 0, 0), repeat=True)
+    assert expand(short) == list(ids.ravel().astype(str))
+    assert len(short) < len(lattice_fill(ids, (0, 0, 0)))
+
+def test_print_lattice_known_entries():
+    rng = np.random.default_rng(1)
+    ids = rng.choice([1, 2, 30], size=(3, 4, 5))
+    line = ('7 0 -1 LAT=1 U=5 FILL=0:4 -1:2 1:3 '
+            + ' '.join(ids.ravel().astype(str)) + ' IMP:N=1')
+    text = print_lattice(line, P_LAT, 120, '')
+    assert print_lattice(line, P_LAT, 120, '', ids=ids) == text
+    # Entries which do not match the card are not used.
+    assert print_lattice(line, P_LAT, 120, '', ids=ids + 1) == text
+    assert print_lattice(line, P_LAT, 120, '', ids=ids[:2]) == text
+    signed = np.array([-3, 10, 200, 7, -45, 1]).reshape(1, 2, 3)
+    line = '7 0 -1 LAT=1 FILL=0:2 0:1 0:0 -3 10 200 7 -45 1 IMP:N=1'
+    assert (print_lattice(line, P_LAT, 120, '', ids=signed)
+            == print_lattice(line, P_LAT, 120, ''))
+    assert _known_fill('-3 10 200 7 -45 1 IMP:N=1', signed.shape, signed)[1] \
+        == ' IMP:N=1'
+    assert _known_fill('-3 10 200 7 -45 12', signed.shape, signed) is None
+    assert _known_fill('-3 10 200 7 -45', signed.shape, signed) is None
+    pairs = np.where(ids == 2, '2(4)', ids.astype(str)).astype(object)
+    line = ('7 0 -1 LAT=1 U=5 FILL=0:4 -1:2 1:3 '
+            + ' '.join(pairs.ravel()) + ' IMP:N=1')
+    assert (print_lattice(line, P_LAT, 120, '', ids=pairs)
+            == print_lattice(line, P_LAT, 120, ''))
+
+def test_formatter():
+    text = formatter(DECK)
+    lines = text.splitlines()
+    assert lines[0] == '$ This file was written with mcnpy'
+    assert lines[1] == 'TEST DECK'
+    assert lines[2] == '1 1 -10.4 -1 IMP:N=1 U=2 $ fuel'
+    assert 'C    k' not in text
+    assert lines[4] == '     1 2 2 $ i = (0 to 2), j = 0'
+    assert formatter(DECK, title='Title').startswith('$ Title\n')
+    assert formatter('$ Title\n1 0 -1\n') == '$ Title\n1 0 -1\n'
+
+def test_formatter_matches_legacy():
+    assert formatter(DECK) == legacy_formatter(DECK)
+    assert formatter(DECK, title='Title') == legacy_formatter(DECK, 'Title')
+    rng = random.Random(0)
+    lines = [lattice(rng) for _ in range(20)] + [material(rng) 
+                                                 for _ in range(20)]
+    deck = 'title\n' + '\n'.join(lines) + '\n'
+    assert formatter(deck) == legacy_formatter(deck)
+
+def test_format_paths_agree():
+    text = formatter(DECK)
+    assert ''.join(format_lines(DECK)) == text
+    assert ''.join(format_lines(DECK.splitlines())) == text
+    assert ''.join(format_chunks(DECK, workers=1, chunk_lines=2)) == text
+    # Workers from a fork server or spawned ones import mcnpy, which needs 
+    # the gateway.
+    method = 'fork' if 'fork' in get_all_start_methods() else None
+    assert ''.join(format_chunks(DECK, workers=2, chunk_lines=2, 
+                                 mp_context=method)) == text
+    assert formatter(DECK, lattices={2: np.array([[[1, 2, 2], [3, 3, 3]]])}) \
+        == text
+    stream = io.StringIO()
+    write_formatted(DECK, stream, buffer_lines=3)
+    assert stream.getvalue() == text
+
+def test_pool_context():
+    assert _pool_context().get_start_method() != 'fork'
+    if 'fork' in get_all_start_methods():
+        assert _pool_context('fork').get_start_method() == 'fork'
+
+def test_card_cache():
+    cache = CardCache()
+    text = formatter(DECK)
+    assert ''.join(cache.format(DECK)) == text
+    # Only the repeated blank line is reused the first time.
+    assert cache.reused == 1
+    first = cache.cards
+    assert ''.join(cache.format(DECK)) == text
+    assert cache.cards == first and cache.reused == first
+    edited = DECK.replace('nps 1e6', 'nps 1e7')
+    assert ''.join(cache.format(edited)) == formatter(edited)
+    assert cache.formatted == 1
+    # Changing `repeat` drops the cached cards.
+    ''.join(cache.format(DECK, repeat=True))
+    assert cache.reused == 1
+    cache.clear()
+    ''.join(cache.format(DECK, repeat=True))
+    assert cache.reused == 1
+
+def test_pad():
+    assert _pad('1 0 -1\n', 0) == '1 0 -1\n'
+    assert _pad('1 0 -1\n', 1) == '1 0 -1 \n'
+    for size in (2, 3, 80, 81, 82, 200):
+        padded = _pad('1 0 -1\n', size)
+        assert len(padded) == len('1 0 -1\n') + size
+        assert all(line.startswith('C') for line in padded.splitlines()[1:])
+
+def test_write_incremental(tmp_path):
+    path = tmp_path / 'deck.mcnp'
+    texts = ['title\n', '1 0 -1 IMP:N=1\n', '\n', '1 SO 10\n', '\n',
+             'NPS 1000\n']
+    index, written = write_incremental(path, texts, encoding='utf-8')
+    assert path.read_text() == ''.join(texts)
+    assert written == len(''.join(texts))
+    # A shorter card is patched in place and padded.
+    texts[5] = 'NPS 10\n'
+    index, written = write_incremental(path, texts, index, encoding='utf-8')
+    assert written == len('NPS 1000\n')
+    assert path.read_text() == ''.join(texts[:5]) + _pad('NPS 10\n', 2)
+    # A longer card rewrites the rest of the file.
+    texts[1] = '1 0 -1 IMP:N=1 VOL=1\n'
+    index, written = write_incremental(path, texts, index, encoding='utf-8')
+    assert path.read_text() == ''.join(texts)
+    assert written == len(''.join(texts[1:]))
+    # Cards added at the end are appended.
+    texts.append('PRINT\n')
+    index, written = write_incremental(path, texts, index, encoding='utf-8')
+    assert path.read_text() == ''.join(texts)
+    # Without an index, or after the file changed, all of it is written.
+    path.write_text('changed\n')
+    index, written = write_incremental(path, texts, index, encoding='utf-8')
+    assert path.read_text() == ''.join(texts)
+    with pytest.raises(ValueError):
+        write_incremental(tmp_path / 'deck.mcnp.gz', texts)
+
+def test_open_deck(tmp_path):
+    path = tmp_path / 'deck.mcnp'
+    path.write_text(DECK)
+    with open_deck(str(path)) as f:
+        assert f.read() == DECK
+    with open_deck(path) as f:
+        assert f.read() == DECK
+    gz = tmp_path / 'deck.mcnp.gz'
+    gz.write_bytes(gzip.compress(DECK.encode()))
+    with open_deck(gz) as f:
+        assert f.read() == DECK
+    assert compression(gz) == 'gzip'
+    assert compression(path) is None
+    assert open_deck(DECK.encode()).read() == DECK
+    assert open_deck(lzma.compress(DECK.encode())).read() == DECK
+    assert open_deck(io.BytesIO(gzip.compress(DECK.encode()))).read() == DECK
+    assert open_deck(io.StringIO(DECK.replace('\n', '\r\n'))).read() == DECK
+    # A str is a path, never the text of a deck.
+    with pytest.raises(OSError):
+        open_deck(DECK)
+
+def test_cleanup_lines():
+    lines = ['Title\n', 'some text\n', '1 1 1.5-3 -1 imp:n=1\n', '\n',
+             '1 so 2d+1\n', '\n', 'nps 10\n', '\n', 'end\n', '\n',
+             'c trailing comment\n']
+    assert ''.join(cleanup_lines(lines)) == (
+        '$ Title\nC some text\n1 1 1.5E-3 -1 imp:n=1\n\n1 so 2E+1\n\n'
+        'nps 10\nc trailing comment\n')
+    assert list(cleanup_lines([])) == []
+    assert ''.join(cleanup_lines(['$ Title\n', '1 0 -1\n', '#ifdef X\n'])) \
+        == '$ Title\n1 0 -1\nC #ifdef X\n'
+    assert ''.join(cleanup_lines(['continue\n'])).startswith('$ \ncontinue')
+
+def test_deck_lines():
+    lines = ['Title\n', '1 0 -1 $ cell\n', 'c comment\n', '\n']
+    assert ''.join(deck_lines(lines)) == ''.join(lines)
+    assert ''.join(deck_lines(lines, preprocess=True)) == \
+        'Title\n1 0 -1 \n\n'
+    assert ''.join(preprocess_lines(iter_lines('a $ b\nc x\n'))) == 'a \n'
+    assert ''.join(deck_lines(lines, cleanup=True)).startswith('$ Title\n')
+
+def test_preprocessor_and_cleanup_write_no_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / 'inp.mcnp'
+    path.write_text('Title\n1 0 -1 $ cell\nc comment\n')
+    assert preprocessor(str(path)) == 'Title\n1 0 -1 \n'
+    assert deck_cleanup(path) == '$ Title\n1 0 -1 $ cell\nc comment\n'
+    assert deck_cleanup(b'Title\n1 0 -1\n') == '$ Title\n1 0 -1\n'
+    assert [p.name for p in tmp_path.iterdir()] == ['inp.mcnp']
@@ -0,0 +1,110 @@
+import pytest
+
+from mcnpy.deck_parser import split_cards, read_cards, _float
+from mcnpy.enum_keywords import DensityUnit
+
+DECK = '''message: datapath=/data
+
+Test deck
+c cells
+1 1 -10.4 -1 imp:n=1 u=2 $ fuel
+2 0 -2 #1
+     imp:n=1 fill=2
+3 2 0.05 1 -2 imp:n=1 &
+   tmp=2.5-8
+4 like 1 but imp:n=2 mat=2 rho=-1.5 u=-3
+99 0 2 imp:n=0
+
+1 so 1.0
+*2 1 rpp -5 5 -5 5 -5 5
+
+m1 92235.80c 0.05 92238.80c 0.95
+m2 1001 2 8016 1
+mt1 lwtr.20t
+tr1 0 0 1
+f4:n 1 2
+kcode 1000 1.0 10 50
+nps 1e6
+mode n
+'''
+
+class Deck(object):
+    """Just enough of `mcnpy.Deck` for the records."""
+    _is_reading = True
+
+@pytest.fixture
+def records():
+    return read_cards(Deck(), DECK)
+
+def test_split_cards():
+    title, cards = split_cards(DECK)
+    assert title == 'Test deck'
+    assert [card.block for card in cards] == [0]*5 + [1]*2 + [2]*8
+    cell = cards[1]
+    assert cell.text == '2 0 -2 #1 imp:n=1 fill=2'
+    assert cell.line == 6
+    assert DECK[cell.start:cell.end] == '2 0 -2 #1\n     imp:n=1 fill=2\n'
+    # '&' continues a card, and the comment after '$' is dropped.
+    assert cards[2].text == '3 2 0.05 1 -2 imp:n=1 tmp=2.5-8'
+    assert cards[0].text == '1 1 -10.4 -1 imp:n=1 u=2'
+
+def test_split_cards_without_message():
+    title, cards = split_cards('title\n1 0 -1\n\n1 so 1\n\nnps 1\n')
+    assert title == 'title'
+    assert [card.text for card in cards] == ['1 0 -1', '1 so 1', 'nps 1']
+
+def test_continue_run():
+    title, cards = split_cards('title\ncontinue\nnps 10\n')
+    assert [(card.block, card.text) for card in cards] == [
+        (2, 'continue'), (2, 'nps 10')]
+
+def test_cells(records):
+    title, cells, surfaces, data = records
+    assert title == 'Test deck'
+    assert [cell.name for cell in cells] == [1, 2, 3, 4, 99]
+    fuel, void, water, like, outside = cells
+    assert fuel._material == 1
+    assert fuel.density == 10.4
+    assert fuel.density_unit is DensityUnit.G_CM3
+    assert water.density_unit is DensityUnit.A_BCM
+    assert fuel.universe.name == 2 and fuel.universe.sign is None
+    assert fuel.region_text == '-1'
+    assert void.density == 0.0
+    assert void.params['fill'] == '2'
+    assert water.params['tmp'] == '2.5-8'
+    assert like._like == 1
+    assert like.params['imp:n'] == '2'
+    assert like._material == 2
+    assert like.density == 1.5
+    assert like.density_unit is DensityUnit.G_CM3
+    assert like.universe.name == 3 and like.universe.sign == '-'
+    assert outside.universe is None
+
+def test_surfaces(records):
+    _, _, surfaces, _ = records
+    sphere, box = surfaces
+    assert sphere.name == 1 and sphere.mnemonic == 'so'
+    assert sphere.coefficients == [1.0]
+    assert sphere.boundary_type is None
+    assert box.name == 2 and box.boundary_type == '*'
+    assert box._transformation == 1
+    assert box.mnemonic == 'rpp'
+
+def test_data(records):
+    _, _, _, data = records
+    storage = [(record.keyword, record.name, record.storage)
+               for record in data]
+    assert storage == [('m', 1, 'materials'), ('m', 2, 'materials'),
+                       ('mt', 1, 'mat_settings'),
+                       ('tr', 1, 'transformations'), ('f', 4, 'tallies'),
+                       ('kcode', None, 'src_settings'),
+                       ('nps', None, 'term_settings'),
+                       ('mode', None, 'phys_settings')]
+    assert data[0].entries == [('92235.80c', 0.05), ('92238.80c', 0.95)]
+    assert data[4].particles == 'n'
+
+def test_float():
+    assert _float('1.5') == 1.5
+    assert _float('2.5-8') == 2.5e-8
+    assert _float('3d+2') == 300.0
+    assert _float('-1.0+1') == -10.0
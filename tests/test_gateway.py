@@ -0,0 +1,78 @@
+import asyncio
+
+from mcnpy import gateway
+
+
+class Connection(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self, reset=False):
+        self.closed = True
+
+
+class Client(object):
+    """Stands in for a py4j `GatewayClient`."""
+
+    def __init__(self):
+        self.deque = []
+        self.sent = []
+
+    def send_command(self, command):
+        self.sent.append(command)
+        return command.upper()
+
+    def _get_connection(self):
+        return self.deque.pop() if self.deque else Connection()
+
+    def _give_back_connection(self, connection):
+        self.deque.append(connection)
+
+
+def test_route_in_any_order():
+    client = Client()
+    original = client.send_command
+    calls = []
+    def around(name):
+        def send(send_command, command):
+            calls.append(name)
+            return send_command(command)
+        return send
+    first = gateway._route(client, around('first'))
+    second = gateway._route(client, around('second'))
+    assert client.send_command('a') == 'A'
+    assert calls == ['second', 'first']
+    gateway._unroute(client, first)
+    assert client.send_command('b') == 'B'
+    assert calls == ['second', 'first', 'second']
+    gateway._unroute(client, second)
+    assert client.send_command == original
+
+def test_pool_is_created_on_use_and_closed():
+    client = Client()
+    original = client.send_command
+    with gateway.connection(client) as connection:
+        pass
+    assert client.deque == [connection]
+    assert client.send_command == original
+    pool = gateway.pool(client, size=2)
+    assert gateway.pool(client) is pool
+    assert client.send_command != original
+    assert client.send_command('a') == 'A'
+    with gateway.connection(client) as held:
+        assert held is connection
+    assert asyncio.run(pool.run(client.send_command, 'b')) == 'B'
+    pool.close()
+    assert client.send_command == original
+    assert gateway.pool(client) is not pool
+    gateway.pool(client).close()
+
+def test_connection_closed_on_error():
+    client = Client()
+    try:
+        with gateway.connection(client) as connection:
+            raise ValueError
+    except ValueError:
+        pass
+    assert connection.closed is True and client.deque == []
@@ -0,0 +1,34 @@
+from mcnpy.lexer import lex, lex_lines, BLANK, COMMENT, CONTINUATION, CARD
+
+def test_kinds():
+    assert lex('').kind == BLANK
+    assert lex('   \t').kind == BLANK
+    assert lex('c a comment').kind == COMMENT
+    assert lex('    C').kind == COMMENT
+    assert lex('     1 2 3').kind == CONTINUATION
+    assert lex('1 0 -1 imp:n=1').kind == CARD
+    # A 'c' followed by more letters starts a card.
+    assert lex('cut:n 1e20').kind == CARD
+
+def test_dollar():
+    line = lex('1 0 -1 $ cell $ again')
+    assert line.dollar == 7
+    assert line.code == '1 0 -1 '
+    assert line.comment == '$ cell $ again'
+    assert lex('1 0 -1').comment == ''
+
+def test_fill_before_dollar_only():
+    assert lex('2 0 -1 lat=1 fill=0:1 0:0 0:0 1 2').fill is True
+    assert lex('2 0 -1 Fill=1').fill is True
+    assert lex('2 0 -1 u=3 $ fill=1').fill is False
+
+def test_exponents():
+    line = lex('1 1 1.5-3 -1 2d+4 3.0e-2')
+    assert line.fix_exponents() == '1 1 1.5E-3 -1 2E+4 3.0e-2'
+    # Surface numbers and ranges are not exponents.
+    assert lex('1 0 -1 2 -3').exponents == []
+    assert lex('1 0 -1 fill=-1:1').exponents == []
+
+def test_lex_lines():
+    kinds = [line.kind for line in lex_lines(['1 0 -1', '     2', 'c', ''])]
+    assert kinds == [CARD, CONTINUATION, COMMENT, BLANK]
@@ -0,0 +1,118 @@
+from threading import Thread
+
+from mcnpy.mixin import (IDAllocator, IDManagerMixin, reset_auto_ids,
+                         set_auto_id)
+
+class EObject(object):
+    """Stands in for the py4j object of a wrapper."""
+    def __init__(self):
+        self.value = None
+
+    def getName(self):
+        return self.value
+
+    def setName(self, value):
+        self.value = value
+
+class Card(IDManagerMixin):
+    next_id = 1
+    used_ids = set()
+
+    def __init__(self, uid=None):
+        self._e_object = EObject()
+        self.name = uid
+
+class Tally(IDManagerMixin):
+    next_id = 4
+    increment = 10
+    used_ids = set()
+
+    def __init__(self):
+        self._e_object = EObject()
+        self.name = None
+
+def test_next_skips_used():
+    used = {1, 2, 4}
+    ids = IDAllocator(used)
+    assert [ids.next() for _ in range(3)] == [3, 5, 6]
+    # Sets are updated in place.
+    assert used == {1, 2, 3, 4, 5, 6}
+
+def test_dict_is_only_read():
+    cells = {1: 'cell', 2: 'cell'}
+    ids = IDAllocator(cells)
+    assert ids.next() == 3
+    assert 3 in ids
+    assert list(cells) == [1, 2]
+
+def test_sequences():
+    ids = IDAllocator()
+    assert [ids.next(4, 10) for _ in range(3)] == [4, 14, 24]
+    assert [ids.next(1, 10) for _ in range(2)] == [1, 11]
+    assert ids.next() == 2
+
+def test_release_reuses_smallest_first():
+    ids = IDAllocator()
+    for _ in range(5):
+        ids.next()
+    ids.release(4)
+    ids.release(2)
+    assert 2 not in ids
+    assert [ids.next(), ids.next(), ids.next()] == [2, 4, 6]
+
+def test_claim():
+    ids = IDAllocator()
+    assert ids.claim(3) is True
+    assert ids.claim(3) is False
+    assert [ids.next() for _ in range(3)] == [1, 2, 4]
+
+def test_reserve():
+    ids = IDAllocator()
+    ids.reserve(2, 4)
+    ids.reserve(5, 6)
+    assert [ids.next() for _ in range(2)] == [1, 7]
+    # Reserved IDs can still be claimed, and are not reused when released.
+    assert ids.claim(3) is True
+    ids.release(3)
+    assert ids.next() == 8
+    assert [ids.next(2, 2) for _ in range(2)] == [10, 12]
+
+def test_set_next_and_reset():
+    ids = IDAllocator()
+    ids.next()
+    ids.set_next(100)
+    assert ids.next() == 100
+    assert ids.next(5, 10) == 105
+    ids.reset()
+    assert ids.next() == 1
+
+def test_threads():
+    ids = IDAllocator()
+    taken = []
+    def take():
+        for _ in range(1000):
+            taken.append(ids.next())
+    threads = [Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(taken) == list(range(1, 4001))
+
+def test_next_id_follows_allocator():
+    reset_auto_ids()
+    assert [Card().name for _ in range(3)] == [1, 2, 3]
+    assert Card.next_id == 3
+    # Setting next_id by hand continues from there.
+    Card.next_id = 100
+    Card(101)
+    assert [Card().name for _ in range(2)] == [100, 102]
+    assert Card.next_id == 102
+    assert [Tally().name for _ in range(2)] == [4, 14]
+    set_auto_id(100)
+    assert Card().name == 103
+    assert Tally().name == 104
+    assert Tally.next_id == 104
+    reset_auto_ids()
+    assert (Card.next_id, Tally.next_id) == (1, 4)
+    assert Card().name == 1